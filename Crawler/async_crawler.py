@@ -0,0 +1,166 @@
+import asyncio
+import atexit
+import logging
+import threading
+
+import aiohttp
+
+from concurrent.futures import Future
+from typing import Dict, List, Mapping, NamedTuple, Optional, Union
+from config import Config
+from Crawler.http_policy import HttpPolicy
+
+
+class CrawlerResponse(NamedTuple):
+    """
+    Ответ сервера: статус, заголовки и тело
+    """
+    status: int
+    headers: Mapping[str, str]  # без учета регистра имен (CIMultiDict)
+    body: bytes
+
+
+class AsyncCrawler:
+    """
+    Загрузка страниц магазинов. Одна общая aiohttp.ClientSession с пулом keep-alive соединений
+    живет в отдельном потоке со своим event loop, поэтому синхронный код бота и парсеров вызывает
+    fetch()/fetch_many() как обычные функции, а fetch_many() качает все адреса параллельно.
+    Параллельность на один хост ограничена LIMIT_PER_HOST, значения можно переопределить в Config
+    (crawler_limit_per_host, crawler_connect_timeout, crawler_total_timeout).
+    Частота запросов, повторы и предохранитель на хост - HttpPolicy
+    """
+    LIMIT_PER_HOST = getattr(Config, "crawler_limit_per_host", 8)  # одновременных запросов к одному сайту
+    CONNECT_TIMEOUT = getattr(Config, "crawler_connect_timeout", 5.0)  # (сек) на установку соединения
+    TOTAL_TIMEOUT = getattr(Config, "crawler_total_timeout", 15.0)  # (сек) на весь запрос вместе с чтением
+    KEEPALIVE_TIMEOUT = 30  # (сек) сколько держать свободное соединение в пуле
+
+    logger = logging.getLogger(__name__)
+    _lock = threading.Lock()
+    _loop = None
+    _thread = None
+    _session = None
+
+    @classmethod
+    def fetch(cls, url: str) -> bytes:
+        """
+        Загружает одну страницу
+        :param url: адрес страницы
+        :return: содержимое страницы
+        """
+        return cls._run(cls._fetch(url))
+
+    @classmethod
+    def fetch_many(cls, urls: List[str]) -> List[Union[bytes, Exception]]:
+        """
+        Загружает страницы параллельно (не больше LIMIT_PER_HOST одновременно на один сайт)
+        :param urls: адреса страниц
+        :return: содержимое страниц в порядке urls. На месте не загруженной страницы - объект ошибки
+        """
+        if not urls:
+            return []
+        return cls._run(cls._fetch_all(urls))
+
+    @classmethod
+    def submit_many(cls, urls: List[str]) -> Future:
+        """
+        Как fetch_many, но не ждет загрузки: страницы качаются в фоне, пока вызывающий поток занят другим
+        :param urls: адреса страниц
+        :return: Future с результатом fetch_many(urls)
+        """
+        return asyncio.run_coroutine_threadsafe(cls._fetch_all(urls), cls._get_loop())
+
+    @classmethod
+    def request_many(cls, urls: List[str],
+                     headers: Optional[List[Dict[str, str]]] = None) -> List[Union[CrawlerResponse, Exception]]:
+        """
+        Как fetch_many, но со своими заголовками запроса для каждого адреса и с заголовками и статусом ответа
+        (например, для условных запросов If-None-Match)
+        :param urls: адреса страниц
+        :param headers: заголовки запроса в порядке urls (None - без дополнительных заголовков)
+        :return: ответы в порядке urls. На месте не загруженной страницы - объект ошибки
+        """
+        if not urls:
+            return []
+        headers = headers or [None] * len(urls)
+        return cls._run(cls._request_all(urls, headers))
+
+    @classmethod
+    def close(cls) -> None:
+        """
+        Закрывает сессию и останавливает поток event loop
+        :return: None
+        """
+        with cls._lock:
+            loop, thread = cls._loop, cls._thread
+            cls._loop = cls._thread = None
+        if not loop:
+            return
+        asyncio.run_coroutine_threadsafe(cls._close_session(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+    @classmethod
+    def _run(cls, coroutine):
+        """
+        Выполняет корутину в потоке crawler'а и ждет результат
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, cls._get_loop()).result()
+
+    @classmethod
+    def _get_loop(cls) -> asyncio.AbstractEventLoop:
+        """
+        Event loop crawler'а. При первом обращении запускает его в фоновом потоке
+        """
+        with cls._lock:
+            if cls._loop is None:
+                cls._loop = asyncio.new_event_loop()
+                cls._thread = threading.Thread(target=cls._loop.run_forever, name="AsyncCrawler", daemon=True)
+                cls._thread.start()
+            return cls._loop
+
+    @classmethod
+    async def _get_session(cls) -> aiohttp.ClientSession:
+        """
+        Общая сессия. Создается внутри event loop crawler'а (только из его потока - блокировка не нужна)
+        """
+        if cls._session is None or cls._session.closed:
+            connector = aiohttp.TCPConnector(limit_per_host=cls.LIMIT_PER_HOST, keepalive_timeout=cls.KEEPALIVE_TIMEOUT,
+                                             ttl_dns_cache=300)
+            timeout = aiohttp.ClientTimeout(total=cls.TOTAL_TIMEOUT, connect=cls.CONNECT_TIMEOUT)
+            cls._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return cls._session
+
+    @classmethod
+    async def _close_session(cls) -> None:
+        if cls._session is not None:
+            await cls._session.close()
+            cls._session = None
+
+    @classmethod
+    async def _request(cls, url: str, headers: Optional[Dict[str, str]] = None) -> CrawlerResponse:
+        return await HttpPolicy.execute(url, lambda: cls._send(url, headers))
+
+    @classmethod
+    async def _send(cls, url: str, headers: Optional[Dict[str, str]] = None) -> CrawlerResponse:
+        session = await cls._get_session()
+        async with session.get(url, headers=headers) as response:
+            cls.logger.info(f"Load:{url}, status_code = {response.status}")
+            return CrawlerResponse(response.status, response.headers.copy(), await response.read())
+
+    @classmethod
+    async def _fetch(cls, url: str) -> bytes:
+        return (await cls._request(url)).body  # как и requests.get раньше - тело отдаем при любом статусе
+
+    @classmethod
+    async def _fetch_all(cls, urls: List[str]) -> List[Union[bytes, Exception]]:
+        return await asyncio.gather(*[cls._fetch(url) for url in urls], return_exceptions=True)
+
+    @classmethod
+    async def _request_all(cls, urls: List[str],
+                           headers: List[Optional[Dict[str, str]]]) -> List[Union[CrawlerResponse, Exception]]:
+        return await asyncio.gather(*[cls._request(url, url_headers) for url, url_headers in zip(urls, headers)],
+                                    return_exceptions=True)
+
+
+atexit.register(AsyncCrawler.close)
@@ -0,0 +1,128 @@
+import hashlib
+import logging
+import time
+
+from typing import Dict, List, Optional, Union
+from Crawler.async_crawler import AsyncCrawler, CrawlerResponse
+from Data_models.db_connection import DBConnection
+
+
+class HttpCache:
+    """
+    Кэш проверки страниц товаров в базе (таблица http_cache, создается в Migrations): ETag, Last-Modified
+    и sha256 тела по адресу.
+    fetch_many() отправляет условные запросы (If-None-Match / If-Modified-Since). Если сервер ответил 304 или
+    прислал то же самое тело (хэш совпал) - страница не изменилась, и вместо ответа возвращается None:
+    разбирать ее и обновлять товар не нужно. Валидаторы загруженной страницы запоминаются не сразу, а через
+    remember() - когда страница разобрана и товар записан в базу. Кэшируются только ответы 200, тело страницы не хранится
+    """
+    SELECT_CHUNK = 500  # адресов в одном SELECT ... IN (...)
+
+    logger = logging.getLogger(__name__)
+
+    @classmethod
+    def fetch(cls, url: str, revalidate: bool = True) -> Optional[CrawlerResponse]:
+        """
+        Загружает страницу условным запросом
+        :param url: адрес страницы
+        :param revalidate: False - загрузить страницу целиком, даже если она не изменилась
+        :return: ответ сервера или None, если страница не изменилась с последнего remember()
+        """
+        page = cls.fetch_many([url], [revalidate])[0]
+        if isinstance(page, Exception):
+            raise page
+        return page
+
+    @classmethod
+    def fetch_many(cls, urls: List[str], revalidate: List[bool] = None) -> List[Union[CrawlerResponse, None, Exception]]:
+        """
+        Загружает страницы параллельно условными запросами
+        :param urls: адреса страниц
+        :param revalidate: для каждого адреса - можно ли вернуть None для неизменившейся страницы. False - страница
+        нужна целиком (например, товар в базе записан не полностью): без условных заголовков и сравнения хэша.
+        По умолчанию - True для всех адресов
+        :return: в порядке urls: ответ сервера, None - страница не изменилась, объект ошибки - не загружена
+        """
+        if not urls:
+            return []
+        if revalidate is None:
+            revalidate = [True] * len(urls)
+        entries = cls._get_entries([url for url, check in zip(urls, revalidate) if check])
+        responses = AsyncCrawler.request_many(urls, [cls._conditional_headers(entries.get(url) if check else None)
+                                                     for url, check in zip(urls, revalidate)])
+        result, unchanged = [], []
+        for url, check, response in zip(urls, revalidate, responses):
+            entry = entries.get(url) if check else None
+            if isinstance(response, Exception):
+                result.append(response)
+            elif entry and (response.status == 304 or
+                            response.status == 200 and entry["content_hash"] == cls._content_hash(response)):
+                unchanged.append(url)
+                result.append(None)
+            else:
+                result.append(response)  # как и AsyncCrawler.fetch - ответ отдаем при любом статусе
+        if unchanged:
+            with DBConnection.connect() as connection:
+                connection.executemany("""UPDATE http_cache SET checked_timestamp=? WHERE url=?""",
+                                       [(int(time.time()), url) for url in unchanged])
+        cls.logger.info(f"Pages loaded: {len(urls) - len(unchanged)}, not modified: {len(unchanged)}")
+        return result
+
+    @classmethod
+    def remember(cls, urls: List[str], responses: List[CrawlerResponse]) -> None:
+        """
+        Запоминает валидаторы страниц (одна транзакция). Вызывается после того, как страницы разобраны и товары
+        записаны в базу: иначе следующая загрузка сочтет страницу неизменившейся, хотя ее значений в базе нет
+        :param urls: адреса страниц
+        :param responses: ответы fetch_many для этих адресов (запоминаются только ответы 200)
+        :return: None
+        """
+        params = [(url, response.headers.get("ETag"), response.headers.get("Last-Modified"),
+                   cls._content_hash(response), int(time.time()))
+                  for url, response in zip(urls, responses) if response.status == 200]
+        if not params:
+            return
+        with DBConnection.connect() as connection:
+            connection.executemany("""INSERT INTO http_cache (url, etag, last_modified, content_hash, checked_timestamp)
+            VALUES (?,?,?,?,?)
+            ON CONFLICT (url) DO UPDATE SET
+            etag=excluded.etag,
+            last_modified=excluded.last_modified,
+            content_hash=excluded.content_hash,
+            checked_timestamp=excluded.checked_timestamp""", params)
+
+    @classmethod
+    def forget(cls, urls: List[str]) -> None:
+        """
+        Удаляет адреса из кэша: следующая загрузка вернет страницу целиком, даже если она не изменилась
+        :param urls: адреса страниц
+        :return: None
+        """
+        with DBConnection.connect() as connection:
+            connection.executemany("""DELETE FROM http_cache WHERE url=?""", [(url,) for url in urls])
+
+    @classmethod
+    def _get_entries(cls, urls: List[str]) -> Dict[str, dict]:
+        entries = {}
+        with DBConnection.connect() as connection:
+            cursor = connection.cursor()
+            for start in range(0, len(urls), cls.SELECT_CHUNK):
+                chunk = urls[start:start + cls.SELECT_CHUNK]
+                cursor.execute(f"""SELECT * FROM http_cache WHERE url IN ({','.join('?' * len(chunk))})""", chunk)
+                entries.update((item["url"], dict(item)) for item in cursor)
+        return entries
+
+    @staticmethod
+    def _conditional_headers(entry: Optional[dict]) -> Optional[Dict[str, str]]:
+        if not entry:
+            return None
+        headers = {}
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers or None
+
+    @staticmethod
+    def _content_hash(response: CrawlerResponse) -> str:
+        return hashlib.sha256(response.body).hexdigest()
@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import random
+import time
+
+from typing import Awaitable, Callable, Dict
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from config import Config
+from scripts.metrics import Metrics
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}  # ответы, после которых запрос стоит повторить
+FAILURE_STATUSES = RETRY_STATUSES - {429}  # ответы, которые значат, что сайт лежит (429 - только просьба не спешить)
+
+
+class CircuitOpenError(ConnectionError):
+    """
+    Ошибка запроса к сайту, который сейчас считается недоступным (предохранитель разомкнут)
+    """
+
+
+class TokenBucket:
+    """
+    Ограничение частоты запросов: rate запросов в секунду в среднем, до burst подряд без ожидания.
+    reserve() резервирует токен и говорит, сколько подождать - запросы выстраиваются в очередь по порядку
+    """
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def reserve(self) -> float:
+        """
+        Резервирует токен
+        :return: сколько секунд подождать перед запросом (0 - можно сразу)
+        """
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class CircuitBreaker:
+    """
+    Предохранитель: после failure_threshold неудач подряд размыкается, и запросы сразу отклоняются.
+    Через reset_timeout секунд пропускает один пробный запрос: успех замыкает предохранитель, неудача
+    размыкает его еще на reset_timeout
+    """
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        """
+        Можно ли отправить запрос
+        :return: True - можно
+        """
+        if self.opened_at is None:
+            return True
+        if not self.trial and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.trial = True  # пробный запрос, остальные ждут его результата
+            return True
+        return False
+
+    def release(self) -> None:
+        """
+        Пробный запрос не дал результата (отменен или упал до ответа сайта): следующий запрос снова будет пробным
+        :return: None
+        """
+        self.trial = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+    def record_failure(self) -> bool:
+        """
+        Учитывает неудачу
+        :return: True - предохранитель только что разомкнулся
+        """
+        self.failures += 1
+        was_trial, self.trial = self.trial, False
+        if was_trial or (self.opened_at is None and self.failures >= self.failure_threshold):
+            self.opened_at = time.monotonic()
+            return True
+        return False
+
+
+class HttpPolicy:
+    """
+    Общие правила исходящих запросов ко всем магазинам (применяются в AsyncCrawler к каждому запросу):
+    ограничение частоты на хост (TokenBucket), ограниченное число повторов с экспоненциальной задержкой
+    со случайным разбросом и предохранитель на хост (CircuitBreaker), который отклоняет запросы сразу,
+    пока магазин лежит. Значения можно переопределить в Config (crawler_rate_per_host, crawler_burst_per_host,
+    crawler_retries, crawler_backoff_base, crawler_backoff_max, crawler_breaker_failures, crawler_breaker_reset).
+    Состояние используется только из event loop crawler'а, поэтому блокировки не нужны.
+    Счетчики - в Metrics: crawler_requests_total, crawler_throttled_total, crawler_throttle_wait_seconds_total,
+    crawler_retries_total, crawler_failures_total, crawler_circuit_opened_total, crawler_circuit_rejected_total
+    """
+    RATE_PER_HOST = getattr(Config, "crawler_rate_per_host", 5.0)  # запросов в секунду к одному сайту (0 - без ограничения)
+    BURST_PER_HOST = getattr(Config, "crawler_burst_per_host", 10)  # сколько запросов можно отправить подряд
+    RETRIES = getattr(Config, "crawler_retries", 3)  # повторов после первой попытки
+    BACKOFF_BASE = getattr(Config, "crawler_backoff_base", 0.5)  # (сек) задержка перед первым повтором
+    BACKOFF_MAX = getattr(Config, "crawler_backoff_max", 10.0)  # (сек) предел задержки
+    BREAKER_FAILURES = getattr(Config, "crawler_breaker_failures", 5)  # неудач подряд, чтобы разомкнуть предохранитель
+    BREAKER_RESET = getattr(Config, "crawler_breaker_reset", 30.0)  # (сек) через сколько пробовать снова
+
+    logger = logging.getLogger(__name__)
+    _buckets: Dict[str, TokenBucket] = {}
+    _breakers: Dict[str, CircuitBreaker] = {}
+
+    @classmethod
+    async def execute(cls, url: str, send: Callable[[], Awaitable]):
+        """
+        Выполняет запрос по правилам
+        :param url: адрес запроса (по нему определяется хост)
+        :param send: функция, которая создает корутину запроса и возвращает ответ со статусом (status)
+        :return: ответ. Если повторы кончились на статусе из RETRY_STATUSES - последний ответ
+        """
+        host = urlsplit(url).netloc
+        breaker = cls._get_breaker(host)
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                Metrics.inc("crawler_circuit_rejected_total", host=host)
+                raise CircuitOpenError(f"{host} is not available, requests are paused")
+            trial, recorded = breaker.is_open, False  # при разомкнутом предохранителе allow() пропускает только пробный
+            response, error = None, None
+            try:
+                await cls._throttle(host)
+                Metrics.inc("crawler_requests_total", host=host)
+                try:
+                    response = await send()
+                except (aiohttp.ClientError, asyncio.TimeoutError) as send_error:
+                    error = send_error
+                if error is None and response.status not in FAILURE_STATUSES:
+                    breaker.record_success()
+                else:
+                    Metrics.inc("crawler_failures_total", host=host)
+                    if breaker.record_failure():
+                        Metrics.inc("crawler_circuit_opened_total", host=host)
+                        cls.logger.warning(f"Circuit opened for {host} after {breaker.failures} failures")
+                recorded = True
+            finally:
+                if trial and not recorded:  # отмена или ошибка не сайта - иначе хост остался бы закрыт навсегда
+                    breaker.release()
+            if error is None and response.status not in RETRY_STATUSES:
+                return response
+            if attempt >= cls.RETRIES or breaker.is_open:
+                if error is not None:
+                    raise error
+                return response
+            attempt += 1
+            Metrics.inc("crawler_retries_total", host=host)
+            delay = cls._backoff(attempt, response)
+            cls.logger.info(f"Retry {attempt} for {url} in {delay:.2f}s: {error!r}" if error is not None
+                            else f"Retry {attempt} for {url} in {delay:.2f}s: status {response.status}")
+            await asyncio.sleep(delay)
+
+    @classmethod
+    def reset(cls) -> None:
+        """
+        Забывает состояние хостов (например, после изменения настроек в тестах)
+        :return: None
+        """
+        cls._buckets.clear()
+        cls._breakers.clear()
+
+    @classmethod
+    async def _throttle(cls, host: str) -> None:
+        bucket = cls._buckets.get(host)
+        if bucket is None:
+            bucket = cls._buckets[host] = TokenBucket(cls.RATE_PER_HOST, cls.BURST_PER_HOST)
+        delay = bucket.reserve()
+        if delay > 0:
+            Metrics.inc("crawler_throttled_total", host=host)
+            Metrics.inc("crawler_throttle_wait_seconds_total", delay, host=host)
+            await asyncio.sleep(delay)
+
+    @classmethod
+    def _get_breaker(cls, host: str) -> CircuitBreaker:
+        breaker = cls._breakers.get(host)
+        if breaker is None:
+            breaker = cls._breakers[host] = CircuitBreaker(cls.BREAKER_FAILURES, cls.BREAKER_RESET)
+        return breaker
+
+    @classmethod
+    def _backoff(cls, attempt: int, response) -> float:
+        """
+        Задержка перед повтором: случайная от 0 до BACKOFF_BASE * 2^(attempt-1), но не больше BACKOFF_MAX.
+        Если сервер прислал Retry-After (в секундах) - не меньше него
+        """
+        delay = random.uniform(0, min(cls.BACKOFF_MAX, cls.BACKOFF_BASE * 2 ** (attempt - 1)))
+        retry_after = response.headers.get("Retry-After", "") if response is not None else ""
+        if retry_after.isdigit():
+            delay = max(delay, min(cls.BACKOFF_MAX, float(retry_after)))
+        return delay
@@ -0,0 +1,127 @@
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Iterator, List, TypeVar, Union
+from config import Config
+
+T = TypeVar("T")
+
+
+class ParsePool:
+    """
+    Разбор загруженных страниц в отдельных процессах.
+    BeautifulSoup - чистый Python и держит GIL, поэтому разбор в потоке бота тормозит обработку обновлений.
+    ParsePool отдает разбор WORKERS процессам: в процесс уходят байты страницы и функция разбора
+    уровня модуля, обратно приходят компактные записи (NamedTuple), а не суп. Пока процесс разбирает страницу,
+    вызывающий поток просто ждет результат и не мешает остальным потокам.
+    Количество процессов - Config.parse_pool_workers, 0 - разбирать в вызывающем потоке
+    """
+    WORKERS = getattr(Config, "parse_pool_workers", min(4, os.cpu_count() or 1))
+
+    logger = logging.getLogger(__name__)
+    _lock = threading.Lock()
+    _executor = None
+
+    @classmethod
+    def submit(cls, parse: Callable[[bytes], T], page: bytes) -> Future:
+        """
+        Ставит разбор страницы в очередь процессов
+        :param parse: функция разбора уровня модуля (должна импортироваться в процессе по имени)
+        :param page: содержимое страницы
+        :return: Future с результатом parse(page)
+        """
+        if cls.WORKERS <= 0:
+            future = Future()
+            try:
+                future.set_result(parse(page))
+            except Exception as error:
+                future.set_exception(error)
+            return future
+        return cls._get_executor().submit(parse, page)
+
+    @classmethod
+    def run(cls, parse: Callable[[bytes], T], page: bytes) -> T:
+        """
+        Разбирает одну страницу и ждет результат
+        :param parse: функция разбора уровня модуля
+        :param page: содержимое страницы
+        :return: результат parse(page). Ошибка разбора пробрасывается
+        """
+        return cls.result(cls.submit(parse, page))
+
+    @classmethod
+    def result(cls, future: Future) -> T:
+        """
+        Ждет результат разбора, поставленного через submit
+        :param future: Future из submit
+        :return: результат разбора. Ошибка разбора пробрасывается
+        """
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            cls._reset()  # процесс пула упал (например, OOM) - следующий вызов создаст пул заново
+            raise
+
+    @classmethod
+    def map(cls, parse: Callable[[bytes], T], pages: List[bytes]) -> List[Union[T, Exception]]:
+        """
+        Разбирает страницы параллельно во всех процессах пула
+        :param parse: функция разбора уровня модуля
+        :param pages: содержимое страниц
+        :return: результаты в порядке pages. На месте страницы, которую не удалось разобрать, - объект ошибки
+        """
+        return list(cls.imap(parse, pages))
+
+    @classmethod
+    def imap(cls, parse: Callable[[bytes], T], pages: List[bytes]) -> Iterator[Union[T, Exception]]:
+        """
+        Как map, но отдает результаты по порядку, по мере готовности: первый - не дожидаясь остальных
+        :param parse: функция разбора уровня модуля
+        :param pages: содержимое страниц
+        :return: генератор результатов в порядке pages. На месте страницы, которую не удалось разобрать, - объект ошибки
+        """
+        futures = [cls.submit(parse, page) for page in pages]
+        for future in futures:
+            try:
+                yield cls.result(future)
+            except Exception as error:
+                yield error
+
+    @classmethod
+    def stop(cls) -> None:
+        """
+        Останавливает процессы пула. Начатые разборы дорабатывают, очередь отменяется
+        :return: None
+        """
+        with cls._lock:
+            executor, cls._executor = cls._executor, None
+        if executor:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    @classmethod
+    def _get_executor(cls) -> ProcessPoolExecutor:
+        """
+        Пул процессов. При первом обращении запускается. Процессы создаются через spawn: fork процесса
+        с потоками (event loop crawler'а, запись истории) может унаследовать захваченные блокировки
+        """
+        with cls._lock:
+            if cls._executor is None:
+                cls._executor = ProcessPoolExecutor(max_workers=cls.WORKERS,
+                                                    mp_context=multiprocessing.get_context("spawn"))
+            return cls._executor
+
+    @classmethod
+    def _reset(cls) -> None:
+        with cls._lock:
+            executor, cls._executor = cls._executor, None
+        if executor:
+            cls.logger.error("Parse pool is broken, it will be restarted")
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+atexit.register(ParsePool.stop)
@@ -0,0 +1,70 @@
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+
+from Crawler.async_crawler import AsyncCrawler
+
+DELAY = 0.3
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_GET(self):
+        time.sleep(DELAY)
+        body = self.path.encode()
+        self.send_response(404 if self.path.startswith("/missing") else 200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestAsyncCrawler(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), SlowHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        AsyncCrawler.close()
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_fetch(self):
+        self.assertEqual(b"/good/1", AsyncCrawler.fetch(self.base_url + "/good/1"))
+
+    def test_fetch_many_in_parallel_and_in_order(self):
+        urls = [f"{self.base_url}/good/{i}" for i in range(6)]
+        start = time.perf_counter()
+        pages = AsyncCrawler.fetch_many(urls)
+        elapsed = time.perf_counter() - start
+        self.assertEqual([f"/good/{i}".encode() for i in range(6)], pages)
+        self.assertLess(elapsed, DELAY * 3)  # по одной было бы 6 * DELAY
+
+    def test_fetch_many_error_in_place(self):
+        pages = AsyncCrawler.fetch_many([self.base_url + "/good/1", "http://127.0.0.1:1/closed"])
+        self.assertEqual(b"/good/1", pages[0])
+        self.assertIsInstance(pages[1], Exception)
+
+    def test_body_returned_for_error_status(self):
+        self.assertEqual(b"/missing", AsyncCrawler.fetch(self.base_url + "/missing"))
+
+    def test_limit_per_host(self):
+        old_limit = AsyncCrawler.LIMIT_PER_HOST
+        AsyncCrawler.close()  # лимит применяется при создании сессии
+        AsyncCrawler.LIMIT_PER_HOST = 2
+        try:
+            start = time.perf_counter()
+            AsyncCrawler.fetch_many([f"{self.base_url}/good/{i}" for i in range(4)])
+            self.assertGreaterEqual(time.perf_counter() - start, DELAY * 2)
+        finally:
+            AsyncCrawler.close()
+            AsyncCrawler.LIMIT_PER_HOST = old_limit
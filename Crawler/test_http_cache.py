@@ -0,0 +1,151 @@
+import os
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+from Crawler.async_crawler import AsyncCrawler
+from Crawler.http_cache import HttpCache
+from Data_models.db_test_case import DBTestCase
+from Data_models.goods_db import Good, GoodKeeper
+from Data_models.good_images_db import GoodImages
+from Lamoda.lamoda_main import LamodaMain
+
+GOOD_PAGE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Lamoda", "fixtures",
+                         "lamoda_good_page.html")
+
+
+class CachingHandler(BaseHTTPRequestHandler):
+    """
+    /etag/... - отвечает 304 на совпавший If-None-Match, /plain/... - без валидаторов, /good/... - страница товара,
+    /version/... - тело меняется при каждом запросе
+    """
+    protocol_version = "HTTP/1.1"
+    requests_count = 0
+    with open(GOOD_PAGE, "rb") as file:
+        good_page = file.read()
+
+    def do_GET(self):
+        CachingHandler.requests_count += 1
+        etag = f'"{self.path}"'
+        if self.path.startswith("/etag") and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path.startswith("/good"):
+            body = self.good_page
+        elif self.path.startswith("/version"):
+            body = f"{self.path} {CachingHandler.requests_count}".encode()
+        else:
+            body = self.path.encode()
+        self.send_response(200)
+        if self.path.startswith("/etag"):
+            self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestHttpCache(DBTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), CachingHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        AsyncCrawler.close()
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def fetch_and_remember(self, url: str, revalidate=True):
+        response = HttpCache.fetch(url, revalidate)
+        if response is not None:
+            HttpCache.remember([url], [response])
+        return response
+
+    def test_not_modified_by_etag(self):
+        url = self.base_url + "/etag/1"
+        self.assertEqual(b"/etag/1", self.fetch_and_remember(url).body)
+        self.assertIsNone(HttpCache.fetch(url))
+
+    def test_not_modified_by_hash(self):
+        url = self.base_url + "/plain/1"
+        self.assertEqual(b"/plain/1", self.fetch_and_remember(url).body)
+        self.assertIsNone(HttpCache.fetch(url))
+
+    def test_changed_page_returned(self):
+        url = self.base_url + "/version/1"
+        self.assertIsNotNone(self.fetch_and_remember(url))
+        self.assertIsNotNone(self.fetch_and_remember(url))
+
+    def test_not_remembered_until_saved(self):
+        url = self.base_url + "/etag/3"
+        self.assertIsNotNone(HttpCache.fetch(url))
+        self.assertEqual(b"/etag/3", HttpCache.fetch(url).body)
+
+    def test_no_revalidation(self):
+        url = self.base_url + "/etag/4"
+        self.fetch_and_remember(url)
+        self.assertEqual(b"/etag/4", HttpCache.fetch(url, revalidate=False).body)
+
+    def test_forget(self):
+        url = self.base_url + "/etag/2"
+        self.fetch_and_remember(url)
+        HttpCache.forget([url])
+        self.assertEqual(b"/etag/2", HttpCache.fetch(url).body)
+
+    def test_fetch_many_error_in_place(self):
+        pages = HttpCache.fetch_many([self.base_url + "/plain/2", "http://127.0.0.1:1/closed"])
+        self.assertEqual(b"/plain/2", pages[0].body)
+        self.assertIsInstance(pages[1], Exception)
+
+    def test_update_goods_skips_unchanged_pages(self):
+        goods = GoodKeeper.upsert_many([Good(description="Куртка", brand="Old", standard_price=1000,
+                                             link=f"{self.base_url}/good/{i}", category_id=2, sub_category_id=1,
+                                             shop_id=1, option=1) for i in range(3)])
+        updated = LamodaMain.update_goods(goods)
+        self.assertEqual(["Columbia"] * 3, [good.brand for good in updated])
+        with patch("Lamoda.lamoda_main.ParsePool.map") as parse, \
+                patch.object(GoodKeeper, "upsert_many", wraps=GoodKeeper.upsert_many) as upsert:
+            refreshed = LamodaMain.update_goods(updated)
+        parse.assert_called_once_with(parse.call_args[0][0], [])
+        self.assertEqual([], upsert.call_args[0][0])
+        self.assertEqual(3, len(refreshed))
+        stored = GoodKeeper.get_goods_from_db_by_link(goods[0].link)[0]
+        self.assertEqual(refreshed[0].last_update_timestamp, stored.last_update_timestamp)
+
+    def test_update_good_forgets_changed_images(self):
+        good = GoodKeeper.upsert_many([Good(description="Куртка", brand="Old", standard_price=1000,
+                                            image_links_str="https://a.lmcdn.ru/old.jpg", link=f"{self.base_url}/good/1",
+                                            category_id=2, sub_category_id=1, shop_id=1, option=1)])[0]
+        GoodImages.set_file_id(good.good_id, "https://a.lmcdn.ru/old.jpg", "file-old")
+        LamodaMain.update_good(good)
+        self.assertNotEqual("https://a.lmcdn.ru/old.jpg", good.image_links_str)
+        self.assertIsNone(GoodImages.get_file_id(good.good_id, "https://a.lmcdn.ru/old.jpg"))
+        GoodImages.set_file_id(good.good_id, good.image_links[0], "file-new")
+        HttpCache.forget([good.link])  # страница загрузится заново, но изображения те же
+        LamodaMain.update_good(good)
+        self.assertEqual("file-new", GoodImages.get_file_id(good.good_id, good.image_links[0]))
+
+    def test_incomplete_good_reparsed(self):
+        good = GoodKeeper.upsert_many([Good(description="Куртка", brand="Old", standard_price=1000,
+                                            link=f"{self.base_url}/good/2", category_id=2, sub_category_id=1,
+                                            shop_id=1, option=1)])[0]
+        LamodaMain.update_goods([good])
+        GoodKeeper.upsert_many([Good(description="Куртка", brand="Old", standard_price=1000, link=good.link,
+                                     category_id=2, sub_category_id=1, shop_id=1, option=1)])
+        stored = GoodKeeper.get_goods_from_db_by_link(good.link)[0]
+        self.assertEqual(good.image_links_str, stored.image_links_str)
+        stored.image_links_str = ""  # как будто товар записан из карточки поиска без изображения
+        stored.update_in_db()
+        with patch.object(GoodKeeper, "touch_goods", wraps=GoodKeeper.touch_goods) as touch:
+            LamodaMain.update_good(stored)
+        touch.assert_not_called()
+        self.assertEqual(good.image_links_str, GoodKeeper.get_goods_from_db_by_link(good.link)[0].image_links_str)
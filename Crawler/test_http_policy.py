@@ -0,0 +1,145 @@
+import asyncio
+import threading
+import time
+
+import aiohttp
+
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+
+from Crawler.async_crawler import AsyncCrawler
+from Crawler.http_policy import CircuitOpenError, HttpPolicy
+from scripts.metrics import Metrics
+
+
+class ShopHandler(BaseHTTPRequestHandler):
+    """
+    /flaky/... - первые два запроса 503, потом 200; /down/... - всегда 500 (пока не поднят up); /throttle - 429
+    """
+    protocol_version = "HTTP/1.1"
+    hits = Counter()
+    up = False
+
+    def do_GET(self):
+        ShopHandler.hits[self.path] += 1
+        if self.path.startswith("/flaky") and ShopHandler.hits[self.path] <= 2:
+            status = 503
+        elif self.path.startswith("/down") and not ShopHandler.up:
+            status = 500
+        elif self.path.startswith("/throttle"):
+            status = 429
+        else:
+            status = 200
+        body = self.path.encode()
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestHttpPolicy(TestCase):
+    SETTINGS = ("RATE_PER_HOST", "BURST_PER_HOST", "RETRIES", "BACKOFF_BASE", "BACKOFF_MAX", "BREAKER_FAILURES",
+                "BREAKER_RESET")
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), ShopHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.host = f"127.0.0.1:{cls.server.server_address[1]}"
+        cls.base_url = f"http://{cls.host}"
+
+    @classmethod
+    def tearDownClass(cls):
+        AsyncCrawler.close()
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.old_settings = {name: getattr(HttpPolicy, name) for name in self.SETTINGS}
+        HttpPolicy.RATE_PER_HOST = 0
+        HttpPolicy.RETRIES = 3
+        HttpPolicy.BACKOFF_BASE = 0.01
+        HttpPolicy.BACKOFF_MAX = 0.05
+        HttpPolicy.BREAKER_FAILURES = 3
+        HttpPolicy.BREAKER_RESET = 0.3
+        HttpPolicy.reset()
+        Metrics.reset()
+        ShopHandler.hits.clear()
+        ShopHandler.up = False
+
+    def tearDown(self):
+        for name, value in self.old_settings.items():
+            setattr(HttpPolicy, name, value)
+        HttpPolicy.reset()
+
+    def test_retry_until_success(self):
+        self.assertEqual(b"/flaky/1", AsyncCrawler.fetch(self.base_url + "/flaky/1"))
+        self.assertEqual(3, ShopHandler.hits["/flaky/1"])
+        self.assertEqual(2, Metrics.get("crawler_retries_total", host=self.host))
+
+    def test_retries_bounded(self):
+        HttpPolicy.BREAKER_FAILURES = 100
+        self.assertEqual(b"/throttle", AsyncCrawler.fetch(self.base_url + "/throttle"))  # последний ответ
+        self.assertEqual(HttpPolicy.RETRIES + 1, ShopHandler.hits["/throttle"])
+        self.assertEqual(0, Metrics.get("crawler_failures_total", host=self.host))  # 429 - не поломка сайта
+
+    def test_connection_error_raised_after_retries(self):
+        HttpPolicy.BREAKER_FAILURES = 100
+        with self.assertRaises(aiohttp.ClientError):
+            AsyncCrawler.fetch("http://127.0.0.1:1/closed")
+        self.assertEqual(HttpPolicy.RETRIES + 1, Metrics.get("crawler_requests_total", host="127.0.0.1:1"))
+
+    def test_circuit_opens_and_fails_fast(self):
+        AsyncCrawler.fetch(self.base_url + "/down/1")  # 3 неудачи подряд - предохранитель разомкнут
+        self.assertEqual(3, ShopHandler.hits["/down/1"])
+        self.assertEqual(1, Metrics.get("crawler_circuit_opened_total", host=self.host))
+        start = time.perf_counter()
+        with self.assertRaises(CircuitOpenError):
+            AsyncCrawler.fetch(self.base_url + "/down/2")
+        self.assertLess(time.perf_counter() - start, 0.1)
+        self.assertEqual(0, ShopHandler.hits["/down/2"])
+        self.assertEqual(1, Metrics.get("crawler_circuit_rejected_total", host=self.host))
+
+    def test_circuit_closes_after_successful_trial(self):
+        AsyncCrawler.fetch(self.base_url + "/down/1")
+        ShopHandler.up = True
+        time.sleep(HttpPolicy.BREAKER_RESET)
+        self.assertEqual(b"/down/3", AsyncCrawler.fetch(self.base_url + "/down/3"))
+        self.assertEqual(b"/down/4", AsyncCrawler.fetch(self.base_url + "/down/4"))
+
+    def test_failed_trial_opens_circuit_again(self):
+        AsyncCrawler.fetch(self.base_url + "/down/1")
+        time.sleep(HttpPolicy.BREAKER_RESET)
+        AsyncCrawler.fetch(self.base_url + "/down/3")  # пробный запрос без повторов
+        self.assertEqual(1, ShopHandler.hits["/down/3"])
+        with self.assertRaises(CircuitOpenError):
+            AsyncCrawler.fetch(self.base_url + "/down/4")
+
+    def test_broken_trial_released(self):
+        AsyncCrawler.fetch(self.base_url + "/down/1")
+        ShopHandler.up = True
+
+        async def invalid_url():
+            raise ValueError("invalid url")
+
+        async def cancelled():
+            raise asyncio.CancelledError()
+
+        for send in (invalid_url, cancelled):
+            time.sleep(HttpPolicy.BREAKER_RESET)
+            with self.assertRaises((ValueError, asyncio.CancelledError)):
+                asyncio.run(HttpPolicy.execute(self.base_url + "/down/3", send))
+        self.assertEqual(b"/down/3", AsyncCrawler.fetch(self.base_url + "/down/3"))
+
+    def test_rate_limit_per_host(self):
+        HttpPolicy.RATE_PER_HOST = 20
+        HttpPolicy.BURST_PER_HOST = 1
+        start = time.perf_counter()
+        AsyncCrawler.fetch_many([f"{self.base_url}/page/{i}" for i in range(6)])
+        self.assertGreaterEqual(time.perf_counter() - start, 5 / 20 * 0.9)
+        self.assertEqual(5, Metrics.get("crawler_throttled_total", host=self.host))
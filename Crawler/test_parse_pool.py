@@ -0,0 +1,51 @@
+import os
+
+from unittest import TestCase
+
+from Crawler.parse_pool import ParsePool
+from Lamoda.Parser.lamoda_good_page_parser import GoodPageRecord, parse_good_page
+from Lamoda.Parser.lamoda_search_page_parser import parse_search_cards
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Lamoda", "fixtures")
+
+
+def load_fixture(name: str) -> bytes:
+    with open(os.path.join(FIXTURES_DIR, name), "rb") as file:
+        return file.read()
+
+
+def parse_in_pid(page: bytes) -> int:
+    return os.getpid()
+
+
+class TestParsePool(TestCase):
+    def setUp(self):
+        self.old_workers = ParsePool.WORKERS
+        ParsePool.stop()
+        ParsePool.WORKERS = 2
+
+    def tearDown(self):
+        ParsePool.stop()
+        ParsePool.WORKERS = self.old_workers
+
+    def test_run_returns_records(self):
+        record = ParsePool.run(parse_good_page, load_fixture("lamoda_good_page.html"))
+        self.assertIsInstance(record, GoodPageRecord)
+        self.assertEqual(parse_good_page(load_fixture("lamoda_good_page.html")), record)
+
+    def test_map_keeps_order_and_errors(self):
+        pages = [load_fixture("lamoda_search_page_1.html"), b"<html></html>", load_fixture("lamoda_search_page_2.html")]
+        result = ParsePool.map(parse_good_page, pages[1:2]) + ParsePool.map(parse_search_cards, pages)
+        self.assertIsInstance(result[0], ValueError)  # на странице нет товара
+        self.assertEqual([parse_search_cards(page) for page in pages], result[1:])
+
+    def test_inline_when_no_workers(self):
+        ParsePool.WORKERS = 0
+        with self.assertRaises(ValueError):
+            ParsePool.run(parse_good_page, b"<html></html>")
+        self.assertIsNone(ParsePool._executor)
+
+    def test_pages_parsed_in_worker_processes(self):
+        pids = set(ParsePool.map(parse_in_pid, [b""] * 20))
+        self.assertNotIn(os.getpid(), pids)
+        self.assertLessEqual(len(pids), ParsePool.WORKERS)
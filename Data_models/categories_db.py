@@ -1,6 +1,12 @@
-import sqlite3
-from typing import List
+import logging
+import threading
+import time
+
+from functools import lru_cache
+from types import MappingProxyType
+from typing import List, Tuple
 from config import Config
+from Data_models.db_connection import DBConnection
 """
 2	Одежда
 3	Обувь
@@ -8,6 +14,20 @@ from config import Config
 """
 
 
+@lru_cache(maxsize=1024)
+def parse_prices_str(prices_str: str) -> Tuple[Tuple[str, ...], Tuple[int, ...]]:
+    """
+    Разбирает строку цен подкатегории. Строк цен мало (по одной на подкатегорию), поэтому результат кэшируется
+    и все, кто разбирает одну и ту же строку, разделяют одни и те же кортежи
+    :param prices_str: строка цен через Config.mass_splitter
+    :return: (цены строками, цены числами). Пустые кортежи, если цен нет; ValueError, если цены не числа
+    """
+    if not prices_str:
+        return (), ()
+    prices = tuple(prices_str.split(Config.mass_splitter))
+    return prices, tuple(int(price) for price in prices)
+
+
 class Category:
     """
     Класс главных категорий
@@ -34,6 +54,7 @@ class SubCategory(Category):
         self.main_category_id = main_category_id
         self.price_values = price_values
         self.option = option
+        self.str_prices, self.int_prices = parse_prices_str(price_values)  # уже разобраны - товары берут их отсюда
 
     @property
     def prices(self) -> List[str]:
@@ -43,7 +64,7 @@ class SubCategory(Category):
         """
         if not self.price_values:
             raise ValueError(f"No price values in sub_category:{self.id}")
-        return self.price_values.split(Config.mass_splitter)
+        return list(self.str_prices)
 
     def set_prices(self, prices_list: List[str]) -> None:
         """
@@ -54,6 +75,7 @@ class SubCategory(Category):
         if not prices_list:
             raise ValueError("No prices in price list")
         self.price_values = Config.mass_splitter.join(prices_list)
+        self.str_prices, self.int_prices = parse_prices_str(self.price_values)
 
     def __repr__(self):
         return f"id: {self.id}, text: {self.text_value}, main_category_id: {self.main_category_id}, option: {self.option}, price_values:\n{self.price_values}"
@@ -62,7 +84,13 @@ class SubCategory(Category):
 class CategoriesPool:
     """
     Класс управления категориями - получение из БД, добавления и т.д.
+    Каталог читается из снимка в памяти процесса (CatalogSnapshot) - см. get_catalog
     """
+    CATALOG_MAX_STALENESS = getattr(Config, "catalog_max_staleness", 10)  # (сек) как часто проверять версию каталога в базе
+    _catalog = None  # текущий CatalogSnapshot
+    _catalog_checked = 0.0  # time.monotonic() последней проверки версии
+    _catalog_lock = threading.Lock()
+
     def __init__(self):
         self.create_tables()
 
@@ -72,8 +100,7 @@ class CategoriesPool:
         Создание таблиц categories и sub_categories в базе
         :return:
         """
-        with sqlite3.connect(Config.db_pass) as connection:
-            connection.row_factory = sqlite3.Row  # Позволяет обращаться по названию столбца к значению
+        with DBConnection.connect() as connection:
             cursor = connection.cursor()
             cursor.execute("""CREATE TABLE IF NOT EXISTS categories (
                         category_id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -93,20 +120,66 @@ class CategoriesPool:
                         text_value TEXT)
                         """)
 
+    @classmethod
+    def create_catalog_version_table(cls) -> None:
+        """
+        Создание таблицы с версией каталога и триггеров, которые увеличивают версию при любом изменении
+        categories, sub_categories и options (в том числе из другого процесса или вручную в базе)
+        :return: None
+        """
+        with DBConnection.connect() as connection:
+            cursor = connection.cursor()
+            cursor.execute("""CREATE TABLE IF NOT EXISTS catalog_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER DEFAULT 0
+            )""")
+            cursor.execute("""INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 0)""")
+            for table in ("categories", "sub_categories", "options"):
+                for event in ("INSERT", "UPDATE", "DELETE"):
+                    cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS catalog_version_{table}_{event.lower()}
+                    AFTER {event} ON {table}
+                    BEGIN UPDATE catalog_version SET version = version + 1 WHERE id = 1; END""")
+
+    @classmethod
+    def get_catalog(cls) -> "CatalogSnapshot":
+        """
+        Возвращает снимок каталога из памяти. Снимок перечитывается из базы, если версия каталога в базе изменилась.
+        Версия проверяется не чаще, чем раз в CATALOG_MAX_STALENESS секунд - столько могут быть не видны
+        изменения, сделанные другим процессом. Изменения через add_sub_category видны в этом процессе сразу
+        :return: объект CatalogSnapshot
+        """
+        snapshot = cls._catalog
+        now = time.monotonic()
+        if snapshot and snapshot.db_pass == Config.db_pass and now - cls._catalog_checked < cls.CATALOG_MAX_STALENESS:
+            return snapshot
+        with cls._catalog_lock:
+            snapshot = cls._catalog
+            if snapshot and snapshot.db_pass == Config.db_pass and now - cls._catalog_checked < cls.CATALOG_MAX_STALENESS:
+                return snapshot
+            with DBConnection.connect() as connection:
+                version = connection.execute("""SELECT version FROM catalog_version WHERE id = 1""").fetchone()["version"]
+            if not snapshot or snapshot.db_pass != Config.db_pass or snapshot.version != version:
+                snapshot = CatalogSnapshot.load(version)
+                cls._catalog = snapshot
+            cls._catalog_checked = now
+            return snapshot
+
+    @classmethod
+    def invalidate_catalog(cls) -> None:
+        """
+        Сбрасывает снимок каталога - следующее обращение перечитает его из базы
+        :return: None
+        """
+        with cls._catalog_lock:
+            cls._catalog = None
+
     @classmethod
     def get_main_categories(cls) -> List[Category]:
         """
-        Проверяет наличие записей в таблице sub_categories и возвращает используемые главные категории
+        Возвращает главные категории, у которых есть подкатегории
         :return: Список главных категорий
         """
-        with sqlite3.connect(Config.db_pass) as connection:
-            connection.row_factory = sqlite3.Row  # Позволяет обращаться по названию столбца к значению
-            cursor = connection.cursor()
-            cursor.execute("""SELECT DISTINCT sub_categories.main_category_id as category_id, categories.text_value as text_value 
-            FROM sub_categories 
-            JOIN categories  
-            ON sub_categories.main_category_id=categories.category_id""")
-            return [Category(**item) for item in cursor]
+        return list(cls.get_catalog().main_categories)
 
     @classmethod
     def find_category(cls, category_id=-1, text_value="") -> Category:
@@ -118,38 +191,26 @@ class CategoriesPool:
         """
         if category_id == -1 and text_value == "":
             raise ValueError("No category_id or text_value was requested to find")
-        with sqlite3.connect(Config.db_pass) as connection:
-            connection.row_factory = sqlite3.Row
-            cursor = connection.cursor()
-            cursor.execute("""SELECT * FROM categories WHERE category_id=? OR text_value=?""", (category_id, text_value))
-            item = cursor.fetchone()
-            if item:
-                return Category(category_id=item['category_id'], text_value=item['text_value'])
-            else:
-                raise ValueError(f"No category was found for category_id: {category_id} or text_value: {text_value}")
+        catalog = cls.get_catalog()
+        item = catalog.categories_by_id.get(category_id) or catalog.categories_by_text.get(text_value)
+        if item:
+            return item
+        else:
+            raise ValueError(f"No category was found for category_id: {category_id} or text_value: {text_value}")
 
     @classmethod
     def get_options_list(cls, main_category_id) -> List[Option]:
         """
-        Получение списка опций для подкатегорий по ID главной категории. Проверяется таблица sub_categories
+        Получение списка опций для подкатегорий по ID главной категории
         :param main_category_id: main_category_id - главная категория. Обязательна для поиска
         :return:
         """
         if main_category_id < 0:
             raise ValueError("main_category_id less then zero")
-        with sqlite3.connect(Config.db_pass) as connection:
-            connection.row_factory = sqlite3.Row  # Позволяет обращаться по названию столбца к значению
-            cursor = connection.cursor()
-            cursor.execute("""SELECT DISTINCT sub_categories.option as option_id, options.text_value 
-            FROM sub_categories 
-            JOIN options 
-            ON sub_categories.option=options.option_id 
-            WHERE main_category_id=?""",
-                           (main_category_id,))
-            result = [Option(**item) for item in cursor]
-            if not result:
-                raise ValueError(f"No options was found with main_category_id:{main_category_id}")
-            return result
+        result = list(cls.get_catalog().options_by_main_category.get(main_category_id, ()))
+        if not result:
+            raise ValueError(f"No options was found with main_category_id:{main_category_id}")
+        return result
 
     @classmethod
     def get_option(cls, option_id=-1, text_value=""):
@@ -161,33 +222,26 @@ class CategoriesPool:
         """
         if option_id == -1 and text_value == "":
             raise ValueError("Try to found empty option")
-        with sqlite3.connect(Config.db_pass) as connection:
-            connection.row_factory = sqlite3.Row  # Позволяет обращаться по названию столбца к значению
-            cursor = connection.cursor()
-            cursor.execute("""SELECT * FROM options WHERE option_id=? OR text_value=?""", (option_id, text_value))
-            result = cursor.fetchone()
-            if not result:
-                raise ValueError(f"Option id:{option_id} or text: {text_value} not found")
-            return Option(**result)
+        catalog = cls.get_catalog()
+        result = catalog.options_by_id.get(option_id) or catalog.options_by_text.get(text_value)
+        if not result:
+            raise ValueError(f"Option id:{option_id} or text: {text_value} not found")
+        return result
 
     @classmethod
     def get_sub_categories(cls, main_category_id, option=0) -> list[SubCategory]:
         """
-        Получение списка подкатегорий по ID главной категории. Проверяется таблица sub_categories
+        Получение списка подкатегорий по ID главной категории и option
         :param option: option параметр (к примеру для одежды - пол)
         :param main_category_id: main_category_id - главная категория. Обязательна для поиска
         :return:
         """
         if main_category_id < 0:
             raise ValueError("main_category_id less then zero")
-        with sqlite3.connect(Config.db_pass) as connection:
-            connection.row_factory = sqlite3.Row  # Позволяет обращаться по названию столбца к значению
-            cursor = connection.cursor()
-            cursor.execute("""SELECT * FROM sub_categories WHERE main_category_id=? AND option=?""", (main_category_id, option))
-            result = [SubCategory(**item) for item in cursor]
-            if not result:
-                raise ValueError(f"No sub_categories was found with main_category_id:{main_category_id}")
-            return result
+        result = list(cls.get_catalog().sub_categories_by_main_category.get((main_category_id, option), ()))
+        if not result:
+            raise ValueError(f"No sub_categories was found with main_category_id:{main_category_id}")
+        return result
 
     @classmethod
     def get_sub_category_by_id(cls, sub_category_id, option=0) -> SubCategory:
@@ -199,15 +253,23 @@ class CategoriesPool:
         """
         if sub_category_id < 0:
             raise ValueError(f"Sub_category_id less then zero. sub_category_id={sub_category_id}")
-        with sqlite3.connect(Config.db_pass) as connection:
-            connection.row_factory = sqlite3.Row  # Позволяет обращаться по названию столбца к значению
-            cursor = connection.cursor()
-            cursor.execute("""SELECT * FROM sub_categories WHERE sub_category_id=? AND option=?""", (sub_category_id, option))
-            item = cursor.fetchone()
-            if not item:
-                raise ValueError(f"No sub_category was found with id:{sub_category_id}")
-            else:
-                return SubCategory(**item)
+        item = cls.get_catalog().sub_categories_by_id.get((sub_category_id, option))
+        if not item:
+            raise ValueError(f"No sub_category was found with id:{sub_category_id}")
+        else:
+            return item
+
+    @classmethod
+    def get_prices(cls, prices_str: str) -> Tuple[Tuple[str, ...], Tuple[int, ...]]:
+        """
+        Разобранные цены по строке цен. Если строка совпадает с ценами подкатегории текущего снимка каталога,
+        возвращаются уже разобранные кортежи снимка, иначе строка разбирается parse_prices_str. В базу не ходит
+        :param prices_str: строка цен через Config.mass_splitter
+        :return: (цены строками, цены числами)
+        """
+        snapshot = cls._catalog
+        prices = snapshot.prices_by_str.get(prices_str) if snapshot else None
+        return prices or parse_prices_str(prices_str)
 
     @classmethod
     def add_sub_category(cls, main_category: int, text_value: str, prices_str_list: List[str]):
@@ -218,13 +280,100 @@ class CategoriesPool:
         :param prices_str_list: массив строк с ценами на товар ИМЕННО СТРОК
         :return: True - все ОК
         """
-        with sqlite3.connect(Config.db_pass) as connection:
-            connection.row_factory = sqlite3.Row  # Позволяет обращаться по названию столбца к значению
+        prices_str = Config.mass_splitter.join(prices_str_list)
+        parse_prices_str(prices_str)  # ValueError, если цены не числа - в каталог такие не попадут
+        with DBConnection.connect() as connection:
             cursor = connection.cursor()
-            prices_str = Config.mass_splitter.join(prices_str_list)
             cursor.execute("""INSERT INTO sub_categories (text_value, main_category_id, price_values) 
             VALUES (?,?,?) RETURNING *""", (text_value, main_category, prices_str))
-            return cursor.fetchone()
+            result = cursor.fetchone()
+        cls.invalidate_catalog()
+        return result
+
+    @classmethod
+    def update_sub_category_prices(cls, sub_category_id: int, prices_str_list: List[str]) -> None:
+        """
+        Меняет цены подкатегории и пересчитывает правильные оценки ее товаров (goods.correct_mark)
+        :param sub_category_id: ID подкатегории
+        :param prices_str_list: массив строк с ценами на товар ИМЕННО СТРОК
+        :return: None
+        """
+        prices_str = Config.mass_splitter.join(prices_str_list)
+        parse_prices_str(prices_str)  # ValueError, если цены не числа
+        with DBConnection.connect() as connection:
+            cursor = connection.cursor()
+            cursor.execute("""UPDATE sub_categories SET price_values=? WHERE sub_category_id=?""",
+                           (prices_str, sub_category_id))
+            if not cursor.rowcount:
+                raise ValueError(f"No sub_category was found with id:{sub_category_id}")
+        cls.invalidate_catalog()
+        from Data_models.goods_db import GoodKeeper
+        GoodKeeper.recompute_correct_marks(sub_category_id)
+
+
+class CatalogSnapshot:
+    """
+    Неизменяемый снимок дерева категорий: категории, опции и подкатегории с уже разобранными ценами.
+    Объекты внутри снимка общие для всех потоков - их нельзя изменять
+    """
+    __slots__ = ("db_pass", "version", "main_categories", "categories_by_id", "categories_by_text", "options_by_id",
+                 "options_by_text", "options_by_main_category", "sub_categories_by_main_category",
+                 "sub_categories_by_id", "prices_by_str")
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, db_pass, version, categories, options, sub_categories):
+        self.db_pass = db_pass
+        self.version = version
+        self.categories_by_id = MappingProxyType({x.id: x for x in categories})
+        self.categories_by_text = MappingProxyType({x.text_value: x for x in categories})
+        self.options_by_id = MappingProxyType({x.id: x for x in options})
+        self.options_by_text = MappingProxyType({x.text_value: x for x in options})
+        main_categories = {}
+        options_by_main_category = {}
+        sub_categories_by_main_category = {}
+        for sub_category in sub_categories:
+            main_category = self.categories_by_id.get(sub_category.main_category_id)
+            if main_category:
+                main_categories.setdefault(main_category.id, main_category)
+            option = self.options_by_id.get(sub_category.option)
+            if option:
+                options_by_main_category.setdefault(sub_category.main_category_id, {}).setdefault(option.id, option)
+            sub_categories_by_main_category.setdefault((sub_category.main_category_id, sub_category.option), []).append(sub_category)
+        self.main_categories = tuple(main_categories.values())
+        self.options_by_main_category = MappingProxyType(
+            {key: tuple(value.values()) for key, value in options_by_main_category.items()})
+        self.sub_categories_by_main_category = MappingProxyType(
+            {key: tuple(value) for key, value in sub_categories_by_main_category.items()})
+        self.sub_categories_by_id = MappingProxyType({(x.id, x.option): x for x in sub_categories})
+        self.prices_by_str = MappingProxyType({x.price_values: (x.str_prices, x.int_prices) for x in sub_categories})
+
+    @classmethod
+    def load(cls, version: int) -> "CatalogSnapshot":
+        """
+        Читает весь каталог из базы. Подкатегория с испорченной строкой в базе (цены не числа) пропускается,
+        чтобы не сломать меню всех остальных категорий
+        :param version: версия каталога в базе на момент чтения
+        :return: новый снимок
+        """
+        with DBConnection.connect() as connection:
+            cursor = connection.cursor()
+            cursor.execute("""SELECT * FROM categories ORDER BY category_id""")
+            categories = [Category(category_id=item["category_id"], text_value=item["text_value"]) for item in cursor]
+            cursor.execute("""SELECT * FROM options ORDER BY option_id""")
+            options = [Option(option_id=item["option_id"], text_value=item["text_value"]) for item in cursor]
+            cursor.execute("""SELECT * FROM sub_categories ORDER BY sub_category_id""")
+            sub_categories = []
+            for item in cursor:
+                try:
+                    sub_categories.append(SubCategory(sub_category_id=item["sub_category_id"],
+                                                      text_value=item["text_value"],
+                                                      main_category_id=int(item["main_category_id"]),
+                                                      price_values=item["price_values"],
+                                                      option=int(item["option"] or 0)))
+                except (ValueError, TypeError) as error:
+                    cls.logger.error(f"Invalid sub_category {item['sub_category_id']} is skipped: {error!r}")
+        return cls(Config.db_pass, version, categories, options, sub_categories)
 
 
 if __name__ == "__main__":
@@ -1,5 +1,6 @@
-import sqlite3
-from config import Config
+import re
+
+from Data_models.db_connection import DBConnection
 
 
 class NextSearchPages:
@@ -12,8 +13,7 @@ class NextSearchPages:
         Создание таблицы
         :return:
         """
-        with sqlite3.connect(Config.db_pass) as connection:
-            connection.row_factory = sqlite3.Row  # Позволяет обращаться по названию столбца к значению
+        with DBConnection.connect() as connection:
             cursor = connection.cursor()
             cursor.execute("""CREATE TABLE IF NOT EXISTS next_shop_pages (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -35,8 +35,7 @@ class NextSearchPages:
         :param option: option параметр
         :return: ссылка на следующую страницу поиска
         """
-        with sqlite3.connect(Config.db_pass) as connection:
-            connection.row_factory = sqlite3.Row  # Позволяет обращаться по названию столбца к значению
+        with DBConnection.connect() as connection:
             cursor = connection.cursor()
             cursor.execute("""SELECT * FROM next_shop_pages 
             WHERE sub_category_id=? AND shop_id=? AND option=?""",
@@ -48,38 +47,46 @@ class NextSearchPages:
                 raise ValueError(f"No next page founded for category {sub_category_id}, shop: {shop_id}")
 
     @classmethod
-    def insert_next_search_page(cls, sub_category_id, shop_id, address, option=0) -> None:
+    def set_next_search_page(cls, sub_category_id, shop_id, address, option=0) -> None:
         """
-        Добавление в базу строки со следующей ссылкой
+        Записывает адрес следующей страницы поиска одним запросом: добавляет строку или обновляет существующую
+        (уникальный индекс idx_next_shop_pages_key)
         :param sub_category_id: ID подкатегории
         :param shop_id: ID магазина
         :param address: ссылка
         :param option: option параметр
         :return: None
         """
-        with sqlite3.connect(Config.db_pass) as connection:
-            connection.row_factory = sqlite3.Row  # Позволяет обращаться по названию столбца к значению
+        with DBConnection.connect() as connection:
             cursor = connection.cursor()
-            cursor.execute("""INSERT INTO next_shop_pages (sub_category_id, shop_id, next_search_page, option) 
-            VALUES (?,?,?,?)""", (sub_category_id, shop_id, address, option))
+            cursor.execute("""INSERT INTO next_shop_pages (sub_category_id, shop_id, next_search_page, option)
+            VALUES (?,?,?,?)
+            ON CONFLICT (sub_category_id, shop_id, option) DO UPDATE SET next_search_page=excluded.next_search_page""",
+                           (sub_category_id, shop_id, address, option))
 
     @classmethod
-    def update_next_search_page(cls, sub_category_id, shop_id, address, option=0) -> None:
+    def create_unique_index(cls) -> None:
         """
-        Обновление в базе строки со следующей ссылкой
-        :param sub_category_id: ID подкатегории
-        :param shop_id: ID магазина
-        :param address: ссылка
-        :param option: option параметр
+        Уникальный индекс по (подкатегория, магазин, option) - одна строка на поиск. Перед созданием
+        строки, записанные без option (раньше option не передавался при записи), переносятся на option
+        из текста запроса, а дубли удаляются (остается последняя записанная строка)
         :return: None
         """
-        with sqlite3.connect(Config.db_pass) as connection:
-            connection.row_factory = sqlite3.Row  # Позволяет обращаться по названию столбца к значению
+        with DBConnection.connect() as connection:
             cursor = connection.cursor()
-            cursor.execute("""UPDATE next_shop_pages SET 
-            next_search_page=? 
-            WHERE sub_category_id=? AND shop_id=? AND option=?""", (address, sub_category_id, shop_id, option))
-
+            options = [(item["option_id"], "+" + item["text_value"].replace(" ", "+"))
+                       for item in cursor.execute("""SELECT option_id, text_value FROM options WHERE option_id > 0""")]
+            rows = cursor.execute("""SELECT id, next_search_page FROM next_shop_pages WHERE option=0""").fetchall()
+            for row in rows:
+                query = re.sub(r"[?&]page=\d+", "", row["next_search_page"] or "")
+                matched = [option_id for option_id, ends in options if query.endswith(ends)]
+                if len(matched) == 1:
+                    cursor.execute("""UPDATE next_shop_pages SET option=? WHERE id=?""", (matched[0], row["id"]))
+            cursor.execute("""DELETE FROM next_shop_pages WHERE id NOT IN (
+            SELECT max(id) FROM next_shop_pages GROUP BY sub_category_id, shop_id, option)""")
+            cursor.execute("""DROP INDEX IF EXISTS idx_next_shop_pages_sub_category""")
+            cursor.execute("""CREATE UNIQUE INDEX IF NOT EXISTS idx_next_shop_pages_key
+            ON next_shop_pages (sub_category_id, shop_id, option)""")
 
 if __name__ == "__main__":
     NextSearchPages.create_table()
@@ -0,0 +1,79 @@
+import sqlite3
+import threading
+
+from config import Config
+
+
+class DBConnection:
+    """
+    Общий слой подключений к базе для всех классов Data_models.
+    Каждый поток получает одно долгоживущее соединение на файл базы (Config.db_pass) вместо
+    sqlite3.connect() на каждый запрос. Соединение настроено на WAL и кэширует подготовленные запросы.
+    Использование:
+        with DBConnection.connect() as connection:
+            cursor = connection.cursor()
+    Выход из with делает commit (или rollback при ошибке), но соединение не закрывает.
+    """
+    CACHED_STATEMENTS = 256  # размер кэша подготовленных запросов на соединение
+    BUSY_TIMEOUT = 10.0  # сколько секунд ждать, пока другое соединение держит блокировку записи
+    PRAGMAS = (
+        "PRAGMA journal_mode=WAL",  # читатели не блокируют писателя и наоборот
+        "PRAGMA synchronous=NORMAL",  # в режиме WAL fsync только на checkpoint
+        "PRAGMA cache_size=-16000",  # ~16 МБ кэша страниц на соединение
+        "PRAGMA mmap_size=268435456",  # до 256 МБ файла базы читаем через mmap
+        "PRAGMA temp_store=MEMORY",
+    )
+
+    _local = threading.local()
+    _lock = threading.Lock()
+    _connections = []  # все открытые соединения - для закрытия при остановке
+    _generation = 0  # увеличивается в close_all(), чтобы потоки открыли соединения заново
+
+    @classmethod
+    def connect(cls) -> sqlite3.Connection:
+        """
+        Возвращает соединение текущего потока для Config.db_pass. Открывает его при первом обращении
+        :return: настроенное соединение (row_factory = sqlite3.Row)
+        """
+        connections = getattr(cls._local, "connections", None)
+        if connections is None or cls._local.generation != cls._generation:
+            connections = cls._local.connections = {}
+            cls._local.generation = cls._generation
+        connection = connections.get(Config.db_pass)
+        if connection is None:
+            connection = cls._open(Config.db_pass)
+            connections[Config.db_pass] = connection
+        return connection
+
+    @classmethod
+    def _open(cls, db_pass: str) -> sqlite3.Connection:
+        """
+        Открывает и настраивает новое соединение
+        :param db_pass: путь к файлу базы
+        :return: соединение
+        """
+        # check_same_thread=False только для close_all() - в работе соединение использует один поток
+        connection = sqlite3.connect(db_pass, timeout=cls.BUSY_TIMEOUT, check_same_thread=False,
+                                     cached_statements=cls.CACHED_STATEMENTS)
+        connection.row_factory = sqlite3.Row  # Позволяет обращаться по названию столбца к значению
+        for pragma in cls.PRAGMAS:
+            connection.execute(pragma)
+        with cls._lock:
+            cls._connections.append(connection)
+        return connection
+
+    @classmethod
+    def close_all(cls) -> None:
+        """
+        Закрывает все открытые соединения (при остановке бота или смене базы в тестах).
+        Потоки, которые обратятся к базе после этого, откроют новые соединения
+        :return: None
+        """
+        with cls._lock:
+            connections, cls._connections = cls._connections, []
+            cls._generation += 1
+        for connection in connections:
+            try:
+                connection.close()
+            except sqlite3.ProgrammingError:
+                pass
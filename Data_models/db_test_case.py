@@ -0,0 +1,39 @@
+import os
+import tempfile
+
+from unittest import TestCase
+from config import Config
+from Data_models.db_connection import DBConnection
+from Data_models.migrations import Migrations
+
+
+class DBTestCase(TestCase):
+    """
+    Общая основа тестов с базой: на время теста Config.db_pass указывает на новую базу во временном каталоге,
+    схема создается миграциями (MIGRATE = False - пустая база, например, для проверки самих миграций).
+    Соединения закрываются и Config.db_pass восстанавливается уже после tearDown наследника
+    """
+    MIGRATE = True
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.addCleanup(setattr, Config, "db_pass", Config.db_pass)
+        self.addCleanup(DBConnection.close_all)
+        Config.db_pass = os.path.join(tmp_dir.name, "test.db")
+        if self.MIGRATE:
+            Migrations.migrate()
+
+    @staticmethod
+    def add_catalog(price_values: str = "5000, 10000, 30000") -> None:
+        """
+        Каталог для тестов: категория 2 "Одежда", option 1 "Мужские" и ее подкатегория 1 "Куртки"
+        :param price_values: цены подкатегории
+        :return: None
+        """
+        with DBConnection.connect() as connection:
+            cursor = connection.cursor()
+            cursor.execute("INSERT INTO categories (category_id, text_value) VALUES (2, 'Одежда')")
+            cursor.execute("INSERT INTO options (option_id, text_value) VALUES (1, 'Мужские')")
+            cursor.execute("""INSERT INTO sub_categories (sub_category_id, text_value, main_category_id, option, price_values)
+            VALUES (1, 'Куртки', 2, 1, ?)""", (price_values,))
@@ -0,0 +1,63 @@
+from typing import List, Optional
+from Data_models.db_connection import DBConnection
+
+
+class GoodImages:
+    """
+    file_id фотографий товаров в Telegram (таблица good_images).
+    Фото товара отправляется ссылкой на CDN магазина только в первый раз: Telegram скачивает его сам и возвращает
+    file_id, который запоминается по (товар, ссылка на изображение). Следующие отправки того же изображения
+    идут по file_id без скачивания. Записи товара удаляются, когда меняется набор его изображений (LamodaMain)
+    """
+    @classmethod
+    def create_table(cls) -> None:
+        """
+        Создание таблицы
+        :return: None
+        """
+        with DBConnection.connect() as connection:
+            connection.execute("""CREATE TABLE IF NOT EXISTS good_images (
+            good_id INTEGER,
+            image_link TEXT,
+            file_id TEXT,
+            PRIMARY KEY (good_id, image_link)
+            ) WITHOUT ROWID""")
+
+    @classmethod
+    def get_file_id(cls, good_id: int, image_link: str) -> Optional[str]:
+        """
+        file_id изображения товара
+        :param good_id: ID товара
+        :param image_link: ссылка на изображение
+        :return: file_id или None, если изображение еще не отправлялось
+        """
+        with DBConnection.connect() as connection:
+            item = connection.execute("""SELECT file_id FROM good_images WHERE good_id=? AND image_link=?""",
+                                      (good_id, image_link)).fetchone()
+            return item["file_id"] if item else None
+
+    @classmethod
+    def set_file_id(cls, good_id: int, image_link: str, file_id: str) -> None:
+        """
+        Запоминает file_id отправленного изображения
+        :param good_id: ID товара
+        :param image_link: ссылка на изображение
+        :param file_id: file_id из ответа Telegram
+        :return: None
+        """
+        with DBConnection.connect() as connection:
+            connection.execute("""INSERT INTO good_images (good_id, image_link, file_id) VALUES (?,?,?)
+            ON CONFLICT (good_id, image_link) DO UPDATE SET file_id=excluded.file_id""",
+                               (good_id, image_link, file_id))
+
+    @classmethod
+    def forget(cls, good_ids: List[int]) -> None:
+        """
+        Удаляет file_id изображений товаров (изображения изменились или file_id больше не принимается)
+        :param good_ids: ID товаров
+        :return: None
+        """
+        if not good_ids:
+            return
+        with DBConnection.connect() as connection:
+            connection.executemany("""DELETE FROM good_images WHERE good_id=?""", [(good_id,) for good_id in good_ids])
@@ -1,19 +1,30 @@
 import logging
-import sqlite3
 import time
 
-from typing import List
-from Data_models.categories_db import CategoriesPool, Category
+from bisect import bisect_right
+from typing import List, Tuple
+from Data_models.categories_db import CategoriesPool, Category, parse_prices_str
 from config import Config
+from Data_models.db_connection import DBConnection
+from Data_models.history_writer import HistoryWriter
 
 
 class Good:
     """
-    Основной класс товара, используется для взаимодействия между модулями
+    Основной класс товара, используется для взаимодействия между модулями.
+    Хранится в __slots__: товаров в памяти много (выдача, парсинг, кэши), а полей у всех одинаковый набор.
+    Цены подкатегории берутся уже разобранными из снимка каталога, ссылки на изображения разбираются из строки
+    один раз при первом обращении
     """
+    __slots__ = ("good_id", "brand", "description", "standard_price", "final_price", "category_id", "sub_category_id",
+                 "link", "last_update_timestamp", "shop_id", "active", "option", "correct_mark",
+                 "_prices_str", "_prices", "_int_prices", "_image_links_str", "_image_links")
+
+    logger = logging.getLogger(__name__)
+
     def __init__(self, good_id=-1, description="", final_price=0, link="", last_update_timestamp=0,
                  prices_str="", standard_price=0, brand="", image_links_str="", category_id=-1,
-                 sub_category_id=-1, shop_id=-1, active=1, option=0):
+                 sub_category_id=-1, shop_id=-1, active=1, option=0, correct_mark=None, **kwargs):
         self.good_id = good_id  # id товара в базе
         self.brand = brand  # Производитель
         self.description = description  # модель или описание
@@ -28,8 +39,26 @@ class Good:
         self.shop_id = shop_id  # ID онлайн магазина, в котором находится товар
         self.active = active  # active = 0, если у товара нет цены (закончился). Не участвует. Можно запросить повторно через недельку или удалить
         self.option = option  # опциональная переменная, к примеру для одежды будет указывать на пол: Мужская=1, Женская=2,
+        self.correct_mark = correct_mark  # правильная оценка, сохраненная в базе (None - еще не вычислена)
+
+    @property
+    def prices_str(self) -> str:
+        return self._prices_str
 
-        self.logger = logging.getLogger(__name__)
+    @prices_str.setter
+    def prices_str(self, prices_str: str) -> None:
+        self._prices_str = prices_str
+        self._prices = None  # разберется заново при обращении
+        self._int_prices = None
+
+    @property
+    def image_links_str(self) -> str:
+        return self._image_links_str
+
+    @image_links_str.setter
+    def image_links_str(self, image_links_str: str) -> None:
+        self._image_links_str = image_links_str
+        self._image_links = None
 
     @property
     def marks_statistic(self) -> List[int]:
@@ -40,7 +69,7 @@ class Good:
         """
         self.check_good_id()
         from Data_models.history_of_choices_db import HistoryOfChoices
-        return HistoryOfChoices.get_marks_for_good(self.good_id, len(self.prices_list) + 1)
+        return HistoryOfChoices.get_marks_for_good(self.good_id, len(self.int_prices) + 1)
 
     @property
     def prices_list(self) -> List[str]:
@@ -48,21 +77,46 @@ class Good:
         Возвращает массив строк с ценами подкатегории. Если цен нет - запрашивает в базе в таблице sub_categories
         :return: Массив строк с ценами подкатегории
         """
+        self._parse_prices()
+        return list(self._prices)
+
+    @property
+    def int_prices(self) -> Tuple[int, ...]:
+        """
+        Цены подкатегории в виде кортежа целых чисел (по возрастанию)
+        :return: кортеж цен
+        """
+        self._parse_prices()
+        return self._int_prices
+
+    def _parse_prices(self) -> None:
+        """
+        Заполняет кортежи цен, если это еще не сделано. Кортежи берутся готовыми из снимка каталога:
+        по self.prices_str (CategoriesPool.get_prices), а если цен нет - у подкатегории товара
+        :return: None
+        """
+        if self._int_prices is not None:
+            return
         if self.sub_category_id == -1:
             raise InvalidGood("No sub_category_id", self)
-        if not self.prices_str:
-            self.prices_str = CategoriesPool.get_sub_category_by_id(sub_category_id=self.sub_category_id, option=self.option).price_values
-        return self.prices_str.split(Config.mass_splitter)
+        if self.prices_str:
+            self._prices, self._int_prices = CategoriesPool.get_prices(self.prices_str)
+        else:
+            sub_category = CategoriesPool.get_sub_category_by_id(sub_category_id=self.sub_category_id, option=self.option)
+            self._prices_str = sub_category.price_values
+            self._prices, self._int_prices = sub_category.str_prices, sub_category.int_prices
 
     @property
-    def image_links(self) -> List[str]:
+    def image_links(self) -> Tuple[str, ...]:
         """
-        Делит self.image_links_str на раздельные строки со ссылками на изображения
-        :return: массив с изображениями товара
+        Делит self.image_links_str на раздельные строки со ссылками на изображения (один раз, при первом обращении)
+        :return: кортеж с изображениями товара
         """
-        if self.image_links_str == "":
-            raise InvalidGood("No images", self)
-        return self.image_links_str.split(Config.mass_splitter)
+        if self._image_links is None:
+            if self.image_links_str == "":
+                raise InvalidGood("No images", self)
+            self._image_links = tuple(self.image_links_str.split(Config.mass_splitter))
+        return self._image_links
 
     def set_image_links(self, image_links_list: List) -> None:
         """
@@ -104,16 +158,33 @@ class Good:
     @property
     def correct_mark_index(self) -> int:
         """
-        Вычисляет позицию правильного выбора оценки товара относительно массива цен
+        Позиция правильного выбора оценки товара относительно массива цен.
+        Берется из сохраненного в базе goods.correct_mark, если его нет - вычисляется
         :return:  позиция правильного выбора оценки товара
         """
         self.check_good_id()
-        good_price = self.standard_price or self.final_price
-        prices = self.prices_list
-        for index in range(len(prices)):
-            if good_price < int(self.prices_list[index]):
-                return index
-        return len(prices)
+        if self.correct_mark is not None:
+            return self.correct_mark
+        return self.calculate_correct_mark()
+
+    def calculate_correct_mark(self) -> int:
+        """
+        Вычисляет позицию правильного выбора оценки по текущим ценам товара:
+        индекс первой цены, которая больше цены товара (бинарный поиск по int_prices)
+        :return: позиция правильного выбора оценки товара
+        """
+        return bisect_right(self.int_prices, self.standard_price or self.final_price)
+
+    def refresh_correct_mark(self) -> None:
+        """
+        Пересчитывает self.correct_mark перед записью товара в базу.
+        Если цены подкатегории неизвестны - None (пересчитается в GoodKeeper.recompute_correct_marks)
+        :return: None
+        """
+        try:
+            self.correct_mark = self.calculate_correct_mark()
+        except (ValueError, TypeError):
+            self.correct_mark = None
 
     def check_good_id(self) -> None:
         """
@@ -141,6 +212,8 @@ class Good:
         try:
             founded_good = GoodKeeper.get_goods_from_db_by_link(self.link)
             if founded_good:
+                if self.good_id < 0:  # товар со страницы поиска - ID берем из базы
+                    self.good_id = founded_good[0].good_id
                 self.update_in_db()
         except ValueError:
             self.insert_in_db()
@@ -150,8 +223,8 @@ class Good:
         Добавляет в базу запись с новым товаром
         :return: good_id нового товара.
         """
-        with sqlite3.connect(Config.db_pass) as connection:
-            connection.row_factory = sqlite3.Row
+        self.refresh_correct_mark()
+        with DBConnection.connect() as connection:
             cursor = connection.cursor()
             cursor.execute("""INSERT INTO goods (
             description,
@@ -164,8 +237,9 @@ class Good:
             sub_category_id,
             shop_id,
             last_update_timestamp,
-            option
-             ) VALUES(?,?,?,?,?,?,?,?,?,?,?) RETURNING *""", (
+            option,
+            correct_mark
+             ) VALUES(?,?,?,?,?,?,?,?,?,?,?,?) RETURNING *""", (
                 self.description,
                 self.brand,
                 self.standard_price,
@@ -176,7 +250,8 @@ class Good:
                 self.sub_category_id,
                 self.shop_id,
                 time.time(),
-                self.option
+                self.option,
+                self.correct_mark
             ))
             self.good_id = cursor.fetchone()['good_id']
         return self.good_id
@@ -187,9 +262,9 @@ class Good:
         :return: Ничего
         """
         self.check_good_id()
+        self.refresh_correct_mark()
         update_time = time.time()
-        with sqlite3.connect(Config.db_pass) as connection:
-            connection.row_factory = sqlite3.Row
+        with DBConnection.connect() as connection:
             cursor = connection.cursor()
             cursor.execute("""UPDATE goods SET 
             description=?,
@@ -202,7 +277,8 @@ class Good:
             sub_category_id=?,
             shop_id=?,
             last_update_timestamp=?,
-            option=?
+            option=?,
+            correct_mark=?
             WHERE good_id=?
             """, (
                 self.description,
@@ -216,6 +292,7 @@ class Good:
                 self.shop_id,
                 update_time,
                 self.option,
+                self.correct_mark,
                 # WHERE
                 self.good_id
             ))
@@ -229,15 +306,14 @@ class Good:
         """
         self.active = 0
         self.check_good_id()
-        with sqlite3.connect(Config.db_pass) as connection:
-            connection.row_factory = sqlite3.Row
+        with DBConnection.connect() as connection:
             cursor = connection.cursor()
             cursor.execute("""UPDATE goods SET 
             active=0 WHERE good_id=?
             """, (self.good_id,))
 
     def __repr__(self):
-        return f"id: {self.good_id}, Brand: {self.brand}, model: {self.description}, start_price:{self.standard_price}, final_price:{self.final_price}, prices {self.prices}"
+        return f"id: {self.good_id}, Brand: {self.brand}, model: {self.description}, start_price:{self.standard_price}, final_price:{self.final_price}, prices {self.prices_str}"
 
     # def __eq__(self, other):
     #     if self.good_id == other
@@ -248,7 +324,11 @@ class GoodKeeper:
     Класс для управлением товарами. Запрос следующего, новых товаров и т.д.
     """
     TIMEOUT_FOR_TIMESTAMP = 60 * 60 * 24  # (сутки) время, которое актуальна цена
-    POINTER_BUFFER = 3  # если в массиве остается менее 3х значений - догружаем
+    POINTER_BUFFER = 3  # если впереди пользователя остается менее 3х товаров - догружаем (InventoryPrefetcher)
+    UPSERT_SELECT_CHUNK = 500  # сколько ссылок передавать в один SELECT ... IN (...) в upsert_many
+    REFRESH_BATCH = 30  # сколько устаревших товаров загружать с сайта параллельно (refresh_outdated_goods)
+
+    logger = logging.getLogger(__name__)
 
     def __init__(self):
         self.goods = [Good]  # массив объектов Good
@@ -261,8 +341,7 @@ class GoodKeeper:
         Создает таблицу goods в базе
         :return: None
         """
-        with sqlite3.connect(Config.db_pass) as connection:
-            connection.row_factory = sqlite3.Row
+        with DBConnection.connect() as connection:
             cursor = connection.cursor()
             cursor.execute("""CREATE TABLE IF NOT EXISTS goods (
                    good_id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -271,13 +350,14 @@ class GoodKeeper:
                    standard_price INTEGER,
                    final_price INTEGER,
                    image_links_str TEXT,
-                   link TEXT UNIQ,
+                   link TEXT,  -- уникальность обеспечивает индекс idx_goods_link (Migrations)
                    category_id INTEGER,
                    sub_category_id INTEGER,
                    option INTEGER DEFAULT 0,
                    shop_id INTEGER,
                    last_update_timestamp INTEGER,
                    active INTEGER DEFAULT 1,
+                   correct_mark INTEGER,  -- правильная оценка по ценам подкатегории (GoodKeeper.recompute_correct_marks)
                    
                    FOREIGN KEY (category_id) REFERENCES categories (category_id),
                    FOREIGN KEY (sub_category_id) REFERENCES sub_categories (sub_category_id),
@@ -291,8 +371,7 @@ class GoodKeeper:
         :param link: Ссылка на товар
         :return: массив найденных товаров
         """
-        with sqlite3.connect(Config.db_pass) as connection:
-            connection.row_factory = sqlite3.Row
+        with DBConnection.connect() as connection:
             cursor = connection.cursor()
             cursor.execute("""SELECT * FROM goods WHERE link=?""", (link,))
             items = cursor.fetchall()
@@ -301,6 +380,168 @@ class GoodKeeper:
             else:
                 return [Good(**item) for item in items]
 
+    @classmethod
+    def upsert_many(cls, goods: List[Good]) -> List[Good]:
+        """
+        Добавление или обновление пачки товаров одной транзакцией. Товар ищется по уникальной ссылке (индекс idx_goods_link):
+        новый добавляется, существующий обновляется. Пустой image_links_str (карточка поиска без изображения)
+        не затирает уже сохраненные изображения. Каждому товару из пачки заполняется good_id из базы
+        :param goods: массив товаров (например, все товары со страницы поиска)
+        :return: тот же массив товаров с заполненными good_id
+        """
+        if not goods:
+            return goods
+        update_time = time.time()
+        for good in goods:
+            good.refresh_correct_mark()
+        params = [(good.description,
+                   good.brand,
+                   good.standard_price,
+                   good.final_price,
+                   good.image_links_str,
+                   good.link,
+                   good.category_id,
+                   good.sub_category_id,
+                   good.shop_id,
+                   update_time,
+                   good.option,
+                   good.correct_mark) for good in goods]
+        links = list({good.link for good in goods})
+        ids = {}
+        with DBConnection.connect() as connection:
+            cursor = connection.cursor()
+            cursor.executemany("""INSERT INTO goods (
+            description,
+            brand,
+            standard_price,
+            final_price,
+            image_links_str,
+            link,
+            category_id,
+            sub_category_id,
+            shop_id,
+            last_update_timestamp,
+            option,
+            correct_mark
+             ) VALUES(?,?,?,?,?,?,?,?,?,?,?,?)
+             ON CONFLICT (link) DO UPDATE SET
+            description=excluded.description,
+            brand=excluded.brand,
+            standard_price=excluded.standard_price,
+            final_price=excluded.final_price,
+            image_links_str=CASE WHEN excluded.image_links_str='' THEN goods.image_links_str
+            ELSE excluded.image_links_str END,
+            category_id=excluded.category_id,
+            sub_category_id=excluded.sub_category_id,
+            shop_id=excluded.shop_id,
+            last_update_timestamp=excluded.last_update_timestamp,
+            option=excluded.option,
+            correct_mark=excluded.correct_mark""", params)
+            for start in range(0, len(links), cls.UPSERT_SELECT_CHUNK):
+                chunk = links[start:start + cls.UPSERT_SELECT_CHUNK]
+                cursor.execute(f"""SELECT good_id, link, image_links_str FROM goods
+                WHERE link IN ({','.join('?' * len(chunk))})""", chunk)
+                ids.update((item["link"], (item["good_id"], item["image_links_str"])) for item in cursor)
+        for good in goods:
+            good.good_id, image_links_str = ids[good.link]
+            if not good.image_links_str:
+                good.image_links_str = image_links_str
+            good.last_update_timestamp = update_time
+        return goods
+
+    @classmethod
+    def touch_goods(cls, goods: List[Good]) -> List[Good]:
+        """
+        Отмечает товары проверенными на сайте без изменения значений (страница товара не изменилась):
+        обновляется только last_update_timestamp, одной транзакцией
+        :param goods: массив товаров
+        :return: тот же массив товаров
+        """
+        if not goods:
+            return goods
+        update_time = time.time()
+        with DBConnection.connect() as connection:
+            connection.executemany("""UPDATE goods SET last_update_timestamp=? WHERE good_id=?""",
+                                   [(update_time, good.good_id) for good in goods])
+        for good in goods:
+            good.last_update_timestamp = update_time
+        return goods
+
+    @classmethod
+    def recompute_correct_marks(cls, sub_category_id: int = None) -> None:
+        """
+        Пересчитывает goods.correct_mark по ценам подкатегории одним UPDATE на подкатегорию.
+        Вызывается при изменении цен подкатегории (CategoriesPool.update_sub_category_prices) и в миграции.
+        Правильная оценка = сколько цен подкатегории не больше цены товара (то же, что bisect_right в Good)
+        :param sub_category_id: ID подкатегории. Если не указан - пересчитываются все подкатегории
+        :return: None
+        """
+        with DBConnection.connect() as connection:
+            cursor = connection.cursor()
+            if sub_category_id is None:
+                cursor.execute("""SELECT sub_category_id, price_values FROM sub_categories""")
+            else:
+                cursor.execute("""SELECT sub_category_id, price_values FROM sub_categories WHERE sub_category_id=?""",
+                               (sub_category_id,))
+            sub_categories = cursor.fetchall()
+            for item in sub_categories:
+                try:
+                    int_prices = parse_prices_str(item["price_values"])[1]
+                except ValueError:
+                    cls.logger.error(f"Invalid price_values in sub_category {item['sub_category_id']}")
+                    continue
+                marks_sql = " + ".join(["(COALESCE(NULLIF(standard_price, 0), final_price) >= ?)"] * len(int_prices)) or "0"
+                cursor.execute(f"""UPDATE goods SET correct_mark = {marks_sql} WHERE sub_category_id=?""",
+                               (*int_prices, item["sub_category_id"]))
+
+    @classmethod
+    def get_outdated_goods(cls, sub_category_id: int = None, option=0, after_good_id=0,
+                           limit: int = REFRESH_BATCH) -> List[Good]:
+        """
+        Активные товары, у которых истек Config.timeout_for_goods, по возрастанию good_id
+        :param sub_category_id: ID подкатегории. None - товары всех подкатегорий
+        :param option: option параметр (только вместе с sub_category_id)
+        :param after_good_id: вернуть товары с good_id больше этого
+        :param limit: сколько товаров вернуть
+        :return: массив товаров
+        """
+        where, params = "", ()
+        if sub_category_id is not None:
+            where, params = "and goods.sub_category_id=? and goods.option=?", (sub_category_id, option)
+        with DBConnection.connect() as connection:
+            cursor = connection.cursor()
+            cursor.execute(f"""SELECT goods.*, sub_categories.price_values AS prices_str
+            FROM goods JOIN sub_categories
+            ON sub_categories.sub_category_id = goods.sub_category_id
+            WHERE goods.active=1
+             and goods.last_update_timestamp<?
+             and goods.good_id>?
+             {where}
+             ORDER BY goods.good_id LIMIT ?""",
+                           (time.time() - Config.timeout_for_goods, after_good_id) + params + (limit,))
+            return [Good(**item) for item in cursor]
+
+    @classmethod
+    def refresh_outdated_goods(cls, sub_category_id: int = None, option=0, batch: int = REFRESH_BATCH) -> int:
+        """
+        Обновляет с сайта все устаревшие активные товары (get_outdated_goods) - пакетная версия
+        Good.check_good_timeout. Страницы товаров пачки загружаются параллельно (ParserController.update_goods),
+        пачки идут по возрастанию good_id, поэтому товар, который загрузить не удалось, за один вызов повторно
+        не запрашивается. Запускается по расписанию: python -m scripts.refresh_goods
+        :param sub_category_id: ID подкатегории. None - товары всех подкатегорий
+        :param option: option параметр (только вместе с sub_category_id)
+        :param batch: сколько товаров загружать параллельно
+        :return: количество обновленных товаров
+        """
+        from scripts.Parsers import ParserController
+        refreshed, last_good_id = 0, 0
+        while True:
+            goods = cls.get_outdated_goods(sub_category_id, option, after_good_id=last_good_id, limit=batch)
+            if not goods:
+                return refreshed
+            refreshed += len(ParserController.update_goods(goods))
+            last_good_id = goods[-1].good_id
+
     @classmethod
     def combine_duplicates(cls, link: str) -> Good:
         """
@@ -312,13 +553,13 @@ class GoodKeeper:
         goods = cls.get_goods_from_db_by_link(link)
         if len(goods) == 1:
             return goods[0]
+        HistoryWriter.flush()  # ответы из очереди должны попасть под перенос на target_good
         target_good = goods[0]
         ids_str = str(goods[1].good_id)
         if len(goods) > 2:
             for good in goods[2:]:
                 ids_str += f",{good.good_id}"
-        with sqlite3.connect(Config.db_pass) as connection:
-            connection.row_factory = sqlite3.Row
+        with DBConnection.connect() as connection:
             cursor = connection.cursor()
             history_request = """UPDATE history_of_marks SET good_id={id} WHERE good_id IN ({result_str})""".format(id=target_good.good_id, result_str=ids_str)
             cursor.execute(history_request)
@@ -326,6 +567,8 @@ class GoodKeeper:
             cursor.execute(users_request)
             goods_request = """DELETE FROM goods WHERE good_id IN ({result_str})""".format(result_str=ids_str)
             cursor.execute(goods_request)
+        from Data_models.history_of_choices_db import HistoryOfChoices
+        HistoryOfChoices.rebuild_mark_counts([target_good.good_id])  # история дублей теперь у target_good
         return target_good
 
     @classmethod
@@ -337,8 +580,7 @@ class GoodKeeper:
         """
         if good_id < 0:
             raise ValueError(f"ID товара меньше 0 ({good_id}). Запрос в базу не отправлен")
-        with sqlite3.connect(Config.db_pass) as connection:
-            connection.row_factory = sqlite3.Row
+        with DBConnection.connect() as connection:
             cursor = connection.cursor()
             cursor.execute(
                 """SELECT goods.*, sub_categories.price_values AS prices_str 
@@ -352,56 +594,85 @@ class GoodKeeper:
             return Good(**item)
 
     @classmethod
-    def get_next_good_by_sub_category_id(cls, sub_category_id, offset, option=0, inner=0) -> Good:
+    def get_next_good_by_sub_category_id(cls, sub_category_id, last_good_id, option=0, inner=0) -> Good:
         """
-        Получить следующий товар для пользователя по подкатегории, смещению и option
+        Получить следующий товар для пользователя по подкатегории, курсору и option.
+        Следующий товар - первый активный с good_id больше курсора (поиск по индексу, а не LIMIT/OFFSET)
         :param sub_category_id: ID подкатеории
-        :param offset: смещение, относительно всех товаров подкатегории
+        :param last_good_id: курсор - ID последнего выданного пользователю товара (0 - с начала подкатегории)
         :param option: опциональный параметр
         :param inner: внутренний параметр для исключения бесконечного цикла. Всего запросов может быть 3
         :return: Заполненный экземпляр класса Good - товар
         """
-        if sub_category_id < 0 or offset < 0:
-            raise ValueError(f"Не корректные данные sub_category_id: {sub_category_id}, offset: {offset}")
+        if sub_category_id < 0:
+            raise ValueError(f"Не корректные данные sub_category_id: {sub_category_id}, last_good_id: {last_good_id}")
         if inner > 2:
-            raise ValueError(f"Не удалось достать новый товар для подкатегории: {sub_category_id}, смещение:{offset}, option: {option}")
-        item = None
-        with sqlite3.connect(Config.db_pass) as connection:
-            connection.row_factory = sqlite3.Row
+            raise ValueError(f"Не удалось достать новый товар для подкатегории: {sub_category_id}, курсор:{last_good_id}, option: {option}")
+        from scripts.inventory_prefetcher import InventoryPrefetcher
+        item = cls._select_next_good(sub_category_id, last_good_id, option)
+        if not item:  # товары закончились: на сайт идет фоновый InventoryPrefetcher, здесь только ждем его
+            InventoryPrefetcher.wait_for_goods(sub_category_id, option, last_good_id)
+            item = cls._select_next_good(sub_category_id, last_good_id, option)
+            if not item:  # докачались только товары, которые пользователь уже видел
+                raise ValueError(f"No goods was found by category:{sub_category_id}")
+        good = Good(**item)
+        InventoryPrefetcher.notify(sub_category_id, option, good.good_id)  # докачать заранее, если запас мал
+        if good.image_links_str == "":
+            try:
+                good.refresh_good_from_site()
+            except InvalidGood as error:
+                good.deactivate()
+                inner += 1
+                good = cls.get_next_good_by_sub_category_id(sub_category_id, last_good_id, option, inner)
+        return good
+
+    @classmethod
+    def _select_next_good(cls, sub_category_id, last_good_id, option=0):
+        """
+        Первый активный товар подкатегории после курсора
+        :return: строка из базы или None
+        """
+        with DBConnection.connect() as connection:
             cursor = connection.cursor()
             if option:  # Поиск с указанием option переменной
                 cursor.execute("""SELECT goods.*, sub_categories.price_values AS prices_str 
                     FROM goods JOIN sub_categories 
                     ON sub_categories.sub_category_id = goods.sub_category_id
                     WHERE goods.sub_category_id=?
-                     and goods.active=1 
                      and goods.option=? 
-                     LIMIT 1 OFFSET ?""",
-                               (sub_category_id, option, offset))
+                     and goods.active=1 
+                     and goods.good_id>? 
+                     ORDER BY goods.good_id LIMIT 1""",
+                               (sub_category_id, option, last_good_id))
             else:  # поиск без указания option переменной
                 cursor.execute("""SELECT goods.*, sub_categories.price_values AS prices_str 
                                     FROM goods JOIN sub_categories 
                                     ON sub_categories.sub_category_id = goods.sub_category_id
                                     WHERE goods.sub_category_id=?
                                      and goods.active=1 
-                                     LIMIT 1 OFFSET ?""",
-                               (sub_category_id, offset))
+                                     and goods.good_id>? 
+                                     ORDER BY goods.good_id LIMIT 1""",
+                               (sub_category_id, last_good_id))
 
-            item = cursor.fetchone()
-            good = None
-        if not item:
-            from scripts.Parsers import ParserController
-            good = ParserController.add_new_goods(sub_category_id, option)
-        else:
-            good = Good(**item)
-        if good.image_links_str == "":
-            try:
-                good.refresh_good_from_site()
-            except InvalidGood as error:
-                good.deactivate()
-                inner += 1
-                good = cls.get_next_good_by_sub_category_id(sub_category_id, offset, option, inner)
-        return good
+            return cursor.fetchone()
+
+    @classmethod
+    def count_unseen_goods(cls, sub_category_id: int, last_good_id: int, option=0, limit=100) -> int:
+        """
+        Сколько активных товаров подкатегории осталось после курсора (считает не больше limit - по индексу)
+        :param sub_category_id: ID подкатегории
+        :param last_good_id: курсор - ID последнего выданного товара
+        :param option: option параметр (0 - без учета option, как в get_next_good_by_sub_category_id)
+        :param limit: до скольких считать
+        :return: количество товаров
+        """
+        option_filter = "and option=?" if option else ""
+        params = (sub_category_id, option, last_good_id, limit) if option else (sub_category_id, last_good_id, limit)
+        with DBConnection.connect() as connection:
+            cursor = connection.cursor()
+            cursor.execute(f"""SELECT count(*) FROM (SELECT 1 FROM goods
+            WHERE sub_category_id=? {option_filter} and active=1 and good_id>? LIMIT ?)""", params)
+            return cursor.fetchone()[0]
 
 
 class InvalidGood(ValueError):
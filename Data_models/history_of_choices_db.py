@@ -1,6 +1,7 @@
-import sqlite3
 import time
 from config import Config
+from Data_models.db_connection import DBConnection
+from Data_models.history_writer import HistoryWriter
 from typing import List
 from Data_models.goods_db import Good, GoodKeeper
 
@@ -42,8 +43,7 @@ class HistoryOfChoices:
         Создание таблицы
         :return: None
         """
-        with sqlite3.connect(Config.db_pass) as connection:
-            connection.row_factory = sqlite3.Row  # Позволяет обращаться по названию столбца к значению
+        with DBConnection.connect() as connection:
             cursor = connection.cursor()
             cursor.execute(f"""CREATE TABLE IF NOT EXISTS {Config.history_table_name} (
             chose_id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -56,10 +56,27 @@ class HistoryOfChoices:
             timestamp INTEGER
             )""")
 
+    @classmethod
+    def create_mark_counts_table(cls) -> None:
+        """
+        Создание таблицы счетчиков оценок по товарам. Обновляется вместе с историей в add_user_choice,
+        чтобы статистика по товару читалась по первичному ключу без GROUP BY по всей истории
+        :return: None
+        """
+        with DBConnection.connect() as connection:
+            cursor = connection.cursor()
+            cursor.execute("""CREATE TABLE IF NOT EXISTS good_mark_counts (
+            good_id INTEGER,
+            mark INTEGER,
+            marks_count INTEGER DEFAULT 0,
+            PRIMARY KEY (good_id, mark)
+            ) WITHOUT ROWID""")
+
     @classmethod
     def add_user_choice(cls, user_id: int, good_id: int, mark: int, correct_mark: int, sub_category_id: int, option=0) -> None:
         """
-        Добавление строки с пользовательским выбором цен
+        Добавление строки с пользовательским выбором цен и увеличение счетчика оценок товара.
+        Строка ставится в очередь HistoryWriter и записывается в базу пачкой в фоне
         :param user_id: ID пользователя
         :param good_id: ID товара
         :param mark: оценка пользователем
@@ -68,55 +85,52 @@ class HistoryOfChoices:
         :param option: option параметр
         :return: None
         """
-        with sqlite3.connect(Config.db_pass) as connection:
-            connection.row_factory = sqlite3.Row
-            cursor = connection.cursor()
-            timestamp = time.time()
-            cursor.execute("""INSERT INTO {history_table_name}
-            (user_id,
-            good_id,
-            mark,
-            correct_mark,
-            sub_category_id,
-            option,
-            timestamp)
-            VALUES (?,?,?,?,?,?,?)""".format(history_table_name=Config.history_table_name),
-                           (user_id, good_id, mark, correct_mark, sub_category_id, option, timestamp))
+        HistoryWriter.append(user_id=user_id, good_id=good_id, mark=mark, correct_mark=correct_mark,
+                             sub_category_id=sub_category_id, option=option)
 
     @classmethod
     def get_marks_for_good(cls, good_id: int, total_marks_length) -> List[int]:
         """
-        Ищет все выборы оценок пользователей для данного товара и возвращает массив с количеством выборов для каждой оценки
+        Возвращает массив с количеством выборов пользователей для каждой оценки товара.
+        Читается из счетчиков good_mark_counts по первичному ключу плюс еще не записанные ответы из очереди HistoryWriter
         :param good_id: ID товара
         :param total_marks_length: Сколько оценок нужно вернуть (такая будет длинна масива)
         :return: Массив с количеством выборов пользователей для каждой цены
         """
         if good_id < 0:
             raise ValueError(f"good_id is less then zero. good_id: {good_id}")
-        with sqlite3.connect(Config.db_pass) as connection:
-            connection.row_factory = sqlite3.Row
-            cursor = connection.cursor()
-            cursor.execute(
-                f"""SELECT mark, count(mark) FROM {Config.history_table_name} WHERE good_id=? GROUP BY mark""",
-                (good_id,))
-            items = cursor.fetchall()
-        current_mark = 0
-        result = []
-        for item in items:
-            mark = item["mark"]
-            value = item["count(mark)"]
-            if mark > current_mark:
-                for i in range(current_mark, mark):
-                    result.append(0)
-                    current_mark += 1
-            if mark == current_mark:
-                result.append(value)
-                current_mark += 1
-        if len(result) < total_marks_length:
-            for i in range(len(result), total_marks_length):
-                result.append(0)
+        result = [0] * total_marks_length
+        with HistoryWriter.read_lock():
+            marks_counts = HistoryWriter.pending_marks(good_id)  # еще не записанные ответы тоже учитываем
+            with DBConnection.connect() as connection:
+                cursor = connection.cursor()
+                cursor.execute("""SELECT mark, marks_count FROM good_mark_counts WHERE good_id=?""", (good_id,))
+                for item in cursor:
+                    marks_counts[item["mark"]] += item["marks_count"]
+        for mark, marks_count in marks_counts.items():
+            if 0 <= mark < total_marks_length:
+                result[mark] = marks_count
         return result
 
+    @classmethod
+    def rebuild_mark_counts(cls, good_ids: List[int] = None) -> None:
+        """
+        Пересчитывает счетчики good_mark_counts по истории выборов
+        :param good_ids: ID товаров для пересчета. Если не указаны - пересчитываются все товары
+        :return: None
+        """
+        where = ""
+        params = ()
+        if good_ids is not None:
+            where = f"WHERE good_id IN ({','.join('?' * len(good_ids))})"
+            params = tuple(good_ids)
+        HistoryWriter.flush()
+        with DBConnection.connect() as connection:
+            cursor = connection.cursor()
+            cursor.execute(f"""DELETE FROM good_mark_counts {where}""", params)
+            cursor.execute(f"""INSERT INTO good_mark_counts (good_id, mark, marks_count)
+            SELECT good_id, mark, count(*) FROM {Config.history_table_name} {where} GROUP BY good_id, mark""", params)
+
     @classmethod
     def get_history_by_user_id(cls, user_id: int) -> List[Choice]:
         """
@@ -126,8 +140,8 @@ class HistoryOfChoices:
         """
         if user_id < 0:
             raise ValueError(f"User_id is less then zero. user_id: {user_id}")
-        with sqlite3.connect(Config.db_pass) as connection:
-            connection.row_factory = sqlite3.Row
+        HistoryWriter.flush()
+        with DBConnection.connect() as connection:
             cursor = connection.cursor()
             cursor.execute(f"""SELECT * FROM {Config.history_table_name} WHERE user_id=?""", (user_id,))
             results = [Choice(*item) for item in cursor]
@@ -0,0 +1,222 @@
+import atexit
+import logging
+import sqlite3
+import threading
+import time
+
+from collections import Counter
+from contextlib import contextmanager
+from typing import List, Tuple
+from config import Config
+from Data_models.db_connection import DBConnection
+
+
+class HistoryWriter:
+    """
+    Очередь записи истории выборов с групповым коммитом.
+    append() только кладет строку в очередь в памяти, фоновый поток записывает накопленное одной транзакцией -
+    раз в FLUSH_INTERVAL секунд или сразу, как набралось BATCH_SIZE строк. Вместе с историей в той же транзакции
+    увеличиваются счетчики good_mark_counts.
+    Очередь ограничена MAX_QUEUE строками: если фоновая запись не успевает, append() ждет места в очереди
+    до QUEUE_TIMEOUT секунд, а потом отказывает (RuntimeError) - очередь не растет без предела.
+    Временные ошибки записи (например, database is locked) строки не теряют: строки остаются в очереди, запись
+    повторяется с растущей паузой (RETRY_DELAY_BASE..RETRY_DELAY_MAX). Если пачку отвергла сама база (DROP_ERRORS,
+    например, нарушение ограничения), она записывается по одной строке, и в лог уходят только строки, которые
+    не записываются никогда - одна плохая строка не останавливает запись остальных.
+    Чтение истории (смещение пользователя, история выборов) сначала вызывает flush(), а статистика оценок
+    добавляет к счетчикам из базы еще не записанные ответы (pending_marks) - так пользователь всегда видит свои
+    последние ответы, а ответ на кнопку не ждет записи на диск. При остановке (stop() или выход из процесса)
+    очередь записывается целиком.
+    """
+    BATCH_SIZE = 500  # сколько строк набрать, чтобы записать не дожидаясь FLUSH_INTERVAL
+    MAX_QUEUE = 10000  # предел очереди в памяти
+    QUEUE_TIMEOUT = 5.0  # (сек) сколько append() ждет места в заполненной очереди
+    FLUSH_INTERVAL = 0.2  # (сек) как часто записывать очередь
+    RETRY_DELAY_BASE = 0.2  # (сек) пауза фоновой записи после первой ошибки, дальше удваивается
+    RETRY_DELAY_MAX = 5.0  # (сек) предел паузы
+    DROP_ERRORS = (sqlite3.IntegrityError, sqlite3.InterfaceError)  # строка не запишется и при повторе
+
+    logger = logging.getLogger(__name__)
+    _queue = []  # строки (user_id, good_id, mark, correct_mark, sub_category_id, option, timestamp)
+    _lock = threading.Lock()
+    _space = threading.Condition(_lock)  # в очереди освободилось место
+    _write_lock = threading.Lock()  # очередь записывает один поток
+    _flush_lock = threading.Lock()  # транзакция записи и чтение (read_lock) не пересекаются
+    _wakeup = threading.Event()
+    _stop_event = threading.Event()
+    _flusher = None
+    _failures = 0  # неудачных записей подряд
+    _suspect = 0  # сколько строк в начале очереди записывать по одной (пачку с ними отвергла база)
+
+    @classmethod
+    def append(cls, user_id: int, good_id: int, mark: int, correct_mark: int, sub_category_id: int, option=0) -> None:
+        """
+        Ставит выбор пользователя в очередь на запись
+        :param user_id: ID пользователя
+        :param good_id: ID товара
+        :param mark: оценка пользователем
+        :param correct_mark: верная оценка для товара
+        :param sub_category_id: ID подкатегории
+        :param option: option параметр
+        :return: None
+        """
+        cls.start()
+        with cls._space:
+            if len(cls._queue) >= cls.MAX_QUEUE:
+                cls._wakeup.set()  # фоновая запись не успевает - ждем, пока она освободит место
+                if not cls._space.wait_for(lambda: len(cls._queue) < cls.MAX_QUEUE, cls.QUEUE_TIMEOUT):
+                    raise RuntimeError(f"History queue is full: {len(cls._queue)} rows are not written")
+            cls._queue.append((user_id, good_id, mark, correct_mark, sub_category_id, option, time.time()))
+            queue_length = len(cls._queue)
+        if queue_length >= cls.BATCH_SIZE:
+            cls._wakeup.set()
+
+    @classmethod
+    def flush(cls) -> int:
+        """
+        Записывает очередь в базу одной транзакцией. При ошибке строки остаются в очереди и ошибка пробрасывается,
+        если пачку отвергла база (DROP_ERRORS) - строки записываются по одной (_write_each)
+        :return: количество записанных строк
+        """
+        with cls._write_lock:
+            try:
+                written = cls._write_each() if cls._suspect else cls._write_queue()
+            except Exception:
+                cls._failures += 1
+                cls.logger.exception(f"Failed to write history rows ({cls._failures} times in a row), will retry")
+                raise
+            cls._failures = 0
+        with cls._space:
+            cls._space.notify_all()
+        return written
+
+    @classmethod
+    def _write_queue(cls) -> int:
+        """
+        Запись всей очереди одной транзакцией
+        :return: количество записанных строк
+        """
+        with cls._flush_lock:
+            with cls._lock:
+                rows, cls._queue[:] = cls._queue[:], []
+            if not rows:
+                return 0
+            try:
+                cls._write(rows)
+                return len(rows)
+            except Exception as error:
+                with cls._lock:
+                    cls._queue[:0] = rows
+                if not isinstance(error, cls.DROP_ERRORS):
+                    raise
+                cls.logger.warning(f"{len(rows)} history rows are rejected: {error!r}, writing them one by one")
+                cls._suspect = len(rows)
+        return cls._write_each()  # уже без _flush_lock: чтение ждет только запись одной строки
+
+    @classmethod
+    @contextmanager
+    def read_lock(cls):
+        """
+        На время чтения не дает начать запись очереди: строка видна либо в базе, либо в pending_marks, но не дважды
+        """
+        with cls._flush_lock:
+            yield
+
+    @classmethod
+    def pending_marks(cls, good_id: int) -> Counter:
+        """
+        Еще не записанные в базу оценки товара. Вызывать внутри read_lock()
+        :param good_id: ID товара
+        :return: Counter оценка -> количество
+        """
+        with cls._lock:
+            return Counter(row[2] for row in cls._queue if row[1] == good_id)
+
+    @classmethod
+    def _write(cls, rows: List[Tuple]) -> None:
+        """
+        Запись строк истории и счетчиков оценок в одной транзакции
+        :param rows: строки очереди
+        :return: None
+        """
+        marks_counts = Counter((row[1], row[2]) for row in rows)
+        with DBConnection.connect() as connection:
+            cursor = connection.cursor()
+            cursor.executemany(f"""INSERT INTO {Config.history_table_name}
+            (user_id,
+            good_id,
+            mark,
+            correct_mark,
+            sub_category_id,
+            option,
+            timestamp)
+            VALUES (?,?,?,?,?,?,?)""", rows)
+            cursor.executemany("""INSERT INTO good_mark_counts (good_id, mark, marks_count) VALUES (?,?,?)
+            ON CONFLICT (good_id, mark) DO UPDATE SET marks_count=marks_count+excluded.marks_count""",
+                               [(good_id, mark, count) for (good_id, mark), count in marks_counts.items()])
+
+    @classmethod
+    def _write_each(cls) -> int:
+        """
+        Запись по одной первых _suspect строк очереди, каждая в своей транзакции. Строка, которую база отвергла
+        (DROP_ERRORS), уходит в лог и из очереди удаляется, при других ошибках строка остается в очереди
+        :return: количество записанных строк
+        """
+        written = 0
+        while cls._suspect:
+            with cls._flush_lock:
+                with cls._lock:
+                    row = cls._queue[0]
+                try:
+                    cls._write([row])
+                    written += 1
+                except cls.DROP_ERRORS as error:
+                    cls.logger.error(f"History row is dropped: {row}, error: {error!r}")
+                with cls._lock:
+                    del cls._queue[0]
+                cls._suspect -= 1
+        return written
+
+    @classmethod
+    def start(cls) -> None:
+        """
+        Запускает фоновый поток записи (если еще не запущен)
+        :return: None
+        """
+        with cls._lock:
+            if cls._flusher and cls._flusher.is_alive():
+                return
+            cls._stop_event.clear()
+            cls._flusher = threading.Thread(target=cls._flush_loop, name="HistoryWriter", daemon=True)
+            cls._flusher.start()
+
+    @classmethod
+    def stop(cls) -> None:
+        """
+        Останавливает фоновый поток и записывает остаток очереди
+        :return: None
+        """
+        cls._stop_event.set()
+        cls._wakeup.set()
+        flusher = cls._flusher
+        if flusher and flusher is not threading.current_thread():
+            flusher.join()
+        cls.flush()
+
+    @classmethod
+    def _flush_loop(cls) -> None:
+        """
+        Цикл фонового потока записи
+        :return: None
+        """
+        while not cls._stop_event.is_set():
+            cls._wakeup.wait(cls.FLUSH_INTERVAL)
+            cls._wakeup.clear()
+            try:
+                cls.flush()
+            except Exception:  # уже залогировано в flush, строки остались в очереди - повторяем после паузы
+                delay = cls.RETRY_DELAY_BASE * 2 ** min(cls._failures - 1, 16)
+                cls._stop_event.wait(min(cls.RETRY_DELAY_MAX, delay))
+
+
+atexit.register(HistoryWriter.stop)
@@ -0,0 +1,210 @@
+import logging
+
+from config import Config
+from Data_models.db_connection import DBConnection
+from Data_models.categories_db import CategoriesPool
+from Data_models.current_search_pages import NextSearchPages
+from Data_models.goods_db import GoodKeeper
+from Data_models.good_images_db import GoodImages
+from Data_models.history_of_choices_db import HistoryOfChoices
+from Data_models.history_writer import HistoryWriter
+from Data_models.shops_db import Shop
+from Data_models.user_db import User
+from Data_models.user_cursors_db import UserCursors
+
+
+class Migrations:
+    """
+    Версионные миграции схемы базы. Текущая версия схемы хранится в PRAGMA user_version.
+    Каждая миграция - метод _migration_N, выполняется один раз при переходе с версии N-1 на N.
+    Миграции должны быть идемпотентными: если процесс упал посреди миграции, она выполнится повторно.
+    """
+    logger = logging.getLogger(__name__)
+
+    @classmethod
+    def migrations(cls) -> list:
+        """
+        Список миграций по порядку. Номер версии = позиция в списке + 1
+        :return: массив методов миграций
+        """
+        return [
+            cls._migration_1,
+            cls._migration_2,
+            cls._migration_3,
+            cls._migration_4,
+            cls._migration_5,
+            cls._migration_6,
+            cls._migration_7,
+            cls._migration_8,
+            cls._migration_9,
+        ]
+
+    @classmethod
+    def get_version(cls) -> int:
+        """
+        Текущая версия схемы базы
+        :return: номер последней примененной миграции (0 - пустая или старая база)
+        """
+        with DBConnection.connect() as connection:
+            return connection.execute("PRAGMA user_version").fetchone()[0]
+
+    @classmethod
+    def migrate(cls) -> int:
+        """
+        Применяет все недостающие миграции. Вызывается при старте бота
+        :return: версия схемы после миграции
+        """
+        HistoryWriter.flush()  # миграции переписывают историю - очередь ответов записываем до них
+        migrations = cls.migrations()
+        version = cls.get_version()
+        for number in range(version + 1, len(migrations) + 1):
+            cls.logger.info(f"Applying DB migration {number}")
+            migrations[number - 1]()
+            with DBConnection.connect() as connection:
+                connection.execute(f"PRAGMA user_version = {number}")
+            version = number
+        with DBConnection.connect() as connection:
+            connection.execute("PRAGMA optimize")
+        return version
+
+    @classmethod
+    def _migration_1(cls) -> None:
+        """
+        Базовая схема: все таблицы из create_table(s) классов Data_models.
+        Таблицы, добавленные позже, создаются и здесь, и в своей миграции - для баз, которые уже прошли эту версию
+        :return: None
+        """
+        CategoriesPool.create_tables()
+        CategoriesPool.create_catalog_version_table()
+        Shop.create_table()
+        GoodKeeper.create_table()
+        User.create_table()
+        HistoryOfChoices.create_table()
+        HistoryOfChoices.create_mark_counts_table()
+        NextSearchPages.create_table()
+        UserCursors.create_table()
+        cls._create_http_cache_table()
+
+    @classmethod
+    def _migration_2(cls) -> None:
+        """
+        Индексы для горячих запросов и настоящий UNIQUE на goods.link (в create_table был UNIQ - не ограничение).
+        Перед созданием уникального индекса объединяются уже накопившиеся дубли товаров
+        :return: None
+        """
+        with DBConnection.connect() as connection:
+            cursor = connection.cursor()
+            # дубли объединяются на самый старый товар, как в GoodKeeper.combine_duplicates, но для всех ссылок за один проход
+            cursor.execute("""SELECT min(good_id) AS target_id, group_concat(good_id) AS ids FROM goods
+            WHERE link IS NOT NULL GROUP BY link HAVING count(*) > 1""")
+            duplicates = {int(good_id): item["target_id"] for item in cursor.fetchall()
+                          for good_id in item["ids"].split(",") if int(good_id) != item["target_id"]}
+            params = list(duplicates.items())
+            cursor.executemany(f"""UPDATE {Config.history_table_name} SET good_id=? WHERE good_id=?""",
+                               [(target_id, good_id) for good_id, target_id in params])
+            cursor.executemany(f"""UPDATE {Config.user_table_name} SET current_good_id=? WHERE current_good_id=?""",
+                               [(target_id, good_id) for good_id, target_id in params])
+            cursor.executemany("""DELETE FROM goods WHERE good_id=?""", [(good_id,) for good_id in duplicates])
+        if duplicates:
+            HistoryOfChoices.rebuild_mark_counts(sorted(set(duplicates.values())))
+        with DBConnection.connect() as connection:
+            cursor = connection.cursor()
+            cursor.execute("""CREATE UNIQUE INDEX IF NOT EXISTS idx_goods_link ON goods (link)""")
+            # следующий товар по подкатегории с option и без него
+            cursor.execute("""CREATE INDEX IF NOT EXISTS idx_goods_sub_category_option_active
+            ON goods (sub_category_id, option, active)""")
+            cursor.execute("""CREATE INDEX IF NOT EXISTS idx_goods_sub_category_active
+            ON goods (sub_category_id, active)""")
+            # статистика оценок по товару и смещение пользователя - покрывающие индексы
+            cursor.execute(f"""CREATE INDEX IF NOT EXISTS idx_history_good_mark
+            ON {Config.history_table_name} (good_id, mark)""")
+            cursor.execute(f"""CREATE INDEX IF NOT EXISTS idx_history_user_sub_category_option
+            ON {Config.history_table_name} (user_id, sub_category_id, option)""")
+            cursor.execute(f"""CREATE INDEX IF NOT EXISTS idx_users_telegram_id
+            ON {Config.user_table_name} (telegram_id)""")
+            cursor.execute("""CREATE INDEX IF NOT EXISTS idx_sub_categories_main_category_option
+            ON sub_categories (main_category_id, option)""")
+            cursor.execute("""CREATE INDEX IF NOT EXISTS idx_next_shop_pages_sub_category
+            ON next_shop_pages (sub_category_id, shop_id, option)""")
+
+    @classmethod
+    def _migration_3(cls) -> None:
+        """
+        Курсоры пользователей для выдачи следующего товара вместо OFFSET. Заполняются из истории выборов
+        :return: None
+        """
+        UserCursors.create_table()
+        UserCursors.fill_from_history()
+
+    @classmethod
+    def _migration_4(cls) -> None:
+        """
+        Счетчики оценок по товарам good_mark_counts. Заполняются по существующей истории
+        :return: None
+        """
+        HistoryOfChoices.create_mark_counts_table()
+        HistoryOfChoices.rebuild_mark_counts()
+
+    @classmethod
+    def _migration_5(cls) -> None:
+        """
+        Версия каталога категорий с триггерами - для снимка каталога в памяти (CategoriesPool.get_catalog)
+        :return: None
+        """
+        CategoriesPool.create_catalog_version_table()
+
+    @classmethod
+    def _migration_6(cls) -> None:
+        """
+        Сохраненная правильная оценка товара goods.correct_mark. Заполняется по текущим ценам подкатегорий
+        :return: None
+        """
+        with DBConnection.connect() as connection:
+            cursor = connection.cursor()
+            columns = [item["name"] for item in cursor.execute("PRAGMA table_info(goods)")]
+            if "correct_mark" not in columns:  # в новой базе колонка уже создана в GoodKeeper.create_table
+                cursor.execute("""ALTER TABLE goods ADD COLUMN correct_mark INTEGER""")
+        GoodKeeper.recompute_correct_marks()
+
+    @classmethod
+    def _migration_7(cls) -> None:
+        """
+        Кэш условных запросов к страницам товаров http_cache (Crawler.http_cache.HttpCache)
+        :return: None
+        """
+        cls._create_http_cache_table()
+
+    @classmethod
+    def _migration_8(cls) -> None:
+        """
+        Одна строка next_shop_pages на поиск (подкатегория, магазин, option) - для записи адреса одним upsert
+        :return: None
+        """
+        NextSearchPages.create_unique_index()
+
+    @classmethod
+    def _migration_9(cls) -> None:
+        """
+        file_id отправленных фотографий товаров good_images (Data_models.good_images_db.GoodImages)
+        :return: None
+        """
+        GoodImages.create_table()
+
+    @classmethod
+    def _create_http_cache_table(cls) -> None:
+        """
+        Таблица http_cache: ETag, Last-Modified и sha256 тела страницы по адресу
+        :return: None
+        """
+        with DBConnection.connect() as connection:
+            connection.execute("""CREATE TABLE IF NOT EXISTS http_cache (
+            url TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            content_hash TEXT,
+            checked_timestamp INTEGER
+            )""")
+
+
+if __name__ == "__main__":
+    print(f"DB schema version: {Migrations.migrate()}")
@@ -1,5 +1,4 @@
-import sqlite3
-from config import Config
+from Data_models.db_connection import DBConnection
 
 
 class Shop:
@@ -17,8 +16,7 @@ class Shop:
         Создание таблицы магазинов
         :return:
         """
-        with sqlite3.connect(Config.db_pass) as connection:
-            connection.row_factory = sqlite3.Row  # Позволяет обращаться по названию столбца к значению
+        with DBConnection.connect() as connection:
             cursor = connection.cursor()
             cursor.execute("""CREATE TABLE IF NOT EXISTS shops (
             shop_id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -36,8 +34,7 @@ class Shop:
         :param name: имя магазина (опционально - одно из двух)
         :return: строка - ссылка
         """
-        with sqlite3.connect(Config.db_pass) as connection:
-            connection.row_factory = sqlite3.Row  # Позволяет обращаться по названию столбца к значению
+        with DBConnection.connect() as connection:
             cursor = connection.cursor()
             cursor.execute("""SELECT * FROM shops WHERE shop_id=? OR name=?""",
                            (shop_id, name))
@@ -1,10 +1,14 @@
+import sqlite3
 import time
 
 from unittest import TestCase
 from unittest.mock import patch, MagicMock
 
 from config import Config
+from Data_models.db_connection import DBConnection
+from Data_models.db_test_case import DBTestCase
 from Data_models.categories_db import CategoriesPool, Category, SubCategory
+from Data_models.goods_db import Good
 
 
 class TestSubCategory(TestCase):
@@ -92,4 +96,54 @@ class TestCategoriesPool(TestCase):
         self.assertEqual(expect, result)
 
 
+class TestCatalogSnapshot(DBTestCase):
+    def setUp(self):
+        self.old_staleness = CategoriesPool.CATALOG_MAX_STALENESS
+        super().setUp()
+        self.add_catalog()
+
+    def tearDown(self):
+        CategoriesPool.CATALOG_MAX_STALENESS = self.old_staleness
+        CategoriesPool.invalidate_catalog()
+
+    def test_int_prices(self):
+        sub_category = CategoriesPool.get_sub_category_by_id(1, 1)
+        self.assertEqual((5000, 10000, 30000), sub_category.int_prices)
+
+    def test_good_prices_from_snapshot(self):
+        sub_category = CategoriesPool.get_sub_category_by_id(1, 1)
+        for prices_str in ("5000, 10000, 30000", ""):
+            good = Good(sub_category_id=1, option=1, prices_str=prices_str)
+            self.assertIs(sub_category.int_prices, good.int_prices)
+            self.assertEqual(["5000", "10000", "30000"], good.prices_list)
+        good = Good(sub_category_id=1, option=1, prices_str="700, 900")
+        self.assertEqual((700, 900), good.int_prices)
+
+    def test_invalid_prices_skipped(self):
+        with DBConnection.connect() as connection:
+            connection.execute("""INSERT INTO sub_categories (sub_category_id, text_value, main_category_id, option, price_values)
+            VALUES (2, 'Парки', 2, 1, '5000, дорого')""")
+        self.assertEqual([1], [sub_category.id for sub_category in CategoriesPool.get_sub_categories(2, 1)])
+        with self.assertRaises(ValueError):
+            CategoriesPool.get_sub_category_by_id(2, 1)
+
+    def test_catalog_cached(self):
+        self.assertIs(CategoriesPool.get_catalog(), CategoriesPool.get_catalog())
 
+    def test_add_sub_category_visible_at_once(self):
+        CategoriesPool.get_sub_categories(2, 1)
+        CategoriesPool.add_sub_category(2, "Парки", ["7000", "20000"])
+        self.assertEqual(["Парки"], [x.text_value for x in CategoriesPool.get_sub_categories(2, 0)])
+
+    def test_add_sub_category_not_number_prices(self):
+        with self.assertRaises(ValueError):
+            CategoriesPool.add_sub_category(2, "Парки", ["дорого"])
+
+    def test_other_process_change_bounded_staleness(self):
+        CategoriesPool.CATALOG_MAX_STALENESS = 3600
+        CategoriesPool.get_sub_categories(2, 1)
+        with sqlite3.connect(Config.db_pass) as connection:  # другой процесс бота
+            connection.execute("UPDATE sub_categories SET text_value='Пуховики' WHERE sub_category_id=1")
+        self.assertEqual("Куртки", CategoriesPool.get_sub_category_by_id(1, 1).text_value)
+        CategoriesPool.CATALOG_MAX_STALENESS = 0
+        self.assertEqual("Пуховики", CategoriesPool.get_sub_category_by_id(1, 1).text_value)
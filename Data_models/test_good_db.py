@@ -1,9 +1,9 @@
 import time
 from unittest import TestCase
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 
-import scripts.Parsers
 from goods_db import Good, GoodKeeper, InvalidGood
+from scripts.inventory_prefetcher import InventoryPrefetcher
 from config import Config
 
 
@@ -74,15 +74,15 @@ class TestGood(TestCase):
         self.assertEqual(len(result), valid_images_list_len)
 
     def test_check_good_timeout_timouted(self):
-        self.test_good.refresh_good_from_site = MagicMock(name='refresh_good_from_site')
-        self.test_good.check_good_timeout()
-        self.test_good.refresh_good_from_site.assert_called()
+        with patch.object(Good, 'refresh_good_from_site') as refresh_good_from_site:
+            self.test_good.check_good_timeout()
+            refresh_good_from_site.assert_called()
 
     def test_check_good_timeout_no_need(self):
         self.test_good.last_update_timestamp = time.time()-60
-        self.test_good.refresh_good_from_site = MagicMock(name='refresh_good_from_site')
-        self.test_good.check_good_timeout()
-        self.test_good.refresh_good_from_site.assert_not_called()
+        with patch.object(Good, 'refresh_good_from_site') as refresh_good_from_site:
+            self.test_good.check_good_timeout()
+            refresh_good_from_site.assert_not_called()
 
     def test_refresh_good_from_site_correct(self):
         self.test_good.refresh_good_from_site()
@@ -97,19 +97,41 @@ class TestGood(TestCase):
         with self.assertRaises(InvalidGood):
             result = self.empty_good.prices_list
 
+    def test_correct_mark_index_bounds(self):
+        self.test_good.prices_str = "1000, 2000, 3000"
+        for price, expected in ((999, 0), (1000, 1), (2999, 2), (3000, 3), (50000, 3)):
+            self.test_good.standard_price = price
+            self.assertEqual(expected, self.test_good.correct_mark_index)
+
+    def test_prices_reparsed_after_prices_str_change(self):
+        self.test_good.prices_str = "1000, 2000, 3000"
+        self.assertEqual((1000, 2000, 3000), self.test_good.int_prices)
+        self.test_good.prices_str = "500, 700"
+        self.assertEqual((500, 700), self.test_good.int_prices)
+        self.assertEqual(['500', '700'], self.test_good.prices_list)
+
+    def test_image_links_reparsed_after_set(self):
+        self.assertEqual(2, len(self.test_good.image_links))
+        self.test_good.set_image_links(["https://a.lmcdn.ru/1.jpg"])
+        self.assertEqual(("https://a.lmcdn.ru/1.jpg",), self.test_good.image_links)
+
+    def test_good_has_no_instance_dict(self):
+        with self.assertRaises(AttributeError):
+            self.test_good.some_new_field = 1
+
     def test_insert_in_db_duplicate_update(self):
         self.test_good.insert_in_db()
 
     def test_insert_or_update_func_update(self):
-        self.test_good.update_in_db = MagicMock(name='update_good__in_db')
-        self.test_good.insert_or_update_good()
-        self.test_good.update_in_db.assert_called()
+        with patch.object(Good, 'update_in_db') as update_in_db:
+            self.test_good.insert_or_update_good()
+            update_in_db.assert_called()
 
     def test_insert_or_update_func_insert(self):
         self.test_good.link += "123"
-        self.test_good.insert_in_db = MagicMock(name='update_good__in_db')
-        self.test_good.insert_or_update_good()
-        self.test_good.insert_in_db.assert_called()
+        with patch.object(Good, 'insert_in_db') as insert_in_db:
+            self.test_good.insert_or_update_good()
+            insert_in_db.assert_called()
 
     @classmethod
     def tearDownClass(cls):
@@ -169,13 +191,15 @@ class TestGoodKeeper(TestCase):
 
     def test_get_next_good_by_sub_category_id_less_zero_id(self):
         with self.assertRaises(ValueError):
-            good = GoodKeeper.get_next_good_by_sub_category_id(sub_category_id=-1, offset=0)
+            good = GoodKeeper.get_next_good_by_sub_category_id(sub_category_id=-1, last_good_id=0)
 
     def test_get_next_good_by_sub_category_id_valid_in_db(self):
-        good = GoodKeeper.get_next_good_by_sub_category_id(sub_category_id=self.test_good.sub_category_id, offset=0)
+        good = GoodKeeper.get_next_good_by_sub_category_id(sub_category_id=self.test_good.sub_category_id, last_good_id=-1)
         self.assertEqual(self.test_good.good_id, good.good_id)
 
     def test_get_next_good_by_sub_category_id_site_request(self):
-        scripts.Parsers.ParserController.add_new_goods = MagicMock(name="parsers_mock")
-        good = GoodKeeper.get_next_good_by_sub_category_id(sub_category_id=self.test_good.sub_category_id, offset=56687)
-        scripts.Parsers.ParserController.add_new_goods.assert_called()
+        with patch.object(InventoryPrefetcher, "wait_for_goods") as wait_for_goods:
+            with self.assertRaises(ValueError):
+                GoodKeeper.get_next_good_by_sub_category_id(sub_category_id=self.test_good.sub_category_id,
+                                                            last_good_id=568489461)
+        wait_for_goods.assert_called_once_with(self.test_good.sub_category_id, 0, 568489461)
@@ -0,0 +1,21 @@
+from Data_models.db_test_case import DBTestCase
+from Data_models.good_images_db import GoodImages
+
+
+class TestGoodImages(DBTestCase):
+    def test_set_and_get(self):
+        self.assertIsNone(GoodImages.get_file_id(1, "https://a.lmcdn.ru/1.jpg"))
+        GoodImages.set_file_id(1, "https://a.lmcdn.ru/1.jpg", "file-1")
+        GoodImages.set_file_id(1, "https://a.lmcdn.ru/1.jpg", "file-2")
+        self.assertEqual("file-2", GoodImages.get_file_id(1, "https://a.lmcdn.ru/1.jpg"))
+        self.assertIsNone(GoodImages.get_file_id(1, "https://a.lmcdn.ru/2.jpg"))
+        self.assertIsNone(GoodImages.get_file_id(2, "https://a.lmcdn.ru/1.jpg"))
+
+    def test_forget(self):
+        GoodImages.set_file_id(1, "https://a.lmcdn.ru/1.jpg", "file-1")
+        GoodImages.set_file_id(1, "https://a.lmcdn.ru/2.jpg", "file-2")
+        GoodImages.set_file_id(2, "https://a.lmcdn.ru/3.jpg", "file-3")
+        GoodImages.forget([1])
+        self.assertIsNone(GoodImages.get_file_id(1, "https://a.lmcdn.ru/1.jpg"))
+        self.assertIsNone(GoodImages.get_file_id(1, "https://a.lmcdn.ru/2.jpg"))
+        self.assertEqual("file-3", GoodImages.get_file_id(2, "https://a.lmcdn.ru/3.jpg"))
@@ -0,0 +1,50 @@
+from Data_models.db_connection import DBConnection
+from Data_models.db_test_case import DBTestCase
+from Data_models.migrations import Migrations
+from Data_models.categories_db import CategoriesPool
+from Data_models.goods_db import Good, GoodKeeper
+
+
+class TestCorrectMark(DBTestCase):
+    def setUp(self):
+        super().setUp()
+        with DBConnection.connect() as connection:
+            connection.execute("""INSERT INTO sub_categories (sub_category_id, text_value, main_category_id, option, price_values)
+            VALUES (1, 'Куртки', 2, 1, '5000, 10000, 30000')""")
+
+    @staticmethod
+    def make_good(i, standard_price=0, final_price=0) -> Good:
+        return Good(description="Куртка", brand="Brand", standard_price=standard_price, final_price=final_price,
+                    image_links_str="https://a.lmcdn.ru/1.jpg", link=f"https://www.lamoda.ru/p/{i}/",
+                    category_id=2, sub_category_id=1, shop_id=1, option=1)
+
+    def stored_correct_marks(self) -> dict:
+        with DBConnection.connect() as connection:
+            return {item["good_id"]: item["correct_mark"]
+                    for item in connection.execute("SELECT good_id, correct_mark FROM goods")}
+
+    def test_stored_on_insert_and_upsert(self):
+        good_id = self.make_good(1, standard_price=7000).insert_in_db()
+        goods = GoodKeeper.upsert_many([self.make_good(2, final_price=40000), self.make_good(3, 100, 200)])
+        self.assertEqual({good_id: 1, goods[0].good_id: 3, goods[1].good_id: 0}, self.stored_correct_marks())
+
+    def test_stored_on_update(self):
+        good_id = self.make_good(1, standard_price=7000).insert_in_db()
+        good = GoodKeeper.get_good_by_id(good_id)
+        good.standard_price = 12000
+        good.update_in_db()
+        self.assertEqual(2, GoodKeeper.get_good_by_id(good_id).correct_mark_index)
+
+    def test_recomputed_on_price_change(self):
+        good_id = self.make_good(1, standard_price=7000).insert_in_db()
+        CategoriesPool.update_sub_category_prices(1, ["1000", "2000"])
+        self.assertEqual({good_id: 2}, self.stored_correct_marks())
+        self.assertEqual(2, GoodKeeper.get_good_by_id(good_id).correct_mark_index)
+
+    def test_migration_fills_existing_goods(self):
+        for i, price in enumerate((4999, 5000, 29999, 30000)):
+            self.make_good(i, standard_price=price).insert_in_db()
+        with DBConnection.connect() as connection:
+            connection.execute("UPDATE goods SET correct_mark=NULL")
+        Migrations._migration_6()
+        self.assertEqual([0, 1, 2, 3], list(self.stored_correct_marks().values()))
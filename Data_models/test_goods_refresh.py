@@ -0,0 +1,54 @@
+from unittest.mock import patch
+
+from Data_models.db_connection import DBConnection
+from Data_models.db_test_case import DBTestCase
+from Data_models.goods_db import Good, GoodKeeper
+from scripts.Parsers import ParserController
+
+
+class TestRefreshOutdatedGoods(DBTestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_catalog()
+        with DBConnection.connect() as connection:
+            connection.execute("""INSERT INTO sub_categories (sub_category_id, text_value, main_category_id, option, price_values)
+            VALUES (2, 'Пальто', 2, 1, '5000, 10000, 30000')""")
+        goods = GoodKeeper.upsert_many([self.make_good(i) for i in range(1, 8)] + [self.make_good(8, sub_category_id=2)])
+        self.good_ids = [good.good_id for good in goods]
+        with DBConnection.connect() as connection:
+            connection.execute("UPDATE goods SET last_update_timestamp=0 WHERE good_id<>?", (self.good_ids[5],))
+            connection.execute("UPDATE goods SET active=0 WHERE good_id=?", (self.good_ids[6],))
+        self.batches = []
+        self.failing = set()
+
+    @staticmethod
+    def make_good(i, sub_category_id=1) -> Good:
+        return Good(description="Куртка", brand="Brand", standard_price=7000, final_price=0,
+                    image_links_str="https://a.lmcdn.ru/1.jpg", link=f"https://www.lamoda.ru/p/{i}/",
+                    category_id=2, sub_category_id=sub_category_id, shop_id=1, option=1)
+
+    def fake_update_goods(self, goods):
+        self.batches.append([good.good_id for good in goods])
+        updated = [good for good in goods if good.good_id not in self.failing]
+        return GoodKeeper.touch_goods(updated)
+
+    def refresh(self, *args, **kwargs) -> int:
+        with patch.object(ParserController, "update_goods", side_effect=self.fake_update_goods):
+            return GoodKeeper.refresh_outdated_goods(*args, **kwargs)
+
+    def test_refreshed_in_batches(self):
+        self.assertEqual(6, self.refresh(batch=2))
+        ids = self.good_ids
+        self.assertEqual([ids[0:2], ids[2:4], [ids[4], ids[7]]], self.batches)
+        self.assertEqual([], GoodKeeper.get_outdated_goods())
+
+    def test_failed_good_not_requested_again(self):
+        self.failing.add(self.good_ids[0])
+        self.assertEqual(5, self.refresh(batch=2))
+        self.assertEqual(1, sum(batch.count(self.good_ids[0]) for batch in self.batches))
+        self.assertEqual([self.good_ids[0]], [good.good_id for good in GoodKeeper.get_outdated_goods()])
+
+    def test_sub_category(self):
+        self.assertEqual(1, self.refresh(2, 1))
+        self.assertEqual([[self.good_ids[7]]], self.batches)
+        self.assertEqual(self.good_ids[:5], [good.good_id for good in GoodKeeper.get_outdated_goods(1, 1)])
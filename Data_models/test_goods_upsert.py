@@ -0,0 +1,37 @@
+from Data_models.db_connection import DBConnection
+from Data_models.db_test_case import DBTestCase
+from Data_models.goods_db import Good, GoodKeeper
+
+
+class TestUpsertMany(DBTestCase):
+    @staticmethod
+    def make_good(i, final_price=0) -> Good:
+        return Good(description="Куртка", brand="Brand", standard_price=7000, final_price=final_price,
+                    image_links_str="https://a.lmcdn.ru/1.jpg", link=f"https://www.lamoda.ru/p/{i}/",
+                    category_id=2, sub_category_id=1, shop_id=1, option=1)
+
+    def test_insert_fills_ids(self):
+        goods = GoodKeeper.upsert_many([self.make_good(i) for i in range(3)])
+        self.assertEqual(3, len({good.good_id for good in goods}))
+        for good in goods:
+            self.assertEqual(good.link, GoodKeeper.get_goods_from_db_by_link(good.link)[0].link)
+
+    def test_update_keeps_id(self):
+        good_id = GoodKeeper.upsert_many([self.make_good(1)])[0].good_id
+        goods = GoodKeeper.upsert_many([self.make_good(1, final_price=5000), self.make_good(2)])
+        self.assertEqual(good_id, goods[0].good_id)
+        stored = GoodKeeper.get_goods_from_db_by_link(goods[0].link)
+        self.assertEqual(1, len(stored))
+        self.assertEqual(5000, stored[0].final_price)
+
+    def test_one_transaction(self):
+        statements = []
+        DBConnection.connect().set_trace_callback(statements.append)
+        try:
+            GoodKeeper.upsert_many([self.make_good(i) for i in range(60)])
+        finally:
+            DBConnection.connect().set_trace_callback(None)
+        self.assertEqual(1, len([sql for sql in statements if sql.upper().startswith("COMMIT")]))
+
+    def test_empty(self):
+        self.assertEqual([], GoodKeeper.upsert_many([]))
@@ -4,7 +4,10 @@ from unittest import TestCase
 from unittest.mock import patch, MagicMock
 
 from config import Config
+from Data_models.db_connection import DBConnection
+from Data_models.db_test_case import DBTestCase
 from Data_models.history_of_choices_db import HistoryOfChoices, Choice
+from Data_models.history_writer import HistoryWriter
 
 
 class TestHistoryOfChoices(TestCase):
@@ -20,3 +23,28 @@ class TestHistoryOfChoices(TestCase):
         expected_len = 5
         result = HistoryOfChoices.get_marks_for_good(2, expected_len)
         self.assertEqual(expected_len, len(result))
+
+
+class TestGoodMarkCounts(DBTestCase):
+    def tearDown(self):
+        HistoryWriter.flush()
+
+    def test_get_marks_for_good_no_marks(self):
+        self.assertEqual([0, 0, 0, 0], HistoryOfChoices.get_marks_for_good(1, 4))
+
+    def test_add_user_choice_updates_counts(self):
+        for user_id, mark in ((1, 2), (2, 2), (3, 0)):
+            HistoryOfChoices.add_user_choice(user_id=user_id, good_id=1, mark=mark, correct_mark=2, sub_category_id=1)
+        self.assertEqual([1, 0, 2, 0], HistoryOfChoices.get_marks_for_good(1, 4))
+
+    def test_rebuild_mark_counts(self):
+        HistoryOfChoices.add_user_choice(user_id=1, good_id=1, mark=3, correct_mark=2, sub_category_id=1)
+        HistoryOfChoices.add_user_choice(user_id=1, good_id=2, mark=1, correct_mark=2, sub_category_id=1)
+        HistoryWriter.flush()
+        with DBConnection.connect() as connection:
+            connection.execute("DELETE FROM good_mark_counts")
+        HistoryOfChoices.rebuild_mark_counts([1])
+        self.assertEqual([0, 0, 0, 1], HistoryOfChoices.get_marks_for_good(1, 4))
+        self.assertEqual([0, 0, 0, 0], HistoryOfChoices.get_marks_for_good(2, 4))
+        HistoryOfChoices.rebuild_mark_counts()
+        self.assertEqual([0, 1, 0, 0], HistoryOfChoices.get_marks_for_good(2, 4))
@@ -0,0 +1,137 @@
+import sqlite3
+import threading
+
+from unittest.mock import patch
+
+from config import Config
+from Data_models.db_connection import DBConnection
+from Data_models.db_test_case import DBTestCase
+from Data_models.history_of_choices_db import HistoryOfChoices
+from Data_models.history_writer import HistoryWriter
+from Data_models.user_db import User
+
+
+class TestHistoryWriter(DBTestCase):
+    def setUp(self):
+        self.old_max_queue = HistoryWriter.MAX_QUEUE
+        self.old_queue_timeout = HistoryWriter.QUEUE_TIMEOUT
+        super().setUp()
+        HistoryWriter.stop()
+        self.start_patcher = patch.object(HistoryWriter, "start")  # без фонового потока - пишем только явно
+        self.start_patcher.start()
+
+    def tearDown(self):
+        self.start_patcher.stop()
+        HistoryWriter.flush()
+        HistoryWriter.MAX_QUEUE = self.old_max_queue
+        HistoryWriter.QUEUE_TIMEOUT = self.old_queue_timeout
+
+    def count_history_rows(self) -> int:
+        with DBConnection.connect() as connection:
+            return connection.execute(f"SELECT count(*) FROM {Config.history_table_name}").fetchone()[0]
+
+    def add_choices(self, count, user_id=1, good_id=1, mark=1):
+        for _ in range(count):
+            HistoryOfChoices.add_user_choice(user_id=user_id, good_id=good_id, mark=mark, correct_mark=2,
+                                             sub_category_id=1, option=1)
+
+    def test_choices_written_in_one_transaction(self):
+        self.add_choices(20)
+        statements = []
+        DBConnection.connect().set_trace_callback(statements.append)
+        try:
+            self.assertEqual(20, HistoryWriter.flush())
+        finally:
+            DBConnection.connect().set_trace_callback(None)
+        self.assertEqual(1, len([sql for sql in statements if sql.upper().startswith("COMMIT")]))
+        self.assertEqual(20, self.count_history_rows())
+        self.assertEqual([0, 20, 0, 0], HistoryOfChoices.get_marks_for_good(1, 4))
+
+    def test_marks_see_pending_choices(self):
+        self.add_choices(2, mark=3)
+        HistoryWriter.flush()
+        self.add_choices(1, mark=0)
+        self.assertEqual([1, 0, 0, 2], HistoryOfChoices.get_marks_for_good(1, 4))
+        self.assertEqual(2, self.count_history_rows())  # статистика не заставляет писать очередь
+
+    def test_offset_sees_pending_choices(self):
+        user = User(telegram_id=100)
+        user.sub_category_id = 1
+        user.option = 1
+        self.add_choices(3, user_id=user.user_id)
+        self.assertEqual(3, user.get_offset_of_actual_sub_category())
+
+    def test_full_queue_waits_for_writer(self):
+        HistoryWriter.MAX_QUEUE = 2
+        self.add_choices(2)
+        writer = threading.Timer(0.05, HistoryWriter.flush)
+        writer.start()
+        self.add_choices(1)
+        writer.join()
+        self.assertEqual(2, self.count_history_rows())
+        self.assertEqual(1, HistoryWriter.flush())
+
+    def test_full_queue_rejected(self):
+        HistoryWriter.MAX_QUEUE = 2
+        HistoryWriter.QUEUE_TIMEOUT = 0.05
+        self.add_choices(2)
+        with self.assertRaises(RuntimeError):
+            self.add_choices(1)
+        self.assertEqual(2, HistoryWriter.flush())
+
+    def test_failed_write_kept_in_queue(self):
+        self.add_choices(2)
+        with patch.object(HistoryWriter, "_write", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                HistoryWriter.flush()
+        self.assertEqual(2, HistoryWriter.flush())
+
+    def test_locked_database_rows_kept(self):
+        self.add_choices(3)
+        with patch.object(HistoryWriter, "_write", side_effect=sqlite3.OperationalError("database is locked")):
+            for _ in range(5):
+                with self.assertRaises(sqlite3.OperationalError):
+                    HistoryWriter.flush()
+        self.assertEqual(3, HistoryWriter.flush())
+        self.assertEqual(3, self.count_history_rows())
+
+    def test_bad_row_dropped(self):
+        self.add_choices(2)
+        self.add_choices(1, good_id=666)
+        self.add_choices(1)
+        write = HistoryWriter._write
+
+        def write_without_bad_rows(rows):
+            if any(row[1] == 666 for row in rows):
+                raise sqlite3.IntegrityError("bad row")
+            write(rows)
+
+        with patch.object(HistoryWriter, "_write", side_effect=write_without_bad_rows):
+            self.assertEqual(3, HistoryWriter.flush())
+        self.assertEqual(3, self.count_history_rows())
+        self.assertEqual(0, HistoryWriter.flush())
+
+    def test_locked_database_while_writing_one_by_one(self):
+        self.add_choices(1, good_id=666)
+        self.add_choices(2)
+        write = HistoryWriter._write
+        locked = [True]
+
+        def write_locked(rows):
+            if any(row[1] == 666 for row in rows):
+                raise sqlite3.IntegrityError("bad row")
+            if locked[0]:
+                raise sqlite3.OperationalError("database is locked")
+            write(rows)
+
+        with patch.object(HistoryWriter, "_write", side_effect=write_locked):
+            with self.assertRaises(sqlite3.OperationalError):
+                HistoryWriter.flush()
+            locked[0] = False
+            self.assertEqual(2, HistoryWriter.flush())
+        self.assertEqual(2, self.count_history_rows())
+
+    def test_stop_writes_queue(self):
+        self.add_choices(4)
+        HistoryWriter.stop()
+        self.assertEqual(4, self.count_history_rows())
@@ -0,0 +1,102 @@
+import time
+
+from Data_models.db_connection import DBConnection
+from Data_models.db_test_case import DBTestCase
+from Data_models.migrations import Migrations
+from Data_models.categories_db import CategoriesPool
+from Data_models.current_search_pages import NextSearchPages
+from Data_models.goods_db import Good, GoodKeeper
+from Data_models.history_of_choices_db import HistoryOfChoices
+from Data_models.history_writer import HistoryWriter
+from Data_models.user_db import User
+
+HOT_TABLES = ("goods", "history_of_marks", "users", "sub_categories", "next_shop_pages", "user_cursors")
+
+
+class TestMigrations(DBTestCase):
+    MIGRATE = False
+
+    def tearDown(self):
+        HistoryWriter.flush()
+
+    def fill_db(self):
+        self.add_catalog()
+        with DBConnection.connect() as connection:
+            cursor = connection.cursor()
+            for i in range(50):
+                cursor.execute("""INSERT INTO goods (description, brand, standard_price, final_price, image_links_str, link,
+                category_id, sub_category_id, option, shop_id, last_update_timestamp) VALUES (?,?,?,?,?,?,?,?,?,?,?)""",
+                               ("Куртка", "Brand", 7000, 0, "https://a.lmcdn.ru/1.jpg", f"https://www.lamoda.ru/p/{i}/",
+                                2, 1, 1, 1, time.time()))
+
+    def test_migrate_sets_latest_version(self):
+        version = Migrations.migrate()
+        self.assertEqual(len(Migrations.migrations()), version)
+        self.assertEqual(version, Migrations.get_version())
+
+    def test_migrate_twice(self):
+        Migrations.migrate()
+        self.assertEqual(Migrations.get_version(), Migrations.migrate())
+
+    def test_duplicates_combined_before_unique_link(self):
+        Migrations._migration_1()
+        self.fill_db()
+        link = "https://www.lamoda.ru/p/1/"
+        duplicate_id = Good(link=link, sub_category_id=1, category_id=2, final_price=100).insert_in_db()
+        HistoryOfChoices.add_user_choice(user_id=1, good_id=duplicate_id, mark=0, correct_mark=0, sub_category_id=1)
+        Migrations.migrate()
+        goods = GoodKeeper.get_goods_from_db_by_link(link)
+        self.assertEqual(1, len(goods))
+        self.assertEqual(1, sum(HistoryOfChoices.get_marks_for_good(goods[0].good_id, 4)))
+        with self.assertRaises(Exception):
+            Good(link=link, sub_category_id=1, category_id=2, final_price=100).insert_in_db()
+
+    def test_next_search_pages_keyed_by_option(self):
+        Migrations._migration_1()
+        self.fill_db()
+        with DBConnection.connect() as connection:
+            connection.executemany("""INSERT INTO next_shop_pages (sub_category_id, shop_id, next_search_page, option)
+            VALUES (1, 1, ?, 0)""", [("https://www.lamoda.ru/catalogsearch/result/?page=2&q=Куртки+Мужские",),
+                                     ("https://www.lamoda.ru/catalogsearch/result/?page=5&q=Куртки+Мужские",)])
+        Migrations.migrate()
+        self.assertEqual("https://www.lamoda.ru/catalogsearch/result/?page=5&q=Куртки+Мужские",
+                         NextSearchPages.get_next_search_page(sub_category_id=1, shop_id=1, option=1))
+        NextSearchPages.set_next_search_page(sub_category_id=1, shop_id=1, option=1, address="page=6")
+        self.assertEqual("page=6", NextSearchPages.get_next_search_page(sub_category_id=1, shop_id=1, option=1))
+        with self.assertRaises(ValueError):
+            NextSearchPages.get_next_search_page(sub_category_id=1, shop_id=1, option=0)
+
+    def test_hot_queries_without_full_scan(self):
+        Migrations.migrate()
+        self.fill_db()
+        CategoriesPool.get_catalog()  # каталог читается целиком один раз на версию - это не горячий запрос
+        statements = []
+        DBConnection.connect().set_trace_callback(statements.append)
+        try:
+            GoodKeeper.get_next_good_by_sub_category_id(sub_category_id=1, last_good_id=3, option=1)
+            GoodKeeper.get_next_good_by_sub_category_id(sub_category_id=1, last_good_id=3)
+            good = GoodKeeper.get_good_by_id(5)
+            good.insert_or_update_good()
+            HistoryOfChoices.get_marks_for_good(good.good_id, 4)
+            user = User(telegram_id=100)
+            user = User(telegram_id=100)
+            user.get_offset_of_actual_sub_category()
+            user.sub_category_id = 1
+            user.set_last_good_id_of_actual_sub_category(5)
+            user.get_last_good_id_of_actual_sub_category()
+            CategoriesPool.get_sub_categories(2, 1)
+            CategoriesPool.get_sub_category_by_id(1, 1)
+            try:
+                NextSearchPages.get_next_search_page(sub_category_id=1, shop_id=1, option=1)
+            except ValueError:
+                pass
+        finally:
+            DBConnection.connect().set_trace_callback(None)
+        statements = [sql for sql in statements if sql.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE"))]
+        self.assertTrue(statements)
+        with DBConnection.connect() as connection:
+            for sql in statements:
+                for step in connection.execute("EXPLAIN QUERY PLAN " + sql):
+                    detail = step["detail"]
+                    for table in HOT_TABLES:
+                        self.assertFalse(detail.startswith(f"SCAN {table}"), f"Full scan: {detail}\n{sql}")
@@ -0,0 +1,44 @@
+import time
+
+from Data_models.db_connection import DBConnection
+from Data_models.db_test_case import DBTestCase
+from Data_models.goods_db import GoodKeeper
+from Data_models.history_of_choices_db import HistoryOfChoices
+from Data_models.history_writer import HistoryWriter
+from Data_models.user_cursors_db import UserCursors
+
+
+class TestUserCursors(DBTestCase):
+    def setUp(self):
+        super().setUp()
+        with DBConnection.connect() as connection:
+            cursor = connection.cursor()
+            cursor.execute("""INSERT INTO sub_categories (sub_category_id, text_value, main_category_id, option, price_values)
+            VALUES (1, 'Куртки', 2, 1, '5000, 10000, 30000')""")
+            for i in range(1, 6):
+                cursor.execute("""INSERT INTO goods (good_id, description, brand, standard_price, image_links_str, link,
+                category_id, sub_category_id, option, shop_id, last_update_timestamp) VALUES (?,?,?,?,?,?,?,?,?,?,?)""",
+                               (i, "Куртка", "Brand", 7000, "https://a.lmcdn.ru/1.jpg", f"https://www.lamoda.ru/p/{i}/",
+                                2, 1, 1, 1, time.time()))
+
+    def tearDown(self):
+        HistoryWriter.flush()
+
+    def test_get_last_good_id_empty(self):
+        self.assertEqual(0, UserCursors.get_last_good_id(1, 1, 1))
+
+    def test_set_last_good_id_only_forward(self):
+        UserCursors.set_last_good_id(1, 1, 4, 1)
+        UserCursors.set_last_good_id(1, 1, 2, 1)
+        self.assertEqual(4, UserCursors.get_last_good_id(1, 1, 1))
+
+    def test_next_good_skips_deactivated(self):
+        GoodKeeper.get_good_by_id(3).deactivate()
+        good = GoodKeeper.get_next_good_by_sub_category_id(sub_category_id=1, last_good_id=2, option=1)
+        self.assertEqual(4, good.good_id)
+
+    def test_fill_from_history(self):
+        HistoryOfChoices.add_user_choice(user_id=7, good_id=2, mark=0, correct_mark=1, sub_category_id=1, option=1)
+        HistoryOfChoices.add_user_choice(user_id=7, good_id=3, mark=0, correct_mark=1, sub_category_id=1, option=1)
+        UserCursors.fill_from_history()
+        self.assertEqual(3, UserCursors.get_last_good_id(7, 1, 1))
@@ -0,0 +1,93 @@
+import threading
+import time
+
+from config import Config
+from Data_models.db_connection import DBConnection
+from Data_models.db_test_case import DBTestCase
+from Data_models.user_db import User
+from Data_models.user_sessions import UserSessions
+from Data_models.user_states_db import UserStates
+
+
+class TestUserSessions(DBTestCase):
+    def setUp(self):
+        self.old_max_users = UserSessions.MAX_USERS
+        super().setUp()
+        UserSessions.clear()
+
+    def tearDown(self):
+        UserSessions.clear()
+        UserSessions.MAX_USERS = self.old_max_users
+
+    def get_db_state(self, telegram_id):
+        with DBConnection.connect() as connection:
+            return connection.execute(f"SELECT state FROM {Config.user_table_name} WHERE telegram_id=?",
+                                      (telegram_id,)).fetchone()["state"]
+
+    def test_get_user_cached(self):
+        user = UserSessions.get_user(telegram_id=10, name="Иван")
+        self.assertIs(user, UserSessions.get_user(telegram_id=10))
+
+    def test_save_not_written_before_flush(self):
+        user = UserSessions.get_user(telegram_id=10)
+        user.set_state(UserStates.IDLE)
+        UserSessions.save(user)
+        self.assertEqual(UserStates.CHOOSE_CAT, self.get_db_state(10))
+        UserSessions.flush()
+        self.assertEqual(UserStates.IDLE, self.get_db_state(10))
+
+    def test_saves_coalesced_to_one_write(self):
+        user = UserSessions.get_user(telegram_id=10)
+        statements = []
+        DBConnection.connect().set_trace_callback(statements.append)
+        try:
+            user.set_category(2)
+            UserSessions.save(user)
+            user.set_option(1)
+            UserSessions.save(user)
+            user.set_subcategory(3)
+            UserSessions.save(user)
+            UserSessions.flush()
+        finally:
+            DBConnection.connect().set_trace_callback(None)
+        self.assertEqual(1, len([sql for sql in statements if sql.lstrip().upper().startswith("UPDATE")]))
+        self.assertEqual([], user.changed_fields())
+
+    def test_not_changed_user_not_written(self):
+        user = UserSessions.get_user(telegram_id=10)
+        UserSessions.save(user)
+        self.assertEqual(0, UserSessions.flush())
+
+    def test_evicted_dirty_user_not_lost(self):
+        UserSessions.MAX_USERS = 1
+        user = UserSessions.get_user(telegram_id=10)
+        user.set_state(UserStates.IDLE)
+        UserSessions.save(user)
+        UserSessions.get_user(telegram_id=11)
+        self.assertIs(user, UserSessions.get_user(telegram_id=10))
+        UserSessions.flush()
+        self.assertEqual(UserStates.IDLE, User(telegram_id=10).state)
+
+    def test_stop_flushes(self):
+        user = UserSessions.get_user(telegram_id=10)
+        user.set_state(UserStates.IDLE)
+        UserSessions.save(user)
+        UserSessions.stop()
+        self.assertEqual(UserStates.IDLE, self.get_db_state(10))
+
+    def test_user_lock(self):
+        order = []
+
+        def other_thread():
+            with UserSessions.user_lock(10):
+                order.append("other")
+
+        with UserSessions.user_lock(10):
+            with UserSessions.user_lock(10):  # повторный захват в том же потоке
+                thread = threading.Thread(target=other_thread)
+                thread.start()
+                time.sleep(0.05)  # другой поток ждет блокировку
+                order.append("owner")
+        thread.join()
+        self.assertEqual(["owner", "other"], order)
+        self.assertEqual({}, UserSessions._user_locks)
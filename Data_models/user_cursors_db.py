@@ -0,0 +1,89 @@
+from config import Config
+from Data_models.db_connection import DBConnection
+from Data_models.history_writer import HistoryWriter
+
+
+class UserCursors:
+    """
+    Курсоры пользователей: ID последнего выданного товара для каждой пары (подкатегория, option).
+    Следующий товар ищется как первый активный товар с good_id больше курсора (поиск по индексу, без OFFSET)
+    """
+    @classmethod
+    def create_table(cls) -> None:
+        """
+        Создание таблицы
+        :return: None
+        """
+        with DBConnection.connect() as connection:
+            cursor = connection.cursor()
+            cursor.execute("""CREATE TABLE IF NOT EXISTS user_cursors (
+            user_id INTEGER,
+            sub_category_id INTEGER,
+            option INTEGER DEFAULT 0,
+            last_good_id INTEGER DEFAULT 0,
+            PRIMARY KEY (user_id, sub_category_id, option)
+            ) WITHOUT ROWID""")
+
+    @classmethod
+    def fill_from_history(cls) -> None:
+        """
+        Заполняет курсоры по истории выборов: последний выданный товар = максимальный good_id, который пользователь
+        уже оценил в подкатегории. Существующие курсоры не трогает
+        :return: None
+        """
+        HistoryWriter.flush()
+        with DBConnection.connect() as connection:
+            cursor = connection.cursor()
+            cursor.execute(f"""INSERT OR IGNORE INTO user_cursors (user_id, sub_category_id, option, last_good_id)
+            SELECT user_id, sub_category_id, option, max(good_id) FROM {Config.history_table_name}
+            GROUP BY user_id, sub_category_id, option""")
+
+    @classmethod
+    def get_last_good_id(cls, user_id: int, sub_category_id: int, option=0) -> int:
+        """
+        ID последнего выданного пользователю товара в подкатегории
+        :param user_id: ID пользователя
+        :param sub_category_id: ID подкатегории
+        :param option: option параметр
+        :return: ID товара, 0 - если пользователь еще не получал товаров этой подкатегории
+        """
+        with DBConnection.connect() as connection:
+            cursor = connection.cursor()
+            cursor.execute("""SELECT last_good_id FROM user_cursors WHERE user_id=? AND sub_category_id=? AND option=?""",
+                           (user_id, sub_category_id, option))
+            item = cursor.fetchone()
+            return item["last_good_id"] if item else 0
+
+    @classmethod
+    def get_max_last_good_id(cls, sub_category_id: int, option=0) -> int:
+        """
+        Курсор самого продвинувшегося пользователя в подкатегории
+        :param sub_category_id: ID подкатегории
+        :param option: option параметр
+        :return: максимальный ID выданного товара, 0 - если курсоров нет
+        """
+        with DBConnection.connect() as connection:
+            cursor = connection.cursor()
+            cursor.execute("""SELECT max(last_good_id) FROM user_cursors WHERE sub_category_id=? AND option=?""",
+                           (sub_category_id, option))
+            return cursor.fetchone()[0] or 0
+
+    @classmethod
+    def set_last_good_id(cls, user_id: int, sub_category_id: int, good_id: int, option=0) -> None:
+        """
+        Сдвигает курсор на выданный товар. Курсор только растет - повторная выдача старого товара его не откатывает
+        :param user_id: ID пользователя
+        :param sub_category_id: ID подкатегории
+        :param good_id: ID выданного товара
+        :param option: option параметр
+        :return: None
+        """
+        with DBConnection.connect() as connection:
+            cursor = connection.cursor()
+            cursor.execute("""INSERT INTO user_cursors (user_id, sub_category_id, option, last_good_id) VALUES (?,?,?,?)
+            ON CONFLICT (user_id, sub_category_id, option) DO UPDATE SET
+            last_good_id=max(last_good_id, excluded.last_good_id)""", (user_id, sub_category_id, option, good_id))
+
+
+if __name__ == "__main__":
+    UserCursors.create_table()
@@ -1,16 +1,25 @@
 import sqlite3
 import time
 
+from typing import List
+
 from Data_models.user_states_db import UserStates
 from Data_models.categories_db import Category, CategoriesPool
 from config import Config
+from Data_models.db_connection import DBConnection
 from Data_models.goods_db import Good
+from Data_models.history_writer import HistoryWriter
+from Data_models.user_cursors_db import UserCursors
 
 
 class User:
     """
     Класс пользователей
     """
+    # поля, которые записывает update_user_in_db. По ним определяется, изменился ли пользователь
+    PERSISTED_FIELDS = ("state", "category_id", "sub_category_id", "option", "current_good_id",
+                        "last_message_id_with_buttons")
+
     def __init__(self,
                  user_id=-1,
                  telegram_id=-1,
@@ -41,8 +50,10 @@ class User:
         self.name = name
         self.last_name = last_name
         self.telegram_login = telegram_login
+        self.saved_state = ()  # значения PERSISTED_FIELDS на момент последней синхронизации с базой
         if telegram_id > 0 or user_id > 0:
             self.sync_db_user(telegram_id=telegram_id, user_id=user_id)
+            self.mark_saved()
 
     @classmethod
     def create_table(cls) -> None:
@@ -50,8 +61,7 @@ class User:
         Создание таблицы
         :return: None
         """
-        with sqlite3.connect(Config.db_pass) as connection:
-            connection.row_factory = sqlite3.Row  # Позволяет обращаться по названию столбца к значению
+        with DBConnection.connect() as connection:
             cursor = connection.cursor()
             cursor.execute(f"""CREATE TABLE IF NOT EXISTS {Config.user_table_name} (
             user_id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -66,7 +76,7 @@ class User:
             last_message_id_with_buttons INTEGER,
             name TEXT,
             last_name TEXT,
-            telegram_login TEXT
+            telegram_login TEXT,
             
             FOREIGN KEY (category_id) REFERENCES categories (category_id),
             FOREIGN KEY (sub_category_id) REFERENCES sub_categories (sub_category_id),
@@ -169,8 +179,7 @@ class User:
         Обновление пользователя в БД
         :return: None
         """
-        with sqlite3.connect(Config.db_pass) as connection:
-            connection.row_factory = sqlite3.Row
+        with DBConnection.connect() as connection:
             cursor = connection.cursor()
             self._update_user_in_db(cursor)
 
@@ -180,24 +189,71 @@ class User:
         :return: None
         """
         self.last_updated_timestamp = time.time()
-        cursor.execute(f"""UPDATE {Config.user_table_name} SET    
+        cursor.execute(self._get_update_query(), self._get_update_params())
+        self.mark_saved()
+
+    @classmethod
+    def update_users_in_db(cls, users: List["User"]) -> None:
+        """
+        Обновление пачки пользователей в БД одной транзакцией
+        :param users: массив пользователей
+        :return: None
+        """
+        update_time = time.time()
+        for user in users:
+            user.last_updated_timestamp = update_time
+        params = [user._get_update_params() for user in users]
+        with DBConnection.connect() as connection:
+            cursor = connection.cursor()
+            cursor.executemany(cls._get_update_query(), params)
+        for user, user_params in zip(users, params):
+            user.saved_state = user_params[:len(cls.PERSISTED_FIELDS)]
+
+    @classmethod
+    def _get_update_query(cls) -> str:
+        """
+        Запрос обновления пользователя. Порядок параметров - _get_update_params
+        :return: строка запроса
+        """
+        return f"""UPDATE {Config.user_table_name} SET    
                             state=?, 
                             category_id=?, 
                             sub_category_id=?,
                             option=?, 
                             current_good_id=?, 
-                            last_updated_timestamp=?,
-                            last_message_id_with_buttons=? WHERE user_id=?""", (
-            self.state,
-            self.category_id,
-            self.sub_category_id,
-            self.option,
-            self.current_good_id,
-            self.last_updated_timestamp,
-            self.last_message_id_with_buttons,
+                            last_message_id_with_buttons=?,
+                            last_updated_timestamp=? WHERE user_id=?"""
 
-            self.user_id
-        ))
+    def _get_update_params(self) -> tuple:
+        """
+        Параметры для запроса _get_update_query: PERSISTED_FIELDS, время обновления, user_id
+        :return: кортеж параметров
+        """
+        return self.get_persisted_state() + (self.last_updated_timestamp, self.user_id)
+
+    def get_persisted_state(self) -> tuple:
+        """
+        Текущие значения полей PERSISTED_FIELDS
+        :return: кортеж значений
+        """
+        return tuple(getattr(self, field) for field in self.PERSISTED_FIELDS)
+
+    def mark_saved(self) -> None:
+        """
+        Запоминает текущие значения полей как записанные в базу
+        :return: None
+        """
+        self.saved_state = self.get_persisted_state()
+
+    def changed_fields(self) -> List[str]:
+        """
+        Поля пользователя, измененные после последней синхронизации с базой
+        :return: массив названий полей
+        """
+        if not self.saved_state:
+            return list(self.PERSISTED_FIELDS)
+        return [field for field, value, saved in zip(self.PERSISTED_FIELDS, self.get_persisted_state(), self.saved_state)
+                if value != saved]
 
     def sync_db_user(self, telegram_id=-1, user_id=-1) -> None:
         """
@@ -209,8 +265,7 @@ class User:
         :return: None
         """
         if telegram_id or user_id:
-            with sqlite3.connect(Config.db_pass) as connection:
-                connection.row_factory = sqlite3.Row
+            with DBConnection.connect() as connection:
                 cursor = connection.cursor()
                 cursor.execute(
                     f"""SELECT * FROM {Config.user_table_name} 
@@ -283,7 +338,8 @@ class User:
         совершенных данным пользователем для данной подкатегории и опции. Далее будет использоваться для получения следующего товара.
         :return: смещение
         """
-        with sqlite3.connect(Config.db_pass) as connection:
+        HistoryWriter.flush()  # учитываем и еще не записанные ответы пользователя
+        with DBConnection.connect() as connection:
             cursor = connection.cursor()
             cursor.execute(f"""SELECT count(*)  FROM {Config.history_table_name} WHERE user_id=? AND sub_category_id=? AND option=?""",  (self.user_id, self.sub_category_id, self.option))
             item = cursor.fetchone()
@@ -292,6 +348,22 @@ class User:
             else:
                 return 0
 
+    def get_last_good_id_of_actual_sub_category(self) -> int:
+        """
+        Курсор пользователя в актуальной подкатегории и опции - ID последнего выданного ему товара.
+        Используется для получения следующего товара вместо смещения get_offset_of_actual_sub_category
+        :return: ID последнего выданного товара, 0 - если товаров еще не было
+        """
+        return UserCursors.get_last_good_id(self.user_id, self.sub_category_id, self.option)
+
+    def set_last_good_id_of_actual_sub_category(self, good_id: int) -> None:
+        """
+        Сдвигает курсор пользователя в актуальной подкатегории и опции на выданный товар
+        :param good_id: ID выданного товара
+        :return: None
+        """
+        UserCursors.set_last_good_id(self.user_id, self.sub_category_id, good_id, self.option)
+
 
 if __name__ == "__main__":
     user = User()
@@ -0,0 +1,166 @@
+import atexit
+import logging
+import threading
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator
+from Data_models.user_db import User
+
+
+class UserSessions:
+    """
+    Кэш пользователей в памяти процесса с отложенной записью (write-behind).
+    get_user() отдает один и тот же объект User без запроса в базу, save() только помечает пользователя измененным.
+    Измененные пользователи записываются фоновым потоком пачкой раз в FLUSH_INTERVAL секунд одной транзакцией,
+    поэтому несколько save() за одно нажатие кнопки дают одну запись в базу.
+    Гарантии при падении: каждая пачка пишется целиком или не пишется вовсе, не записанная пачка остается в очереди
+    на повтор, а теряется не больше FLUSH_INTERVAL секунд изменений состояния (история выборов и курсоры
+    пишутся в базу сразу). При остановке (stop() или выход из процесса) все изменения записываются.
+    Изменение пользователя (get_user - изменения - save) из разных потоков выполняется под user_lock()
+    """
+    MAX_USERS = 10000  # сколько пользователей держать в памяти (LRU)
+    FLUSH_INTERVAL = 1.0  # (сек) как часто записывать измененных пользователей
+
+    logger = logging.getLogger(__name__)
+    _users = OrderedDict()  # telegram_id -> User, в порядке последнего обращения
+    _dirty = OrderedDict()  # telegram_id -> User, ожидающие записи в базу
+    _lock = threading.RLock()
+    _flush_lock = threading.Lock()
+    _stop_event = threading.Event()
+    _flusher = None
+    _user_locks = {}  # telegram_id -> [блокировка, сколько потоков ее держат или ждут]
+
+    @classmethod
+    def get_user(cls, telegram_id: int, telegram_login="", name="", last_name="") -> User:
+        """
+        Возвращает пользователя по telegram ID. При первом обращении читает его из базы (или создает)
+        :param telegram_id: ID пользователя в телеграмм
+        :param telegram_login: логин в телеграме (для нового пользователя)
+        :param name: имя в телеграме (для нового пользователя)
+        :param last_name: фамилия в телеграме (для нового пользователя)
+        :return: объект User
+        """
+        with cls._lock:
+            user = cls._users.get(telegram_id) or cls._dirty.get(telegram_id)
+            if user:
+                cls._users[telegram_id] = user
+                cls._users.move_to_end(telegram_id)
+                return user
+        user = User(telegram_id=telegram_id, telegram_login=telegram_login, name=name, last_name=last_name)
+        with cls._lock:
+            user = cls._users.setdefault(telegram_id, user)  # другой поток мог загрузить его раньше
+            cls._users.move_to_end(telegram_id)
+            while len(cls._users) > cls.MAX_USERS:
+                cls._users.popitem(last=False)  # измененный пользователь остается в _dirty до записи
+        return user
+
+    @classmethod
+    @contextmanager
+    def user_lock(cls, telegram_id: int) -> Iterator[None]:
+        """
+        Блокировка пользователя (with UserSessions.user_lock(telegram_id): ...): пока она захвачена, другие потоки
+        не загружают, не изменяют и не сохраняют этого пользователя. Повторный захват в том же потоке разрешен.
+        Блокировка существует, пока ее кто-то держит или ждет
+        :param telegram_id: ID пользователя в телеграмм
+        :return: None
+        """
+        with cls._lock:
+            entry = cls._user_locks.get(telegram_id)
+            if entry is None:
+                entry = cls._user_locks[telegram_id] = [threading.RLock(), 0]
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with cls._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del cls._user_locks[telegram_id]
+
+    @classmethod
+    def save(cls, user: User) -> None:
+        """
+        Помечает пользователя для записи в базу. Сама запись - в фоне (flush)
+        :param user: объект User
+        :return: None
+        """
+        if not user.changed_fields():
+            return
+        with cls._lock:
+            cls._dirty[user.telegram_id] = user
+        cls.start()
+
+    @classmethod
+    def flush(cls) -> int:
+        """
+        Записывает всех измененных пользователей в базу одной транзакцией.
+        При ошибке пользователи возвращаются в очередь на запись
+        :return: количество записанных пользователей
+        """
+        with cls._flush_lock:
+            with cls._lock:
+                users = [user for user in cls._dirty.values() if user.changed_fields()]
+                cls._dirty.clear()
+            if not users:
+                return 0
+            try:
+                User.update_users_in_db(users)
+            except Exception:
+                cls.logger.exception(f"Failed to flush {len(users)} users, will retry")
+                with cls._lock:
+                    for user in users:
+                        cls._dirty.setdefault(user.telegram_id, user)
+                raise
+            return len(users)
+
+    @classmethod
+    def start(cls) -> None:
+        """
+        Запускает фоновый поток записи (если еще не запущен)
+        :return: None
+        """
+        with cls._lock:
+            if cls._flusher and cls._flusher.is_alive():
+                return
+            cls._stop_event.clear()
+            cls._flusher = threading.Thread(target=cls._flush_loop, name="UserSessionsFlusher", daemon=True)
+            cls._flusher.start()
+
+    @classmethod
+    def stop(cls) -> None:
+        """
+        Останавливает фоновый поток и записывает оставшиеся изменения
+        :return: None
+        """
+        cls._stop_event.set()
+        flusher = cls._flusher
+        if flusher and flusher is not threading.current_thread():
+            flusher.join()
+        cls.flush()
+
+    @classmethod
+    def clear(cls) -> None:
+        """
+        Записывает изменения и очищает кэш (например, при смене базы в тестах)
+        :return: None
+        """
+        cls.flush()
+        with cls._lock:
+            cls._users.clear()
+
+    @classmethod
+    def _flush_loop(cls) -> None:
+        """
+        Цикл фонового потока записи
+        :return: None
+        """
+        while not cls._stop_event.wait(cls.FLUSH_INTERVAL):
+            try:
+                cls.flush()
+            except Exception:
+                pass  # уже залогировано в flush, пользователи остались в очереди
+
+
+atexit.register(UserSessions.stop)
@@ -1,29 +1,31 @@
 import logging
 
-import requests
-import config
-from Lamoda.Parser.lamoda_good_page_parser import LamodaGoodPageParser
+from Crawler.async_crawler import AsyncCrawler
+from Crawler.parse_pool import ParsePool
+from Lamoda.Parser.lamoda_good_page_parser import GoodPageRecord, parse_good_page
 
 
 class LamodaGoodPage:
     """
     Класс для загрузки страницы товара
     """
-    def __init__(self, url):
+    def __init__(self, url, page_content=b""):
+        """
+        :param url: адрес страницы товара
+        :param page_content: уже загруженное содержимое страницы (например, из AsyncCrawler.fetch_many)
+        """
         self.url = url
         self.logger = logging.getLogger(__name__)
-        self.page_content = ""
+        self.page_content = page_content
 
-    def get_good_on_page(self) -> LamodaGoodPageParser:
+    def get_good_on_page(self) -> GoodPageRecord:
         """
-        Загружает старницу и парсит
-        :return: Объект класса LamodaGoodPageParser
+        Загружает старницу (если она не передана в конструктор) и парсит (в процессе ParsePool)
+        :return: значения страницы GoodPageRecord
         """
-        page = requests.get(self.url)
-        self.page_content = page.content
-        self.logger.info(f"Load:{self.url}, status_code = " + str(page.status_code))
-        good_page = LamodaGoodPageParser(self.page_content)
-        return good_page
+        if not self.page_content:
+            self.page_content = AsyncCrawler.fetch(self.url)
+        return ParsePool.run(parse_good_page, self.page_content)
 
 
 if __name__ == "__main__":
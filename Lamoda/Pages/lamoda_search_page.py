@@ -1,40 +1,37 @@
-import requests
-import aiohttp
-import asyncio
 import re
 
-from typing import List
-from Lamoda.Parser.lamoda_search_page_parser import LamodaSearchPageParser
-from Lamoda.Parser.lamoda_search_goods_parser import LamodaGoodsOnSearchPageParser
+from typing import Iterator, List
+from Crawler.async_crawler import AsyncCrawler
+from Crawler.parse_pool import ParsePool
+from Lamoda.Parser.lamoda_search_card_extractor import SearchCard
+from Lamoda.Parser.lamoda_search_page_parser import parse_first_search_card, parse_search_cards
 from Data_models.goods_db import Good, GoodKeeper
 
-
-async def fetch_page(url):
-    async with aiohttp.ClientSession().get(url) as response:
-        # print(f'time for request: {time.time()-page_time}')
-        return await response.text()
+PAGE_RE = re.compile(r"([?&]page=)(\d+)")  # номер страницы поиска в адресе, любой длины
 
 
 class LamodaSearchPage:
-    def __init__(self, url):
+    def __init__(self, url, page_content=b""):
+        """
+        :param url: адрес страницы поиска
+        :param page_content: уже загруженное содержимое страницы (например, из AsyncCrawler.fetch_many).
+        Если не передано - страница загружается сразу
+        """
         self.url = url
-        self.page_content = ""
-        self.page_parser = None
+        self.page_content = page_content
         self._get_page()
 
     def _get_page(self) -> None:
         """
-        Загружает и парсит страницу self.url на момент товаров.
+        Загружает страницу self.url (если она не передана в конструктор). Разбор - в goods_on_page
         :return: None
         """
         if not self.page_content:
-            self.page_content = requests.get(self.url, timeout=(5.0, 10.0)).content
-        if not self.page_parser:
-            self.page_parser = LamodaSearchPageParser(self.page_content)
+            self.page_content = AsyncCrawler.fetch(self.url)
 
     def goods_on_page(self, category_id, sub_category_id, shop_id, option=0) -> List[Good]:
         """
-        Парсит каждый товар и формирует объекты Good
+        Парсит каждый товар (в процессе ParsePool) и формирует объекты Good
         :param option: option параметр
         :param category_id: ID главной категории
         :param sub_category_id: ID подкатегории
@@ -42,41 +39,79 @@ class LamodaSearchPage:
         :return: массив объектов Good
         """
         self._get_page()
-        result = []
-        for good_item in self.page_parser.goods_soup:
-            item = LamodaGoodsOnSearchPageParser(good_item)
-            try:
-                brand = item.brand
-                description = item.description
-                link = item.link
-                image_link = item.image_link
-                old_price = item.default_price
-                new_price = item.final_price
-                if old_price or new_price:
-                    good = Good(description=description, final_price=new_price, image_links_str=image_link, link=link,
-                                brand=brand, standard_price=old_price, sub_category_id=sub_category_id, shop_id=shop_id,
-                                category_id=category_id, option=option)
-                    result.append(good)
-            except ValueError:
-                # При возникновении данной ошибки нет либо описания. либо бренда либо ссылки. Добавление такого товара не требуется - не валиден
-                pass
+        result = self.goods_from_cards(ParsePool.run(parse_search_cards, self.page_content), category_id=category_id,
+                                       sub_category_id=sub_category_id, shop_id=shop_id, option=option)
         if not result:
             raise ValueError("No goods was found")
         return result
 
+    def iter_goods(self, category_id, sub_category_id, shop_id, option=0) -> Iterator[Good]:
+        """
+        Как goods_on_page, но отдает товары по мере разбора. В ParsePool уходят две задачи: поиск и разбор только
+        первой карточки (parse_first_search_card) и разбор всей страницы (parse_search_cards) - первый товар
+        доступен, не дожидаясь разбора остальных
+        :param category_id: ID главной категории
+        :param sub_category_id: ID подкатегории
+        :param shop_id: ID магазина
+        :param option: option параметр
+        :return: генератор объектов Good (карточки без цен пропускаются)
+        """
+        self._get_page()
+        goods_values = dict(category_id=category_id, sub_category_id=sub_category_id, shop_id=shop_id, option=option)
+        first_cards = ParsePool.submit(parse_first_search_card, self.page_content)
+        all_cards = ParsePool.submit(parse_search_cards, self.page_content)
+        first_goods = self.goods_from_cards(ParsePool.result(first_cards), **goods_values)
+        yield from first_goods
+        first_links = {good.link for good in first_goods}
+        for good in self.goods_from_cards(ParsePool.result(all_cards), **goods_values):
+            if good.link not in first_links:
+                yield good
+
+    @staticmethod
+    def goods_from_cards(cards: List[SearchCard], category_id, sub_category_id, shop_id, option=0) -> List[Good]:
+        """
+        Формирует объекты Good из разобранных карточек. Карточки без цен пропускаются
+        :param cards: карточки страницы поиска (parse_search_cards)
+        :param category_id: ID главной категории
+        :param sub_category_id: ID подкатегории
+        :param shop_id: ID магазина
+        :param option: option параметр
+        :return: массив объектов Good (может быть пустым)
+        """
+        return [Good(description=card.description, final_price=card.final_price, image_links_str=card.image_link,
+                     link=card.link, brand=card.brand, standard_price=card.default_price,
+                     sub_category_id=sub_category_id, shop_id=shop_id, category_id=category_id, option=option)
+                for card in cards if card.default_price or card.final_price]
+
+    @staticmethod
+    def page_number(url: str) -> int:
+        """
+        Номер страницы поиска в адресе
+        :param url: адрес страницы поиска
+        :return: номер страницы (1, если в адресе его нет)
+        """
+        match = PAGE_RE.search(url)
+        return int(match.group(2)) if match else 1
+
+    @staticmethod
+    def page_url(url: str, number: int) -> str:
+        """
+        Адрес страницы поиска с другим номером
+        :param url: адрес любой страницы этого поиска
+        :param number: номер страницы
+        :return: адрес страницы number
+        """
+        if PAGE_RE.search(url):
+            return PAGE_RE.sub(lambda match: f"{match.group(1)}{number}", url, count=1)
+        return f"{url}{'&' if '?' in url else '?'}page={number}"
+
     @property
     def next_page(self) -> str:
         """
         Вычисляет адрес следующей страницы
         :return: адрес следующей страницы
         """
-        this_page = re.search("page=([0-9]{1,2})", self.url).group(1)
-        if this_page:
-            this_page = int(this_page) + 1
-            next_page = re.sub("page=\d{1,2}", "page=" + str(this_page), self.url)
-            return next_page
-        self._get_page()
-        return self.page_parser.next_page
+        return self.page_url(self.url, self.page_number(self.url) + 1)
 
 
 if __name__ == '__main__':
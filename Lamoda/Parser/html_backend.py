@@ -0,0 +1,54 @@
+import logging
+
+from typing import Optional
+from bs4 import BeautifulSoup, SoupStrainer
+from config import Config
+
+
+class HtmlBackend:
+    """
+    Построение супа для страниц магазина.
+    BACKEND - парсер BeautifulSoup из настроек (Config.html_parser_backend): "html.parser" (по умолчанию, без
+    зависимостей) или "lxml" (быстрее, если пакет установлен; без него используется "html.parser").
+    PARSE_ONLY (Config.html_parse_only) - строить дерево только из нужных областей страницы (SoupStrainer),
+    а не из всей страницы с меню, рекомендациями и подвалом.
+    Выбрать настройки можно по результатам python -m benchmarks.html_parse_bench
+    """
+    PARSERS = ("html.parser", "lxml")
+    logger = logging.getLogger(__name__)
+
+    @classmethod
+    def resolve(cls, backend: str) -> str:
+        """
+        Проверяет, что парсер поддерживается и установлен
+        :param backend: имя парсера
+        :return: имя парсера, который будет использован
+        """
+        if backend not in cls.PARSERS:
+            raise ValueError(f"Unknown html parser backend: {backend}")
+        if backend == "lxml":
+            try:
+                import lxml  # noqa: F401
+            except ImportError:
+                cls.logger.warning("lxml is not installed, html.parser will be used")
+                return "html.parser"
+        return backend
+
+    @classmethod
+    def make_soup(cls, page, strainer: Optional[SoupStrainer] = None, backend: Optional[str] = None,
+                  parse_only: Optional[bool] = None) -> BeautifulSoup:
+        """
+        Разбирает страницу
+        :param page: содержимое страницы (bytes или str)
+        :param strainer: области страницы, из которых строится дерево (используется, если включен parse_only)
+        :param backend: имя парсера. По умолчанию - BACKEND
+        :param parse_only: строить дерево только из strainer. По умолчанию - PARSE_ONLY
+        :return: суп страницы
+        """
+        backend = cls.BACKEND if backend is None else cls.resolve(backend)
+        parse_only = cls.PARSE_ONLY if parse_only is None else parse_only
+        return BeautifulSoup(page, backend, parse_only=strainer if parse_only else None)
+
+
+HtmlBackend.BACKEND = HtmlBackend.resolve(getattr(Config, "html_parser_backend", "html.parser"))
+HtmlBackend.PARSE_ONLY = getattr(Config, "html_parse_only", True)
@@ -1,8 +1,24 @@
 import re
 
-from bs4 import BeautifulSoup
-from typing import List
+from bs4 import SoupStrainer
+from typing import List, NamedTuple, Tuple
 from Lamoda.Locators.lamoda_good_page_locators import LamodaGoodPageLocators
+from Lamoda.Parser.html_backend import HtmlBackend
+
+# заголовок, цены и галерея товара - остальная страница (меню, рекомендации, подвал) не нужна
+GOOD_STRAINER = SoupStrainer(class_=["x-premium-product-title__brand-name", "x-premium-product-title__model-name",
+                                     "x-premium-product-prices__price", "x-premium-product-gallery__cell"])
+
+
+class GoodPageRecord(NamedTuple):
+    """
+    Значения страницы товара. В отличие от LamodaGoodPageParser не держит суп и передается между процессами
+    """
+    brand: str
+    model: str
+    default_price: float
+    final_price: float
+    images: Tuple[str, ...]
 
 
 class LamodaGoodPageParser:
@@ -10,7 +26,7 @@ class LamodaGoodPageParser:
     Класс для поиска на странице значений товара
     """
     def __init__(self, page):
-        self.page_soup = BeautifulSoup(page, 'html.parser')
+        self.page_soup = HtmlBackend.make_soup(page, GOOD_STRAINER)
         self._prices = []
 
     def get_prices(self) -> List[float]:
@@ -80,5 +96,25 @@ class LamodaGoodPageParser:
         locator = LamodaGoodPageLocators.IMAGES
         return ["https:" + re.sub("/img\d{3,4}x\d{3,4}/", "/product/", x.attrs['src']) for x in self.page_soup.select(locator)]
 
+    def to_record(self) -> GoodPageRecord:
+        """
+        Собирает значения страницы
+        :return: GoodPageRecord
+        """
+        try:
+            return GoodPageRecord(brand=self.brand, model=self.model, default_price=self.default_price,
+                                  final_price=self.final_price, images=tuple(self.images))
+        except AttributeError:  # на странице нет заголовка товара (товар снят с продажи или страница ошибки)
+            raise ValueError("Good title not found")
+
     def __repr__(self):
-        return f'Brand {self.brand}, model: {self.model}, old price = {self.default_price}, final price = {self.final_price}, images = {self.images}\n'
\ No newline at end of file
+        return f'Brand {self.brand}, model: {self.model}, old price = {self.default_price}, final price = {self.final_price}, images = {self.images}\n'
+
+
+def parse_good_page(page: bytes) -> GoodPageRecord:
+    """
+    Разбирает страницу товара (выполняется в процессе ParsePool)
+    :param page: содержимое страницы
+    :return: GoodPageRecord
+    """
+    return LamodaGoodPageParser(page).to_record()
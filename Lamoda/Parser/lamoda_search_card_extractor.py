@@ -0,0 +1,104 @@
+import re
+
+from typing import NamedTuple, Optional, Tuple
+from bs4 import Tag
+from Lamoda.Locators.lamoda_search_good_locators import LamodaSearchGoodLocators
+
+IMAGE_SIZE_RE = re.compile(r"/img\d{3,4}x\d{3,4}/")  # превью на странице поиска -> полноразмерное изображение
+NOT_DIGIT_RE = re.compile(r"\D")  # в цене "5 200 ₽" бывают пробелы, неразрывные пробелы и знак рубля
+
+
+def _tag_and_class(locator: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Разбирает простой локатор вида "tag.class", "*.class" или "tag" на имя тега и класс
+    :param locator: CSS локатор из LamodaSearchGoodLocators
+    :return: (имя тега или None - любой, класс или None - любой)
+    """
+    tag, _, css_class = locator.strip().partition(".")
+    return (None if tag in ("", "*") else tag), (css_class or None)
+
+
+LINK = _tag_and_class(LamodaSearchGoodLocators.LINK)
+IMAGE = _tag_and_class(LamodaSearchGoodLocators.IMAGE)
+OLD_PRICE = _tag_and_class(LamodaSearchGoodLocators.OLD_PRICE)
+NEW_PRICE = _tag_and_class(LamodaSearchGoodLocators.NEW_PRICE)
+SINGLE_PRICE = _tag_and_class(LamodaSearchGoodLocators.SINGLE_PRICE)
+BRAND = _tag_and_class(LamodaSearchGoodLocators.BRAND)
+DESCRIPTION = _tag_and_class(LamodaSearchGoodLocators.DESCRIPTION)
+# класс -> поле карточки. Карточка обходится один раз, каждое поле берется из первого подходящего элемента
+CLASS_FIELDS = {css_class: (tag, field) for field, (tag, css_class) in (
+    ("image", IMAGE), ("old_price", OLD_PRICE), ("new_price", NEW_PRICE), ("single_price", SINGLE_PRICE),
+    ("brand", BRAND), ("description", DESCRIPTION))}
+
+
+class SearchCard(NamedTuple):
+    """
+    Значения одной карточки товара со страницы поиска
+    """
+    brand: str
+    description: str
+    link: str
+    image_link: str
+    default_price: int  # цена без скидки, а если скидки нет - единственная цена
+    final_price: int  # цена со скидкой, 0 - если скидки нет
+
+
+class LamodaSearchCardExtractor:
+    """
+    Разбор карточки товара со страницы поиска Ламоды за один обход поддерева карточки
+    (вместо отдельного select_one на каждое поле)
+    """
+    @classmethod
+    def extract(cls, card: Tag) -> SearchCard:
+        """
+        Собирает значения карточки
+        :param card: суп карточки товара (элемент LamodaPageLocators.ITEMS)
+        :return: SearchCard
+        """
+        found = {}
+        for element in card.descendants:
+            if not isinstance(element, Tag):
+                continue
+            if "link" not in found and element.name == LINK[0] and element.get("href"):
+                found["link"] = element
+            for css_class in element.get("class", ()):
+                tag_and_field = CLASS_FIELDS.get(css_class)
+                if tag_and_field and tag_and_field[1] not in found and tag_and_field[0] in (None, element.name):
+                    found[tag_and_field[1]] = element
+            if len(found) == len(CLASS_FIELDS) + 1:
+                break
+        if "link" not in found:
+            raise ValueError("Link not found")
+        brand = cls._text(found.get("brand"))
+        if not brand:
+            raise ValueError("Brand not found")
+        description = cls._text(found.get("description"))
+        if not description:
+            raise ValueError("Description not found")
+        if "old_price" in found:
+            default_price = cls._price(found["old_price"])
+        else:
+            default_price = cls._price(found.get("single_price"))
+        return SearchCard(brand=brand,
+                          description=description,
+                          link="https://www.lamoda.ru" + found["link"]["href"],
+                          image_link=cls._image_link(found.get("image")),
+                          default_price=default_price,
+                          final_price=cls._price(found.get("new_price")))
+
+    @staticmethod
+    def _text(element: Optional[Tag]) -> str:
+        return element.get_text(strip=True) if element is not None else ""
+
+    @staticmethod
+    def _price(element: Optional[Tag]) -> int:
+        if element is None:
+            return 0
+        value = NOT_DIGIT_RE.sub("", element.get_text())
+        return int(value) if value else 0
+
+    @staticmethod
+    def _image_link(element: Optional[Tag]) -> str:
+        if element is None or not element.get("src"):
+            return ""
+        return "https:" + IMAGE_SIZE_RE.sub("/product/", element["src"])
@@ -1,11 +1,22 @@
-from bs4 import BeautifulSoup
+import soupsieve
+
+from html.parser import HTMLParser
+from bs4 import SoupStrainer, UnicodeDammit
+from typing import List, Optional
 from Lamoda.Locators.lamoda_search_page_locators import LamodaPageLocators
+from Lamoda.Parser.html_backend import HtmlBackend
+from Lamoda.Parser.lamoda_search_card_extractor import LamodaSearchCardExtractor, SearchCard
+
+ITEMS_SELECTOR = soupsieve.compile(LamodaPageLocators.ITEMS)  # селектор карточек разбирается один раз при импорте
+CATALOG_STRAINER = SoupStrainer("div", class_="grid__catalog")  # карточки товаров лежат только в сетке каталога
+CARD_SELECTOR = soupsieve.compile("div.x-product-card__card")  # карточка в HTML первой карточки (find_first_card)
+CARD_STRAINER = SoupStrainer("div", class_="x-product-card__card")
 
 
 class LamodaSearchPageParser:
     def __init__(self, page):
         self.page = page
-        self.page_soup = BeautifulSoup(page, "html.parser")
+        self.page_soup = HtmlBackend.make_soup(page, CATALOG_STRAINER)
 
     @property
     def goods_soup(self):
@@ -13,6 +24,114 @@ class LamodaSearchPageParser:
         Запрос массива супов для каждого товара на странице
         :return: массив супов для дальнейшего парсинга
         """
-        locator = LamodaPageLocators.ITEMS
+        return ITEMS_SELECTOR.select(self.page_soup)
+
+
+class FirstCardFinder(HTMLParser):
+    """
+    Поиск HTML первой карточки сетки каталога токенизатором html.parser, без построения дерева.
+    Страница подается кусками по CHUNK символов, разбор останавливается, как только первая карточка закрылась
+    """
+    CHUNK = 4 * 1024
+    CATALOG_CLASS = "grid__catalog"
+    CARD_CLASS = "x-product-card__card"
+
+    def __init__(self, text: str):
+        super().__init__(convert_charrefs=False)
+        self.text = text
+        self.line_starts = [0]  # начала строк self.text, считаются по мере надобности
+        self.depth = None  # открытых div в сетке каталога (None - сетка еще не началась)
+        self.card_start = self.card_depth = None
+        self.card_end = None
+        self.done = False
+
+    def find(self) -> Optional[str]:
+        """
+        :return: HTML первой карточки или None, если в сетке каталога нет карточек
+        """
+        for start in range(0, len(self.text), self.CHUNK):
+            self.feed(self.text[start:start + self.CHUNK])
+            if self.done:
+                break
+        if self.card_end is None:
+            return None
+        return self.text[self.card_start:self.card_end]
+
+    def handle_starttag(self, tag, attrs):
+        if tag != "div" or self.done:
+            return
+        classes = (dict(attrs).get("class") or "").split()
+        if self.depth is None:
+            if self.CATALOG_CLASS in classes:
+                self.depth = 1
+            return
+        self.depth += 1
+        if self.card_start is None and self.CARD_CLASS in classes:
+            self.card_start, self.card_depth = self.position(), self.depth
+
+    def handle_endtag(self, tag):
+        if tag != "div" or self.done or self.depth is None:
+            return
+        if self.depth == self.card_depth:
+            self.card_end = self.text.index(">", self.position()) + 1
+            self.done = True
+        self.depth -= 1
+        if self.depth == 0:
+            self.done = True  # сетка каталога закрылась без карточек
+
+    def position(self) -> int:
+        """
+        :return: позиция текущего тега в self.text
+        """
+        line, column = self.getpos()
+        while len(self.line_starts) < line:
+            self.line_starts.append(self.text.index("\n", self.line_starts[-1]) + 1)
+        return self.line_starts[line - 1] + column
+
+
+def find_first_card(page) -> Optional[str]:
+    """
+    HTML первой карточки страницы поиска (FirstCardFinder)
+    :param page: содержимое страницы (bytes или str)
+    :return: HTML карточки или None, если карточек нет
+    """
+    if isinstance(page, bytes):
+        page = UnicodeDammit(page, is_html=True).unicode_markup
+    return FirstCardFinder(page).find()
+
+
+def extract_cards(good_items) -> List[SearchCard]:
+    """
+    Значения карточек из их супов
+    :param good_items: супы карточек
+    :return: массив SearchCard (карточки без ссылки, бренда или описания пропускаются)
+    """
+    cards = []
+    for good_item in good_items:
+        try:
+            cards.append(LamodaSearchCardExtractor.extract(good_item))
+        except ValueError:
+            # При возникновении данной ошибки нет либо описания. либо бренда либо ссылки. Добавление такого товара не требуется - не валиден
+            continue
+    return cards
+
+
+def parse_first_search_card(page) -> List[SearchCard]:
+    """
+    Разбирает только первую карточку страницы поиска (выполняется в процессе ParsePool)
+    :param page: содержимое страницы
+    :return: массив из первой карточки или пустой, если ее не удалось найти или разобрать
+    """
+    fragment = find_first_card(page)
+    if fragment is None:
+        return []
+    return extract_cards(CARD_SELECTOR.select(HtmlBackend.make_soup(fragment, CARD_STRAINER))[:1])
+
 
-        return self.page_soup.select(locator)
\ No newline at end of file
+def parse_search_cards(page) -> List[SearchCard]:
+    """
+    Разбирает страницу поиска в значения карточек (выполняется в процессе ParsePool)
+    :param page: содержимое страницы
+    :return: массив SearchCard
+    """
+    return extract_cards(LamodaSearchPageParser(page).goods_soup)
@@ -0,0 +1,64 @@
+import os
+
+from unittest import TestCase
+from unittest.mock import patch
+
+from Lamoda.Parser.html_backend import HtmlBackend
+from Lamoda.Parser.lamoda_good_page_parser import LamodaGoodPageParser
+from Lamoda.Parser.lamoda_search_card_extractor import LamodaSearchCardExtractor
+from Lamoda.Parser.lamoda_search_page_parser import LamodaSearchPageParser
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures")
+
+
+def load_fixture(name: str) -> bytes:
+    with open(os.path.join(FIXTURES_DIR, name), "rb") as file:
+        return file.read()
+
+
+class TestHtmlBackend(TestCase):
+    def setUp(self):
+        self.old_parse_only = HtmlBackend.PARSE_ONLY
+
+    def tearDown(self):
+        HtmlBackend.PARSE_ONLY = self.old_parse_only
+
+    def good_values(self, parse_only):
+        HtmlBackend.PARSE_ONLY = parse_only
+        parser = LamodaGoodPageParser(load_fixture("lamoda_good_page.html"))
+        return parser.brand, parser.model, parser.default_price, parser.final_price, parser.images
+
+    def search_cards(self, name, parse_only):
+        HtmlBackend.PARSE_ONLY = parse_only
+        cards = []
+        for soup in LamodaSearchPageParser(load_fixture(name)).goods_soup:
+            try:
+                cards.append(LamodaSearchCardExtractor.extract(soup))
+            except ValueError:
+                pass
+        return cards
+
+    def test_good_page_parse_only_same_values(self):
+        values = self.good_values(parse_only=True)
+        self.assertEqual(self.good_values(parse_only=False), values)
+        self.assertEqual(("Columbia", "Куртка утепленная Oak Harbor", 19999.0, 15999.0), values[:4])
+        self.assertEqual(3, len(values[4]))
+
+    def test_search_page_parse_only_same_cards(self):
+        for name in ("lamoda_search_page_1.html", "lamoda_search_page_2.html"):
+            with self.subTest(page=name):
+                self.assertEqual(self.search_cards(name, parse_only=False), self.search_cards(name, parse_only=True))
+
+    def test_parse_only_skips_rest_of_page(self):
+        HtmlBackend.PARSE_ONLY = True
+        soup = LamodaGoodPageParser(load_fixture("lamoda_good_page.html")).page_soup
+        self.assertIsNone(soup.select_one("div.x-recommendations"))
+        self.assertIsNone(soup.select_one("script"))
+
+    def test_resolve_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            HtmlBackend.resolve("html5")
+
+    def test_resolve_lxml_not_installed(self):
+        with patch.dict("sys.modules", {"lxml": None}):
+            self.assertEqual("html.parser", HtmlBackend.resolve("lxml"))
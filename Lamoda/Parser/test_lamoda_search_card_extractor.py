@@ -0,0 +1,78 @@
+import json
+import os
+
+from unittest import TestCase
+from unittest.mock import patch
+
+from Crawler.parse_pool import ParsePool
+from Lamoda.Parser.lamoda_search_page_parser import (LamodaSearchPageParser, find_first_card, parse_first_search_card,
+                                                     parse_search_cards)
+from Lamoda.Parser.lamoda_search_card_extractor import LamodaSearchCardExtractor
+from Lamoda.Pages.lamoda_search_page import LamodaSearchPage
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures")
+
+
+def load_fixture(name: str) -> bytes:
+    with open(os.path.join(FIXTURES_DIR, name), "rb") as file:
+        return file.read()
+
+
+class TestLamodaSearchCardExtractor(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with open(os.path.join(FIXTURES_DIR, "expected_search_cards.json"), encoding="utf-8") as file:
+            cls.expected = json.load(file)
+
+    def extract_page(self, name):
+        cards = []
+        soups = LamodaSearchPageParser(load_fixture(name)).goods_soup
+        for soup in soups:
+            try:
+                cards.append(LamodaSearchCardExtractor.extract(soup)._asdict())
+            except ValueError:
+                pass
+        return len(soups), cards
+
+    def test_fixture_pages(self):
+        for name, expected in self.expected.items():
+            with self.subTest(page=name):
+                cards_count, cards = self.extract_page(name)
+                self.assertEqual(expected["cards"], cards_count)
+                self.assertEqual(expected["goods"], cards)
+
+    def test_goods_on_page_skips_cards_without_price(self):
+        page = LamodaSearchPage("https://www.lamoda.ru/catalogsearch/result/?q=куртка&page=2",
+                                load_fixture("lamoda_search_page_2.html"))
+        goods = page.goods_on_page(category_id=2, sub_category_id=1, shop_id=1, option=1)
+        self.assertEqual(["The North Face", "Levi's®"], [good.brand for good in goods])
+        self.assertEqual((0, 27990), (goods[0].standard_price, goods[0].final_price))
+
+    def test_first_card(self):
+        for name, expected in self.expected.items():
+            with self.subTest(page=name):
+                page = load_fixture(name)
+                self.assertEqual(expected["goods"], [card._asdict() for card in parse_search_cards(page)])
+                self.assertEqual(expected["goods"][:1], [card._asdict() for card in parse_first_search_card(page)])
+        self.assertIsNone(find_first_card(b"<html><body><div class='x-product-card__card'></div></body></html>"))
+        self.assertIsNone(find_first_card(b"<div class='grid__catalog'></div><div class='x-product-card__card'></div>"))
+
+    def test_class_attribute_quotes(self):
+        page = load_fixture("lamoda_search_page_1.html").decode()
+        expected = [card._asdict() for card in parse_search_cards(page)]
+        for old, new in (('class="grid__catalog"', "class='grid__catalog'"),
+                         ('class="x-product-card__card"', "class=x-product-card__card")):
+            with self.subTest(attribute=new):
+                self.assertIn(old, page)
+                changed = page.replace(old, new)
+                self.assertEqual(expected, [card._asdict() for card in parse_search_cards(changed)])
+                self.assertEqual(expected[:1], [card._asdict() for card in parse_first_search_card(changed)])
+
+    def test_iter_goods_first_card_alone(self):
+        page = LamodaSearchPage("https://www.lamoda.ru/catalogsearch/result/?q=куртка&page=1",
+                                load_fixture("lamoda_search_page_1.html"))
+        with patch.object(ParsePool, "submit", wraps=ParsePool.submit) as submit:
+            goods = list(page.iter_goods(category_id=2, sub_category_id=1, shop_id=1, option=1))
+        self.assertEqual([parse_first_search_card, parse_search_cards], [call.args[0] for call in submit.call_args_list])
+        self.assertEqual([good.link for good in page.goods_on_page(category_id=2, sub_category_id=1, shop_id=1, option=1)],
+                         [good.link for good in goods])
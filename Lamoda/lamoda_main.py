@@ -1,6 +1,16 @@
+import logging
+
+from typing import Iterator, List
+from config import Config
+from Crawler.async_crawler import AsyncCrawler
+from Crawler.http_cache import HttpCache
+from Crawler.parse_pool import ParsePool
 from Data_models.goods_db import Good, GoodKeeper
+from Data_models.good_images_db import GoodImages
 from Lamoda.Pages.lamoda_search_page import LamodaSearchPage
 from Lamoda.Pages.lamoda_good_page import LamodaGoodPage
+from Lamoda.Parser.lamoda_good_page_parser import GoodPageRecord, parse_good_page
+from Lamoda.Parser.lamoda_search_page_parser import parse_search_cards
 from Data_models.shops_db import Shop
 from Data_models.current_search_pages import NextSearchPages
 from Data_models.categories_db import CategoriesPool, Category
@@ -8,16 +18,37 @@ from Data_models.categories_db import CategoriesPool, Category
 
 class LamodaMain:
     LAMODA_SHOP_ID = 1
+    CRAWL_AHEAD_PAGES = getattr(Config, "crawl_ahead_pages", 3)  # сколько страниц поиска загружать за один раз
+
+    logger = logging.getLogger(__name__)
 
     @classmethod
     def add_new_goods(cls, sub_category_id, option) -> Good:
         """
-        Поиск новых товаров на сайте и добавление в базу
+        Поиск новых товаров на сайте и добавление в базу (iter_new_goods целиком)
         :param option: опциональный параметр
         :param sub_category_id: ID подкатегории
         :return: объект первого добавленного товара.
         """
-        new_search = 0
+        goods = cls.iter_new_goods(sub_category_id, option)
+        first_good = next(goods)
+        for _ in goods:
+            pass
+        return first_good
+
+    @classmethod
+    def iter_new_goods(cls, sub_category_id, option) -> Iterator[Good]:
+        """
+        Поиск новых товаров на сайте и добавление в базу, по мере разбора.
+        Берется окно из CRAWL_AHEAD_PAGES следующих страниц поиска. Первая карточка первой страницы разбирается
+        в ParsePool отдельно от остальных: первый товар сразу записывается в базу и отдается, пока остальные
+        страницы окна загружаются в фоне. Затем остальные страницы разбираются в ParsePool, товары берутся по порядку до первой
+        пустой (или не загруженной) страницы и добавляются одной транзакцией, а адрес следующей страницы
+        записывается одним upsert
+        :param option: опциональный параметр
+        :param sub_category_id: ID подкатегории
+        :return: генератор записанных в базу товаров. Первый - сразу после разбора первой карточки
+        """
         try:
             sub_category = CategoriesPool.get_sub_category_by_id(sub_category_id=sub_category_id, option=option)
         except ValueError as error:
@@ -31,40 +62,125 @@ class LamodaMain:
                 option_item = CategoriesPool.get_option(option)
                 ends = f"+{option_item.text_value}"
             next_page = search_string+sub_category.text_value.replace(" ", "+") + ends
-            new_search = 1
-        try:
-            search_page = LamodaSearchPage(next_page)
-        except ValueError as error:  # не найдены новые товары
-            raise ValueError(error)
-        goods = search_page.goods_on_page(category_id=sub_category.main_category_id, sub_category_id=sub_category_id, shop_id=cls.LAMODA_SHOP_ID, option=option)
-        for good in goods:
-            try:
-                good.insert_or_update_good()
-            except Exception as err:
-                print('Query Failed: %s\nError: %s' + (str(err)))
-        if new_search:
-            NextSearchPages.insert_next_search_page(sub_category_id=sub_category_id, shop_id=cls.LAMODA_SHOP_ID, address=search_page.next_page)
-        else:
-            NextSearchPages.update_next_search_page(sub_category_id=sub_category_id, shop_id=cls.LAMODA_SHOP_ID, address=search_page.next_page)
-        if len(goods) > 0:
-            return goods[0]
-        else:
+        first_number = LamodaSearchPage.page_number(next_page)
+        urls = [LamodaSearchPage.page_url(next_page, first_number + i) for i in range(max(1, cls.CRAWL_AHEAD_PAGES))]
+        rest_contents = AsyncCrawler.submit_many(urls[1:])  # остальное окно качается, пока разбираем первую страницу
+        goods_values = dict(category_id=sub_category.main_category_id, sub_category_id=sub_category_id,
+                            shop_id=cls.LAMODA_SHOP_ID, option=option)
+        first_page_goods = LamodaSearchPage(urls[0]).iter_goods(**goods_values)
+        first_good = next(first_page_goods, None)
+        if first_good is None:
+            rest_contents.cancel()
             raise ValueError(f"No goods was found by category:{sub_category_id}")
+        GoodKeeper.upsert_many([first_good])
+        yield first_good
+
+        goods, pages_count = list(first_page_goods), 1
+        loaded = []
+        for url, content in zip(urls[1:], rest_contents.result()):
+            if isinstance(content, Exception):
+                cls.logger.warning(f"Failed to load search page {url}: {content!r}")
+                break
+            loaded.append(content)
+        for url, cards in zip(urls[1:], ParsePool.map(parse_search_cards, loaded)):
+            if isinstance(cards, Exception):
+                cls.logger.warning(f"Failed to parse search page {url}: {cards!r}")
+                break
+            page_goods = LamodaSearchPage.goods_from_cards(cards, **goods_values)
+            if not page_goods:  # конец выдачи поиска
+                break
+            goods += page_goods
+            pages_count += 1
+        GoodKeeper.upsert_many(goods)  # остаток окна - одна транзакция
+        NextSearchPages.set_next_search_page(sub_category_id=sub_category_id, shop_id=cls.LAMODA_SHOP_ID,
+                                             address=LamodaSearchPage.page_url(next_page, first_number + pages_count),
+                                             option=option)
+        cls.logger.info(f"Crawled {pages_count} search pages, {len(goods) + 1} goods for sub_category {sub_category_id}")
+        yield from goods
 
     @classmethod
     def update_good(cls, good: Good):
         """
-        Запрашивает по ссылке good.link актуальное состояние товара
+        Запрашивает по ссылке good.link актуальное состояние товара. Если страница не изменилась с прошлой
+        проверки (HttpCache), товар не разбирается - обновляется только last_update_timestamp. Товар, записанный
+        в базу не полностью (без изображений или цен), загружается и разбирается всегда.
+        Если изменились изображения товара, их file_id в Telegram (GoodImages) забываются
         :param good:
         :return: возвращает экземпляр обновленного товара
         """
-        lamoda_good = LamodaGoodPage(good.link.replace(" ", "+")).get_good_on_page()
+        link = good.link.replace(" ", "+")
+        response = HttpCache.fetch(link, revalidate=cls._is_complete(good))
+        if response is None:
+            GoodKeeper.touch_goods([good])
+            return good
+        lamoda_good = LamodaGoodPage(link, response.body).get_good_on_page()
+        if cls._fill_good(good, lamoda_good):
+            GoodImages.forget([good.good_id])
+        good.update_in_db()
+        HttpCache.remember([link], [response])
+        return good
+
+    @classmethod
+    def update_goods(cls, goods: List[Good]) -> List[Good]:
+        """
+        Обновляет пачку товаров: страницы товаров загружаются параллельно условными запросами (HttpCache)
+        и разбираются параллельно (ParsePool), результат пишется в базу одной транзакцией. У товаров, страница
+        которых не изменилась, обновляется только last_update_timestamp (кроме товаров, записанных не полностью -
+        их страницы разбираются всегда). Товары, страницу которых загрузить или разобрать не удалось, пропускаются.
+        У товаров с изменившимися изображениями забываются их file_id (GoodImages)
+        :param goods: массив товаров
+        :return: массив обновленных товаров (вместе с не изменившимися)
+        """
+        links = [good.link.replace(" ", "+") for good in goods]
+        responses = HttpCache.fetch_many(links, [cls._is_complete(good) for good in goods])
+        loaded, unchanged = [], []
+        for good, link, response in zip(goods, links, responses):
+            if isinstance(response, Exception):
+                cls.logger.warning(f"Failed to load good {good.good_id} ({good.link}): {response!r}")
+            elif response is None:
+                unchanged.append(good)
+            else:
+                loaded.append((good, link, response))
+        records = ParsePool.map(parse_good_page, [response.body for _, _, response in loaded])
+        updated, parsed, images_changed = [], [], []
+        for (good, link, response), record in zip(loaded, records):
+            if isinstance(record, Exception):
+                cls.logger.warning(f"Failed to parse good {good.good_id} ({good.link}): {record!r}")
+                continue
+            if cls._fill_good(good, record):
+                images_changed.append(good.good_id)
+            updated.append(good)
+            parsed.append((link, response))
+        GoodKeeper.upsert_many(updated)
+        GoodKeeper.touch_goods(unchanged)
+        GoodImages.forget(images_changed)
+        HttpCache.remember([link for link, _ in parsed], [response for _, response in parsed])
+        return updated + unchanged
+
+    @staticmethod
+    def _is_complete(good: Good) -> bool:
+        """
+        Записан ли товар в базу полностью: с изображениями и ценой. Неполный товар (например, из карточки поиска
+        без изображения) нельзя оставить как есть, даже если его страница не изменилась
+        :param good: товар
+        :return: True - есть изображения и хотя бы одна цена
+        """
+        return bool(good.image_links_str) and bool(good.standard_price or good.final_price)
+
+    @classmethod
+    def _fill_good(cls, good: Good, lamoda_good: GoodPageRecord) -> bool:
+        """
+        Переносит в товар значения со страницы товара
+        :param good: товар
+        :param lamoda_good: разобранная страница товара
+        :return: True, если изменился набор изображений товара
+        """
+        old_image_links_str = good.image_links_str
         good.brand = lamoda_good.brand
         good.final_price = lamoda_good.final_price
         good.standard_price = lamoda_good.default_price
         good.set_image_links(lamoda_good.images)
-        good.update_in_db()
-        return good
+        return good.image_links_str != old_image_links_str
 
     # @classmethod
     # def get_good_by_link(cls, link, good_id=-1) -> Good:
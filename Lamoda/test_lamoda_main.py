@@ -0,0 +1,128 @@
+import os
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+from urllib.parse import parse_qs, urlsplit
+
+from Crawler.async_crawler import AsyncCrawler
+from Data_models.categories_db import CategoriesPool
+from Data_models.current_search_pages import NextSearchPages
+from Data_models.db_connection import DBConnection
+from Data_models.db_test_case import DBTestCase
+from Data_models.goods_db import GoodKeeper
+from Lamoda.lamoda_main import LamodaMain
+from Lamoda.Pages.lamoda_search_page import LamodaSearchPage
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+class SearchHandler(BaseHTTPRequestHandler):
+    """
+    Страницы поиска: 1 и 2 - из фикстур, дальше - пустая выдача
+    """
+    protocol_version = "HTTP/1.1"
+    pages = {}
+    requested = []
+    delay = 0  # (сек) задержка ответа для страниц кроме первой
+
+    def do_GET(self):
+        page = int(parse_qs(urlsplit(self.path).query)["page"][0])
+        SearchHandler.requested.append(page)
+        if page > 1:
+            time.sleep(self.delay)
+        body = self.pages.get(page, b"<html><body><div class='grid__catalog'></div></body></html>")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestCrawlAhead(DBTestCase):
+    @classmethod
+    def setUpClass(cls):
+        for number in (1, 2):
+            with open(os.path.join(FIXTURES_DIR, f"lamoda_search_page_{number}.html"), "rb") as file:
+                SearchHandler.pages[number] = file.read()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), SearchHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        AsyncCrawler.close()
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.old_pages = LamodaMain.CRAWL_AHEAD_PAGES
+        super().setUp()
+        with DBConnection.connect() as connection:
+            cursor = connection.cursor()
+            cursor.execute("INSERT INTO shops (shop_id, name, search_address) VALUES (1, 'lamoda', ?)",
+                           (self.base_url + "/catalogsearch/result/?page=1&q=",))
+            cursor.execute("INSERT INTO categories (category_id, text_value) VALUES (2, 'Одежда')")
+            cursor.execute("INSERT INTO options (option_id, text_value) VALUES (1, 'Мужские')")
+            cursor.execute("""INSERT INTO sub_categories (sub_category_id, text_value, main_category_id, option, price_values)
+            VALUES (1, 'Куртки', 2, 1, '5000, 10000, 30000')""")
+        CategoriesPool.get_catalog()
+        SearchHandler.requested.clear()
+
+    def tearDown(self):
+        SearchHandler.delay = 0
+        LamodaMain.CRAWL_AHEAD_PAGES = self.old_pages
+
+    def next_page(self):
+        return NextSearchPages.get_next_search_page(sub_category_id=1, shop_id=1, option=1)
+
+    def test_window_stops_at_empty_page(self):
+        LamodaMain.CRAWL_AHEAD_PAGES = 4
+        good = LamodaMain.add_new_goods(sub_category_id=1, option=1)
+        self.assertEqual("Grizman", good.brand)
+        self.assertEqual([1, 2, 3, 4], sorted(SearchHandler.requested))
+        with DBConnection.connect() as connection:
+            self.assertEqual(8, connection.execute("SELECT count(*) FROM goods WHERE sub_category_id=1 AND option=1")
+                             .fetchone()[0])
+        self.assertEqual(3, LamodaSearchPage.page_number(self.next_page()))
+        with self.assertRaises(ValueError):
+            LamodaMain.add_new_goods(sub_category_id=1, option=1)
+        self.assertEqual(3, LamodaSearchPage.page_number(self.next_page()))
+
+    def test_cursor_advanced_by_window(self):
+        LamodaMain.CRAWL_AHEAD_PAGES = 1
+        LamodaMain.add_new_goods(sub_category_id=1, option=1)
+        LamodaMain.add_new_goods(sub_category_id=1, option=1)
+        self.assertEqual([1, 2], SearchHandler.requested)
+        self.assertEqual(3, LamodaSearchPage.page_number(self.next_page()))
+        with DBConnection.connect() as connection:
+            self.assertEqual(1, connection.execute("SELECT count(*) FROM next_shop_pages").fetchone()[0])
+
+    def test_first_good_before_window_loaded(self):
+        LamodaMain.CRAWL_AHEAD_PAGES = 3
+        SearchHandler.delay = 0.5
+        goods = LamodaMain.iter_new_goods(sub_category_id=1, option=1)
+        start = time.perf_counter()
+        first_good = next(goods)
+        self.assertLess(time.perf_counter() - start, SearchHandler.delay)
+        self.assertEqual(first_good.good_id, GoodKeeper.get_goods_from_db_by_link(first_good.link)[0].good_id)
+        self.assertEqual(7, len(list(goods)))
+        self.assertEqual(3, LamodaSearchPage.page_number(self.next_page()))
+
+
+class TestSearchPageNumbers(TestCase):
+    def test_page_number(self):
+        self.assertEqual(123, LamodaSearchPage.page_number("https://www.lamoda.ru/catalogsearch/result/?page=123&q=a"))
+        self.assertEqual(1, LamodaSearchPage.page_number("https://www.lamoda.ru/catalogsearch/result/?q=a"))
+
+    def test_page_url(self):
+        self.assertEqual("https://www.lamoda.ru/catalogsearch/result/?q=a&page=100",
+                         LamodaSearchPage.page_url("https://www.lamoda.ru/catalogsearch/result/?q=a&page=99", 100))
+        self.assertEqual("https://www.lamoda.ru/catalogsearch/result/?q=a&page=2",
+                         LamodaSearchPage.page_url("https://www.lamoda.ru/catalogsearch/result/?q=a", 2))
+        self.assertEqual("https://www.lamoda.ru/catalogsearch/result/?q=a&subpage=1&page=2",
+                         LamodaSearchPage.page_url("https://www.lamoda.ru/catalogsearch/result/?q=a&subpage=1", 2))
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import queue
+import threading
+
+from typing import Optional
+
+import telebot
+
+from telebot import types
+from config import Config
+from Telebot.dispatcher import UpdateDispatcher
+
+
+class BotRuntime:
+    """
+    Asyncio рантайм бота: event loop получает обновления (long polling getUpdates) и раздает их обработчикам
+    TeleBot, не дожидаясь окончания предыдущих. Обработчики синхронные (база, сайт магазина) и выполняются
+    в потоках UpdateDispatcher, поэтому пользователь, который ждет докачки товаров, не задерживает остальных.
+    Обновления одного чата обрабатываются строго по очереди - состояния пользователя (UserStates) меняются
+    в порядке нажатий. Если очереди обработчиков заполнены, получение обновлений ждет.
+    Таймаут long polling можно переопределить в Config (bot_poll_timeout)
+    """
+    POLL_TIMEOUT = getattr(Config, "bot_poll_timeout", 25)  # (сек) long polling: сколько сервер держит getUpdates
+    POLL_RETRY_DELAY = 3  # (сек) пауза после ошибки getUpdates
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, bot: telebot.TeleBot, workers: int = None, queue_size: int = None):
+        """
+        :param bot: бот с зарегистрированными обработчиками. Должен быть создан с threaded=False -
+        обработчик выполняется в потоке, который выдал рантайм
+        :param workers: потоков-обработчиков (по умолчанию UpdateDispatcher.WORKERS)
+        :param queue_size: очередь одного потока (по умолчанию UpdateDispatcher.QUEUE_SIZE)
+        """
+        self.bot = bot
+        self.workers = workers
+        self.queue_size = queue_size
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.dispatcher: Optional[UpdateDispatcher] = None
+        self._stopped = None
+        self._started = threading.Event()
+
+    def run(self, receiver=None) -> None:
+        """
+        Запускает event loop в текущем потоке и получает обновления до вызова stop()
+        :param receiver: корутина получения обновлений (по умолчанию poll() - long polling)
+        :return: None
+        """
+        asyncio.run(self.serve(receiver or self.poll()))
+
+    async def serve(self, receiver) -> None:
+        """
+        Работает, пока не вызван stop() или не упала корутина получения обновлений (poll() или прием webhook'ов),
+        затем дожидается начатых обработчиков
+        :param receiver: корутина, которая получает обновления и передает их в feed() или offer()
+        :return: None
+        """
+        self.loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        self.dispatcher = UpdateDispatcher(self._handle, self.workers, self.queue_size)
+        receiving = asyncio.ensure_future(receiver)
+        stopping = asyncio.ensure_future(self._stopped.wait())
+        self._started.set()
+        try:
+            await asyncio.wait({receiving, stopping}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            self._started.clear()
+            receiving.cancel()
+            stopping.cancel()
+            await asyncio.gather(receiving, stopping, return_exceptions=True)
+            await asyncio.to_thread(self.dispatcher.stop)
+        if not receiving.cancelled() and receiving.exception() is not None:
+            raise receiving.exception()
+
+    async def poll(self) -> None:
+        """
+        Long polling getUpdates (в отдельном потоке, чтобы не блокировать event loop)
+        :return: None
+        """
+        offset = None
+        while True:
+            try:
+                updates = await asyncio.to_thread(self.bot.get_updates, offset=offset, timeout=self.POLL_TIMEOUT,
+                                                  long_polling_timeout=self.POLL_TIMEOUT)
+            except Exception as error:
+                self.logger.error(f"getUpdates failed: {error!r}")
+                await asyncio.sleep(self.POLL_RETRY_DELAY)
+                continue
+            for update in updates:
+                offset = update.update_id + 1
+                await self.feed(update)
+
+    async def feed(self, update: types.Update) -> asyncio.Future:
+        """
+        Ставит обновление в обработку (вызывается из event loop). Если очередь обработчика заполнена -
+        ждет места, не блокируя event loop
+        :param update: обновление Telegram
+        :return: Future окончания обработки
+        """
+        try:
+            future = self.dispatcher.submit(update, timeout=0)
+        except queue.Full:
+            future = await asyncio.to_thread(self.dispatcher.submit, update)
+        return asyncio.wrap_future(future)
+
+    def offer(self, update: types.Update) -> bool:
+        """
+        Ставит обновление в обработку без ожидания (прием webhook'ов: пусть Telegram повторит позже)
+        :param update: обновление Telegram
+        :return: False - очередь обработчика заполнена, обновление не принято
+        """
+        try:
+            self.dispatcher.submit(update, timeout=0)
+        except queue.Full:
+            return False
+        return True
+
+    def stop(self) -> None:
+        """
+        Останавливает получение обновлений. run() вернется, когда начатые обработчики закончат работу.
+        Можно вызывать из любого потока
+        :return: None
+        """
+        if self._started.is_set():
+            self.loop.call_soon_threadsafe(self._stopped.set)
+
+    def _handle(self, update: types.Update) -> None:
+        self.bot.process_new_updates([update])
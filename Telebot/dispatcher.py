@@ -0,0 +1,167 @@
+import logging
+import queue
+import threading
+import time
+
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+
+from telebot import types
+from config import Config
+from Data_models.user_sessions import UserSessions
+from scripts.metrics import Metrics
+
+CHAT_MESSAGE_FIELDS = ("message", "edited_message", "channel_post", "edited_channel_post")
+USER_FIELDS = ("inline_query", "chosen_inline_result", "shipping_query", "pre_checkout_query", "my_chat_member",
+               "chat_member", "chat_join_request")
+
+
+def update_chat_id(update: types.Update) -> Optional[int]:
+    """
+    Чат, к которому относится обновление (обновления одного чата обрабатываются по порядку)
+    :param update: обновление Telegram
+    :return: ID чата или None, если обновление не относится к чату
+    """
+    for field in CHAT_MESSAGE_FIELDS:
+        message = getattr(update, field, None)
+        if message is not None:
+            return message.chat.id
+    call = getattr(update, "callback_query", None)
+    if call is not None:
+        return call.message.chat.id if call.message is not None else call.from_user.id
+    return update_user_id(update)
+
+
+def update_user_id(update: types.Update) -> Optional[int]:
+    """
+    Пользователь, от которого пришло обновление
+    :param update: обновление Telegram
+    :return: telegram ID пользователя или None
+    """
+    for field in CHAT_MESSAGE_FIELDS + ("callback_query",) + USER_FIELDS:
+        item = getattr(update, field, None)
+        if item is not None:
+            user = getattr(item, "from_user", None)
+            return user.id if user is not None else None
+    return None
+
+
+class UpdateDispatcher:
+    """
+    Пул обработчиков обновлений Telegram. Обновления распределяются по WORKERS потокам по ID чата,
+    у каждого потока своя очередь из QUEUE_SIZE обновлений: обновления одного чата попадают в один поток
+    и обрабатываются строго по порядку, обновления разных чатов - параллельно. Обработка обновления
+    выполняется под блокировкой пользователя (UserSessions.user_lock): загрузка, изменение и сохранение User
+    одного пользователя не пересекаются, даже если он пишет из разных чатов.
+    Значения можно переопределить в Config (bot_workers, bot_queue_size).
+    Метрики - в Metrics: bot_updates_total, bot_update_errors_total, bot_updates_rejected_total,
+    bot_dispatch_queue_depth{worker}, bot_dispatch_wait_seconds_sum/_count (время в очереди),
+    bot_dispatch_wait_seconds_max, bot_updates_in_progress
+    """
+    WORKERS = getattr(Config, "bot_workers", 16)  # потоков-обработчиков
+    QUEUE_SIZE = getattr(Config, "bot_queue_size", 100)  # обновлений в очереди одного потока
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, handle: Callable[[types.Update], None], workers: int = None, queue_size: int = None):
+        """
+        Запускает потоки-обработчики
+        :param handle: обработчик одного обновления (например, TeleBot.process_new_updates для одного обновления)
+        :param workers: количество потоков (по умолчанию WORKERS)
+        :param queue_size: размер очереди потока (по умолчанию QUEUE_SIZE)
+        """
+        self.handle = handle
+        self._queues: List[queue.Queue] = [queue.Queue(maxsize=queue_size or self.QUEUE_SIZE)
+                                           for _ in range(workers or self.WORKERS)]
+        self._lock = threading.Lock()
+        self._in_progress = 0
+        self._wait_max = 0.0
+        self._threads = [threading.Thread(target=self._work, args=(number,), name=f"BotWorker-{number}", daemon=True)
+                         for number in range(len(self._queues))]
+        for thread in self._threads:
+            thread.start()
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Сколько обновлений ждут обработки во всех очередях
+        """
+        return sum(shard.qsize() for shard in self._queues)
+
+    def submit(self, update: types.Update, timeout: Optional[float] = None) -> Future:
+        """
+        Ставит обновление в очередь потока его чата
+        :param update: обновление Telegram
+        :param timeout: (сек) сколько ждать места в заполненной очереди. None - ждать, сколько нужно, 0 - не ждать
+        :return: Future обработки (результат None, ошибка обработчика - исключение Future)
+        :raise queue.Full: очередь потока заполнена (обработчики не успевают)
+        """
+        chat_id = update_chat_id(update)
+        number = (chat_id if chat_id is not None else update.update_id) % len(self._queues)
+        future = Future()
+        block = timeout is None or timeout > 0
+        try:
+            self._queues[number].put((update, future, time.monotonic()), block, timeout if block else None)
+        except queue.Full:
+            Metrics.inc("bot_updates_rejected_total")
+            raise
+        Metrics.inc("bot_updates_total")
+        Metrics.set("bot_dispatch_queue_depth", self._queues[number].qsize(), worker=number)
+        return future
+
+    def stop(self) -> None:
+        """
+        Обрабатывает уже принятые обновления и останавливает потоки
+        :return: None
+        """
+        for shard in self._queues:
+            shard.put(None)
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join()
+
+    def _work(self, number: int) -> None:
+        """
+        Цикл потока-обработчика
+        :param number: номер потока (и его очереди)
+        :return: None
+        """
+        shard = self._queues[number]
+        while True:
+            item = shard.get()
+            if item is None:
+                return
+            update, future, queued = item
+            Metrics.set("bot_dispatch_queue_depth", shard.qsize(), worker=number)
+            if not future.set_running_or_notify_cancel():
+                continue
+            self._record_wait(time.monotonic() - queued)
+            self._set_in_progress(1)
+            try:
+                user_id = update_user_id(update)
+                if user_id is None:
+                    self.handle(update)
+                else:
+                    with UserSessions.user_lock(user_id):
+                        self.handle(update)
+            except Exception as error:
+                Metrics.inc("bot_update_errors_total")
+                self.logger.exception(f"Update {update.update_id} failed: {error!r}")
+                future.set_exception(error)
+            else:
+                future.set_result(None)
+            finally:
+                self._set_in_progress(-1)
+
+    def _record_wait(self, wait: float) -> None:
+        Metrics.inc("bot_dispatch_wait_seconds_sum", wait)
+        Metrics.inc("bot_dispatch_wait_seconds_count")
+        with self._lock:
+            if wait > self._wait_max:
+                self._wait_max = wait
+                Metrics.set("bot_dispatch_wait_seconds_max", wait)
+
+    def _set_in_progress(self, change: int) -> None:
+        with self._lock:
+            self._in_progress += change
+            Metrics.set("bot_updates_in_progress", self._in_progress)
@@ -1,17 +1,31 @@
 import logging
+import secrets
 
 import telebot
 import random
 
 from Data_models.user_db import UserStates, User
+from Data_models.user_sessions import UserSessions
 from Data_models.categories_db import Category, CategoriesPool, Option
 from Data_models.goods_db import GoodKeeper, Good, InvalidGood
+from Data_models.good_images_db import GoodImages
 from Data_models.history_of_choices_db import HistoryOfChoices, Choice
+from Data_models.history_writer import HistoryWriter
+from Data_models.db_connection import DBConnection
+from Crawler.async_crawler import AsyncCrawler
+from Crawler.parse_pool import ParsePool
+from scripts.inventory_prefetcher import InventoryPrefetcher
+from scripts.metrics import Metrics
+from Telebot.bot_runtime import BotRuntime
+from Telebot.webhook import WebhookServer
 from telebot import types
+from telebot.formatting import escape_markdown
 from typing import List
 from config import Config
 
 COMMAND_SPLIT_SYMBOL = " "
+CAPTION_LIMIT = 1024  # символов в подписи к фото (ограничение Telegram)
+FILE_ID_ERRORS = ("wrong file identifier", "file reference")  # ответы 400 на file_id, который больше не принимается
 
 
 def get_keyboard_by_categories_list(categories: List[Category], command: str, is_back_key=1) -> types.InlineKeyboardMarkup:
@@ -69,12 +83,36 @@ def get_keyboard_for_good_prices(good: Good, selected_index=-1):
     return keyboard
 
 
+def get_good_caption(good: Good, limit=CAPTION_LIMIT) -> str:
+    """
+    Подпись к фото товара
+    :param good: товар
+    :param limit: максимальная длина подписи
+    :return: текст подписи (без разметки)
+    """
+    return f"""Производитель: {good.brand}
+Описание: {good.description}"""[:limit]
+
+
+def add_idle_keys(keyboard: types.InlineKeyboardMarkup) -> types.InlineKeyboardMarkup:
+    """
+    Добавляет в клавиатуру кнопки "Выбор категории" и "Дальше" (что делать после ответа)
+    :param keyboard: клавиатура
+    :return: та же клавиатура
+    """
+    refresh_key = types.InlineKeyboardButton(text="Выбор категории", callback_data="refresh")
+    next_key = types.InlineKeyboardButton(text="Дальше", callback_data="next")
+    keyboard.add(refresh_key, next_key)
+    return keyboard
+
+
 class TelegramBot:
     """
     общий класс для работы с телеграмм ботом
     """
     def __init__(self):
-        self.bot = telebot.TeleBot(Config.tg_token)
+        self.bot = telebot.TeleBot(Config.tg_token, threaded=False)  # обработчики запускает BotRuntime
+        self.runtime = BotRuntime(self.bot)
         self.logger = logging.getLogger(__name__)
 
         @self.bot.message_handler(commands=['category'])
@@ -87,20 +125,17 @@ class TelegramBot:
             :return: None
             """
             if not this_user:
-                this_user = User(telegram_id=message.from_user.id, telegram_login=message.from_user.username, name=message.from_user.first_name, last_name=message.from_user.last_name)
+                this_user = UserSessions.get_user(telegram_id=message.from_user.id, telegram_login=message.from_user.username, name=message.from_user.first_name, last_name=message.from_user.last_name)
             keyboard = get_keyboard_by_categories_list(CategoriesPool.get_main_categories(), "cat", 0)  # через бд
             if replace:
-                self.bot.edit_message_reply_markup(
-                    chat_id=message.chat.id,
-                    message_id=message.message_id,
-                    reply_markup=keyboard
-                )
+                self.bot.edit_message_text("Выбери категорию", message.chat.id, message.message_id,
+                                           reply_markup=keyboard)  # текст и клавиатура - одним запросом
                 this_user.set_last_message_id_with_buttons(message.id)
             else:
                 new_message = self.bot.send_message(message.from_user.id, "Выбери категорию", reply_markup=keyboard)
                 this_user.set_last_message_id_with_buttons(new_message.message_id)
             this_user.set_state(UserStates.CHOOSE_CAT)
-            this_user.update_user_in_db()
+            UserSessions.save(this_user)
 
         @self.bot.message_handler(commands=['start'])
         def get_started(message: types.Message) -> None:
@@ -110,7 +145,7 @@ class TelegramBot:
             :return: None
             """
             print(message)
-            this_user = User(telegram_id=message.from_user.id, telegram_login=message.from_user.username, name=message.from_user.first_name, last_name=message.from_user.last_name)
+            this_user = UserSessions.get_user(telegram_id=message.from_user.id, telegram_login=message.from_user.username, name=message.from_user.first_name, last_name=message.from_user.last_name)
             if not this_user.last_message_id_with_buttons:
                 self.bot.send_message(message.from_user.id, "Привет, угадаешь ценник вещи?")
             if this_user.state == UserStates.CHOOSE_CAT:
@@ -132,13 +167,7 @@ class TelegramBot:
             :param user_id: какому пользователю
             :return: None
             """
-            keyboard = types.InlineKeyboardMarkup()
-            refresh_key = types.InlineKeyboardButton(text="Выбор категории",
-                                                     callback_data="refresh")
-            next_key = types.InlineKeyboardButton(text="Дальше",
-                                                  callback_data="next")
-            keyboard.add(refresh_key, next_key)
-            new_message = self.bot.send_message(user_id, "Куда дальше?", reply_markup=keyboard)
+            self.bot.send_message(user_id, "Куда дальше?", reply_markup=add_idle_keys(types.InlineKeyboardMarkup()))
 
         @self.bot.callback_query_handler(func=lambda call: True)
         def key_press_manager(call: types.CallbackQuery) -> None:
@@ -153,7 +182,7 @@ class TelegramBot:
                                                text="Ты уже знаешь правильную цену этого товара) Можешь либо нажать далее, либо выбрать другую категорию!",
                                                show_alert=True)
                 return None
-            this_user = User(telegram_id=call.from_user.id)
+            this_user = UserSessions.get_user(telegram_id=call.from_user.id)
             log_string = f"Data = {call.data}, user_state: {this_user.state} user_id {call.from_user.id}, name:{call.from_user.first_name}, {call.from_user.last_name}, login: {call.from_user.username}"
             self.logger.info("Button_command accepted from Tg " + log_string)
             print(log_string)
@@ -164,12 +193,13 @@ class TelegramBot:
             elif this_user.state == UserStates.CHOOSE_SUBCAT:
                 sub_category_chosen(call, this_user=this_user)
             elif this_user.state == UserStates.WAIT_PRICE_CHOICE:
-                price_selected(call, this_user=this_user)
+                if price_selected(call, this_user=this_user):
+                    return None  # ответ на нажатие уже отправлен (с текстом ошибки)
             elif this_user.state == UserStates.IDLE:
                 idle(call, this_user=this_user)
             else:
                 self.logger.error(f"НЕ обработанное состояние у пользователя id: {this_user.user_id}, state: {this_user.state}")
-            self.bot.answer_callback_query(call.id)
+            self.bot.answer_callback_query(call.id)  # единственный ответ на нажатие
 
         def category_chosen(call: types.CallbackQuery, this_user=None) -> None:
             """
@@ -181,10 +211,10 @@ class TelegramBot:
             command = call.data.split(COMMAND_SPLIT_SYMBOL)
             if command[0] == "cat":
                 if not this_user:
-                    this_user = User(telegram_id=call.from_user.id)
+                    this_user = UserSessions.get_user(telegram_id=call.from_user.id)
                 this_user.set_category(int(command[1]))
                 this_user.set_last_message_id_with_buttons(call.message.message_id)
-                this_user.update_user_in_db()
+                UserSessions.save(this_user)
                 send_options(call.message, this_user)
 
         def send_options(message: types.Message, this_user: User) -> None:
@@ -197,23 +227,20 @@ class TelegramBot:
             options = CategoriesPool.get_options_list(this_user.category_id)
             if not options:
                 send_sub_categories(message, this_user)
+                return
             keyboard = get_keyboard_by_categories_list(options, "option")
-            self.bot.edit_message_text("Какие товары показать?", message.chat.id, message.id)
-            self.bot.edit_message_reply_markup(
-                chat_id=message.chat.id,
-                message_id=message.message_id,
-                reply_markup=keyboard
-            )
+            self.bot.edit_message_text("Какие товары показать?", message.chat.id, message.id,
+                                       reply_markup=keyboard)  # текст и клавиатура - одним запросом
 
         def idle(call: types.CallbackQuery, this_user=None) -> None:
             """
             Вызывается после выбора пользователем конечной цены. Предлагает либо продолжить в данной категории, либо выбрать новую.
+            Кнопки - под товаром с ответом, сам товар остается в чате
             :param call: значение вызова
             :param this_user: объект User текущего пользователя телеграмм
             :return: None
             """
             if call.data == "refresh":
-                self.bot.delete_message(chat_id=call.message.chat.id, message_id=call.message.message_id)
                 choose_category(call, this_user)
             elif call.data == "next":
                 sub_category_chosen(call, this_user)
@@ -228,13 +255,13 @@ class TelegramBot:
             command = call.data.split(COMMAND_SPLIT_SYMBOL)
             if command[0] == "option":
                 if not this_user:
-                    this_user = User(telegram_id=call.from_user.id)
+                    this_user = UserSessions.get_user(telegram_id=call.from_user.id)
                 if command[1] == "back":
                     choose_category(call.message, this_user, 1)
                     return None
                 this_user.set_option(int(command[1]))
                 this_user.set_last_message_id_with_buttons(call.message.message_id)
-                this_user.update_user_in_db()
+                UserSessions.save(this_user)
                 send_sub_categories(call.message, this_user)
 
         def send_sub_categories(message, this_user: User) -> None:
@@ -261,25 +288,22 @@ class TelegramBot:
             """
             command = call.data.split(COMMAND_SPLIT_SYMBOL)
             if not this_user:
-                this_user = User(telegram_id=call.from_user.id)
+                this_user = UserSessions.get_user(telegram_id=call.from_user.id)
             if command[0] == "subcat":
                 if command[1] == "back":
                     this_user.set_state(UserStates.CHOOSE_OPTION)
-                    this_user.update_user_in_db()
+                    UserSessions.save(this_user)
                     send_options(call.message, this_user)
                     return None
                 this_user.sub_category_id = int(command[1])
+                self.bot.delete_message(chat_id=call.message.chat.id, message_id=call.message.message_id)
             elif call.data == "next":
-                next = 1
+                pass  # "Дальше" под товаром с ответом: товар остается в чате
             else:  # если был рандомный вызов - заглушка:
                 self.bot.edit_message_reply_markup(chat_id=call.message.chat.id, message_id=call.message.message_id)
                 self.bot.send_message(call.message.chat.id, "Спасибо за выбор категории, дальше будет больше!")
-                self.bot.answer_callback_query(call.id)
                 return None
-            self.bot.delete_message(chat_id=call.message.chat.id,message_id=call.message.message_id)
-            #self.bot.edit_message_reply_markup(chat_id=call.message.chat.id, message_id=call.message.message_id)
             send_next_good(call.message, this_user)
-            self.bot.answer_callback_query(call.id)
 
         @self.bot.message_handler(commands=['next'])
         def send_next_good(message, this_user=None) -> None:
@@ -291,40 +315,73 @@ class TelegramBot:
             """
             good = None
             if not this_user:
-                this_user = User(telegram_id=message.from_user.id)
+                this_user = UserSessions.get_user(telegram_id=message.from_user.id)
             if this_user.category_id == -1:
                 choose_category(message, this_user)
                 return
             elif this_user.sub_category_id == -1:
                 option_chosen(message, this_user)
                 return
-            current_offset = this_user.get_offset_of_actual_sub_category()
+            last_good_id = this_user.get_last_good_id_of_actual_sub_category()
             try:
-                good = GoodKeeper.get_next_good_by_sub_category_id(this_user.sub_category_id, current_offset, option=this_user.option)
+                good = GoodKeeper.get_next_good_by_sub_category_id(this_user.sub_category_id, last_good_id, option=this_user.option)
             except ValueError as error:
                 self.logger.error(error)
                 self.bot.send_message(message.chat.id, "Пока товаров в этой категории больше нет.")
                 choose_category(message, this_user)
+                return
+            keyboard = get_keyboard_for_good_prices(good)
+            new_message = send_good_photo(message.chat.id, good, keyboard)
+            # курсор только растет - двигаем его, когда товар действительно отправлен, иначе товар пропадет для пользователя
+            this_user.set_last_good_id_of_actual_sub_category(good.good_id)
             this_user.current_good = good
             this_user.current_good_id = good.good_id
             this_user.set_subcategory(this_user.sub_category_id)
-            this_user.update_user_in_db()
-            self.bot.send_photo(message.chat.id, good.image_links[0])
-            keyboard = get_keyboard_for_good_prices(good)
-            new_message = self.bot.send_message(message.chat.id, f"""Производитель: {good.brand}
-Описание: {good.description}""", reply_markup=keyboard)
             this_user.set_last_message_id_with_buttons(new_message.message_id)
-            this_user.update_user_in_db()
+            UserSessions.save(this_user)
+
+        def send_good_photo(chat_id: int, good: Good, keyboard: types.InlineKeyboardMarkup) -> types.Message:
+            """
+            Отправляет фото товара с описанием и ценами одним сообщением. Если фото уже отправлялось - по file_id
+            (GoodImages), без скачивания с CDN магазина, иначе ссылкой, и file_id из ответа запоминается.
+            Ссылкой фото отправляется повторно, только если Telegram не принял сам file_id (FILE_ID_ERRORS),
+            остальные ошибки (429, бот заблокирован, сеть) пробрасываются
+            :param chat_id: чат
+            :param good: товар
+            :param keyboard: клавиатура с ценами
+            :return: отправленное сообщение
+            """
+            image_link = good.image_links[0]
+            file_id = GoodImages.get_file_id(good.good_id, image_link)
+            if file_id:
+                try:
+                    new_message = self.bot.send_photo(chat_id, file_id, caption=get_good_caption(good),
+                                                      reply_markup=keyboard)
+                except telebot.apihelper.ApiTelegramException as error:
+                    description = (error.description or "").lower()
+                    if error.error_code != 400 or not any(text in description for text in FILE_ID_ERRORS):
+                        raise
+                    self.logger.warning(f"file_id of good {good.good_id} is not accepted: {error}")
+                    GoodImages.forget([good.good_id])
+                else:
+                    Metrics.inc("bot_photo_sends_total", source="file_id")
+                    return new_message
+            new_message = self.bot.send_photo(chat_id, image_link, caption=get_good_caption(good), reply_markup=keyboard)
+            Metrics.inc("bot_photo_sends_total", source="url")
+            if new_message.photo:
+                GoodImages.set_file_id(good.good_id, image_link, new_message.photo[-1].file_id)  # самый большой размер
+            return new_message
 
         def price_selected(call: types.CallbackQuery, this_user=None):
             """
-            Вызывается при выборе пользователем цены товара.
+            Вызывается при выборе пользователем цены товара. Ответ (правильная цена, оценки пользователей, ссылка
+            и кнопки "Выбор категории"/"Дальше") записывается в то же сообщение с товаром одним запросом
             :param call: значение вызова
             :param this_user: объект User текущего пользователя телеграмм
-            :return: None
+            :return: True, если на нажатие уже ответили (ошибка товара)
             """
             if not this_user:
-                this_user = User(telegram_id=call.from_user.id)
+                this_user = UserSessions.get_user(telegram_id=call.from_user.id)
             command = call.data.split(COMMAND_SPLIT_SYMBOL)
             if command[0] == "price":
                 index = int(command[1])
@@ -333,15 +390,12 @@ class TelegramBot:
                 except ValueError as error:
                     self.logger.error(error)
                     self.bot.answer_callback_query(call.id, text="Произошла ошибка товара. Попробуйте, пожалуйста, выбрать категорию заново", show_alert=True)
-                    return None
+                    return True
                 HistoryOfChoices.add_user_choice(user_id=this_user.user_id, good_id=good.good_id, mark=index, correct_mark=good.correct_mark_index, sub_category_id=good.sub_category_id, option=good.option)
                 # index = int(call.data)
                 win_text = "А ты молодец\! Правильно\!"
                 fail_text = 'Ты был\(а\) близко, попробуй еще\!'
                 final_text = ""
-                call_keyboard = get_keyboard_for_good_prices(good, index)
-                self.bot.edit_message_reply_markup(chat_id=call.message.chat.id, message_id=call.message.id,
-                                                   reply_markup=call_keyboard)
                 if good.correct_mark_index == index:
                     final_text = win_text
                 else:
@@ -354,18 +408,21 @@ class TelegramBot:
                 else:
                     final_text += f"""
 Цена: *{good.standard_price or good.final_price}*"""
-                keyboard = types.InlineKeyboardMarkup()
-                refresh_key = types.InlineKeyboardButton(text="Ссылка на товар",
-                                                         url=good.link)
-                keyboard.add(refresh_key)
-                self.bot.send_message(call.message.chat.id, final_text, parse_mode='MarkdownV2', reply_markup=keyboard)
+                final_text = escape_markdown(get_good_caption(good, CAPTION_LIMIT // 2)) + "\n\n" + final_text
+                keyboard = get_keyboard_for_good_prices(good, index)
+                link_key = types.InlineKeyboardButton(text="Ссылка на товар", url=good.link)
+                keyboard.add(link_key)
+                add_idle_keys(keyboard)
+                if call.message.content_type == "photo":
+                    self.bot.edit_message_caption(final_text, call.message.chat.id, call.message.id,
+                                                  parse_mode='MarkdownV2', reply_markup=keyboard)
+                else:  # товар, отправленный текстом
+                    self.bot.edit_message_text(final_text, call.message.chat.id, call.message.id,
+                                               parse_mode='MarkdownV2', reply_markup=keyboard)
 
                 # user.set_wait_price_choice(0)
                 this_user.set_state(UserStates.IDLE)
-                this_user.update_user_in_db()
-                self.bot.answer_callback_query(call.id)
-
-                send_idle_message(call.from_user.id)
+                UserSessions.save(this_user)
 
         @self.bot.message_handler(content_types=['text'])
         def get_text_message(message) -> None:
@@ -420,17 +477,35 @@ class TelegramBot:
 
     def run(self):
         """
-        Запустить поллинг телеграмма (получать сообщения ботом)
+        Запустить поллинг телеграмма (получать сообщения ботом). Обновления разных чатов обрабатываются
+        параллельно (BotRuntime)
+        :return:
+        """
+        self.bot.remove_webhook()  # пока установлен webhook, getUpdates не работает
+        self.runtime.run()
+
+    def run_webhook(self):
+        """
+        Получать сообщения через webhook: Telegram присылает обновления на Config.webhook_url, их принимает
+        встроенный HTTP сервер (WebhookServer). Секрет - Config.webhook_secret или новый при каждом запуске
         :return:
         """
-        self.bot.polling(none_stop=True, interval=1)
+        secret_token = getattr(Config, "webhook_secret", "") or secrets.token_urlsafe(32)
+        self.bot.set_webhook(url=Config.webhook_url, secret_token=secret_token)
+        self.runtime.run(WebhookServer(self.runtime, secret_token).serve())
 
     def stop(self):
         """
         Остановить работу бота
         :return:
         """
-        self.bot.stop_bot()
+        self.runtime.stop()
+        UserSessions.stop()
+        HistoryWriter.stop()
+        InventoryPrefetcher.stop()
+        AsyncCrawler.close()
+        ParsePool.stop()
+        DBConnection.close_all()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,70 @@
+import asyncio
+import threading
+import time
+
+from unittest import TestCase
+
+import telebot
+
+from telebot import types
+from scripts.metrics import Metrics
+from Telebot.bot_runtime import BotRuntime
+
+
+def make_update(update_id: int, chat_id: int, text: str) -> types.Update:
+    return types.Update.de_json({"update_id": update_id, "message": {
+        "message_id": update_id, "date": 0, "text": text, "chat": {"id": chat_id, "type": "private"},
+        "from": {"id": chat_id, "is_bot": False, "first_name": "user"}}})
+
+
+def run_updates(runtime: BotRuntime, updates: list) -> None:
+    """
+    Отдает обновления рантайму, дожидается обработки и останавливает его
+    """
+    async def receiver():
+        handled = [await runtime.feed(update) for update in updates]
+        await asyncio.gather(*handled, return_exceptions=True)
+        runtime.stop()
+
+    asyncio.run(runtime.serve(receiver()))
+
+
+class TestBotRuntime(TestCase):
+    def setUp(self):
+        Metrics.reset()
+        self.bot = telebot.TeleBot("123456:TEST", threaded=False)
+        self.handled = []
+        self.lock = threading.Lock()
+
+        @self.bot.message_handler(content_types=["text"])
+        def handler(message):
+            delay, _, fail = message.text.partition(" ")
+            time.sleep(float(delay))
+            if fail:
+                raise RuntimeError("handler failed")
+            with self.lock:
+                self.handled.append((message.chat.id, message.message_id))
+
+    def test_chat_updates_in_order(self):
+        delays = [0.05, 0.0, 0.03, 0.0, 0.01]
+        run_updates(BotRuntime(self.bot), [make_update(number, 7, str(delay)) for number, delay in enumerate(delays)])
+        self.assertEqual([(7, number) for number in range(len(delays))], self.handled)
+
+    def test_chats_are_concurrent(self):
+        runtime = BotRuntime(self.bot, workers=8)
+        start = time.monotonic()
+        run_updates(runtime, [make_update(chat_id, chat_id, "0.2") for chat_id in range(8)])
+        self.assertLess(time.monotonic() - start, 0.2 * 8 / 2)
+        self.assertEqual(8, len(self.handled))
+
+    def test_handler_error_does_not_stop_chat(self):
+        run_updates(BotRuntime(self.bot), [make_update(1, 3, "0 fail"), make_update(2, 3, "0")])
+        self.assertEqual([(3, 2)], self.handled)
+        self.assertEqual(1, Metrics.get("bot_update_errors_total"))
+        self.assertEqual(2, Metrics.get("bot_updates_total"))
+
+    def test_full_queue_waits(self):
+        runtime = BotRuntime(self.bot, workers=1, queue_size=1)
+        run_updates(runtime, [make_update(number, 1, "0.01") for number in range(5)])
+        self.assertEqual([(1, number) for number in range(5)], self.handled)
+        self.assertEqual(0, Metrics.get("bot_updates_in_progress"))
@@ -0,0 +1,117 @@
+import queue
+import threading
+import time
+
+from unittest import TestCase
+
+from telebot import types
+from scripts.metrics import Metrics
+from Telebot.dispatcher import UpdateDispatcher, update_chat_id, update_user_id
+
+
+def make_update(update_id: int, chat_id: int, user_id: int = None) -> types.Update:
+    return types.Update.de_json({"update_id": update_id, "message": {
+        "message_id": update_id, "date": 0, "text": "/next", "chat": {"id": chat_id, "type": "private"},
+        "from": {"id": chat_id if user_id is None else user_id, "is_bot": False, "first_name": "user"}}})
+
+
+class TestUpdateDispatcher(TestCase):
+    def setUp(self):
+        Metrics.reset()
+        self.handled = []
+        self.lock = threading.Lock()
+        self.dispatcher = None
+
+    def tearDown(self):
+        if self.dispatcher:
+            self.dispatcher.stop()
+
+    def record(self, update):
+        time.sleep((update.update_id * 7 % 5) / 1000)  # у обновлений разное время обработки
+        with self.lock:
+            self.handled.append((update.message.chat.id, update.update_id))
+
+    def test_chat_order(self):
+        self.dispatcher = UpdateDispatcher(self.record, workers=4, queue_size=100)
+        futures = [self.dispatcher.submit(make_update(number, number % 10)) for number in range(100)]
+        for future in futures:
+            future.result(timeout=5)
+        for chat_id in range(10):
+            self.assertEqual([number for number in range(100) if number % 10 == chat_id],
+                             [update_id for chat, update_id in self.handled if chat == chat_id])
+        self.assertEqual(100, Metrics.get("bot_updates_total"))
+        self.assertEqual(100, Metrics.get("bot_dispatch_wait_seconds_count"))
+        self.assertGreater(Metrics.get("bot_dispatch_wait_seconds_sum"), 0)
+
+    def test_full_queue(self):
+        release = threading.Event()
+        self.dispatcher = UpdateDispatcher(lambda update: release.wait(5), workers=1, queue_size=1)
+        first = self.dispatcher.submit(make_update(1, 1))
+        time.sleep(0.05)  # первое обновление взято в обработку, очередь пуста
+        self.dispatcher.submit(make_update(2, 1), timeout=0)
+        with self.assertRaises(queue.Full):
+            self.dispatcher.submit(make_update(3, 1), timeout=0)
+        self.assertEqual(1, Metrics.get("bot_updates_rejected_total"))
+        self.assertEqual(1, Metrics.get("bot_dispatch_queue_depth", worker=0))
+        self.assertEqual(1, self.dispatcher.queue_depth)
+        release.set()
+        first.result(timeout=5)
+
+    def test_handler_error(self):
+        def handle(update):
+            if update.update_id == 1:
+                raise RuntimeError("handler failed")
+            self.record(update)
+
+        self.dispatcher = UpdateDispatcher(handle, workers=2)
+        failed = self.dispatcher.submit(make_update(1, 5))
+        done = self.dispatcher.submit(make_update(2, 5))
+        with self.assertRaises(RuntimeError):
+            failed.result(timeout=5)
+        done.result(timeout=5)
+        self.assertEqual([(5, 2)], self.handled)
+        self.assertEqual(1, Metrics.get("bot_update_errors_total"))
+
+    def test_user_lock_across_chats(self):
+        active, overlaps = [0], []
+
+        def handle(update):
+            with self.lock:
+                active[0] += 1
+                overlaps.append(active[0])
+            time.sleep(0.02)
+            with self.lock:
+                active[0] -= 1
+
+        self.dispatcher = UpdateDispatcher(handle, workers=4)
+        futures = [self.dispatcher.submit(make_update(number, chat_id=number, user_id=42)) for number in range(8)]
+        for future in futures:
+            future.result(timeout=5)
+        self.assertEqual([1] * 8, overlaps)  # один пользователь из разных чатов (потоков) - не одновременно
+
+    def test_stop_handles_queued(self):
+        self.dispatcher = UpdateDispatcher(self.record, workers=2)
+        for number in range(10):
+            self.dispatcher.submit(make_update(number, number))
+        self.dispatcher.stop()
+        self.dispatcher = None
+        self.assertEqual(10, len(self.handled))
+
+
+class TestUpdateIds(TestCase):
+    def test_callback_query(self):
+        call = types.Update.de_json({"update_id": 1, "callback_query": {
+            "id": "1", "chat_instance": "1", "data": "next", "from": {"id": 5, "is_bot": False, "first_name": "user"},
+            "message": {"message_id": 1, "date": 0, "chat": {"id": 9, "type": "private"}}}})
+        self.assertEqual(9, update_chat_id(call))
+        self.assertEqual(5, update_user_id(call))
+
+    def test_message(self):
+        update = make_update(1, chat_id=4, user_id=6)
+        self.assertEqual(4, update_chat_id(update))
+        self.assertEqual(6, update_user_id(update))
+
+    def test_empty(self):
+        update = types.Update.de_json({"update_id": 1})
+        self.assertIsNone(update_chat_id(update))
+        self.assertIsNone(update_user_id(update))
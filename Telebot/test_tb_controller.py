@@ -0,0 +1,240 @@
+import json
+import threading
+
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from urllib.parse import parse_qsl, urlsplit
+
+from telebot import apihelper, types
+from Data_models.categories_db import CategoriesPool
+from Data_models.db_connection import DBConnection
+from Data_models.db_test_case import DBTestCase
+from Data_models.good_images_db import GoodImages
+from Data_models.history_writer import HistoryWriter
+from Data_models.user_sessions import UserSessions
+from Data_models.user_states_db import UserStates
+from scripts.inventory_prefetcher import InventoryPrefetcher
+from scripts.metrics import Metrics
+from Telebot.tb_controller import TelegramBot
+
+CHAT_ID = 501
+
+
+class FakeBotApi(BaseHTTPRequestHandler):
+    """
+    Bot API: запоминает вызванные методы с параметрами и отвечает как Telegram.
+    Фото, отправленному ссылкой, выдает file_id "file-<ссылка>", file_id из rejected_file_ids не принимает,
+    на фото из throttled_photos отвечает 429
+    """
+    protocol_version = "HTTP/1.1"
+    calls = []
+    rejected_file_ids = set()
+    throttled_photos = set()
+    message_id = 100
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        method = url.path.rsplit("/", 1)[1]
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode()
+        params = dict(parse_qsl(url.query))
+        params.update(parse_qsl(body))
+        FakeBotApi.calls.append((method, params))
+        if params.get("photo") in self.rejected_file_ids:
+            status, data = 400, {"ok": False, "error_code": 400, "description": "Bad Request: wrong file identifier"}
+        elif params.get("photo") in self.throttled_photos:
+            status, data = 429, {"ok": False, "error_code": 429, "description": "Too Many Requests: retry after 1",
+                                 "parameters": {"retry_after": 1}}
+        else:
+            status, data = 200, {"ok": True, "result": self.result(method, params)}
+        data = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST
+
+    @classmethod
+    def result(cls, method, params):
+        if method in ("answerCallbackQuery", "deleteMessage"):
+            return True
+        if method.startswith("send"):
+            cls.message_id += 1
+            message_id = cls.message_id
+        else:
+            message_id = int(params.get("message_id", 0))
+        message = {"message_id": message_id, "date": 1, "chat": {"id": int(params.get("chat_id", CHAT_ID)),
+                                                                 "type": "private"}}
+        if method == "sendPhoto":
+            photo = params["photo"]
+            file_id = photo if not photo.startswith("http") else f"file-{photo}"
+            message["photo"] = [{"file_id": file_id, "file_unique_id": file_id, "width": 1, "height": 1}]
+        elif "caption" in params:
+            message["photo"] = [{"file_id": "photo", "file_unique_id": "photo", "width": 1, "height": 1}]
+        else:
+            message["text"] = params.get("text", "")
+        return message
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeBotApiTestCase(DBTestCase):
+    """
+    Бот с базой во временном файле, Bot API - FakeBotApi
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeBotApi)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.old_api_url = apihelper.API_URL
+        apihelper.API_URL = f"http://127.0.0.1:{cls.server.server_address[1]}/bot{{0}}/{{1}}"
+
+    @classmethod
+    def tearDownClass(cls):
+        apihelper.API_URL = cls.old_api_url
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        super().setUp()
+        self.add_catalog("3000, 8000, 15000")
+        with DBConnection.connect() as connection:
+            cursor = connection.cursor()
+            cursor.executemany("""INSERT INTO goods (description, brand, standard_price, final_price, image_links_str,
+            link, category_id, sub_category_id, option, shop_id, last_update_timestamp, active)
+            VALUES (?, 'Brand (1)', 9000, 7000, ?, ?, 2, 1, 1, 1, 0, 1)""",
+                               [(f"Куртка {number}.", f"https://a.lmcdn.ru/{number}.jpg",
+                                 f"https://www.lamoda.ru/p/good{number}/") for number in range(10)])
+        CategoriesPool.get_catalog()
+        UserSessions.clear()
+        FakeBotApi.rejected_file_ids.clear()
+        FakeBotApi.throttled_photos.clear()
+        Metrics.reset()
+        self.prefetcher = patch.object(InventoryPrefetcher, "notify")
+        self.prefetcher.start()
+        self.tbot = TelegramBot()
+        FakeBotApi.calls.clear()
+
+    def tearDown(self):
+        self.prefetcher.stop()
+        HistoryWriter.stop()
+        UserSessions.clear()
+
+    def send(self, update: dict) -> Counter:
+        """
+        Обрабатывает обновление
+        :return: вызванные методы Bot API и их количество
+        """
+        FakeBotApi.calls.clear()
+        update.setdefault("update_id", 1)
+        self.tbot.bot.process_new_updates([types.Update.de_json(update)])
+        return Counter(method for method, _ in FakeBotApi.calls)
+
+    def command(self, text: str, chat_id=CHAT_ID) -> Counter:
+        return self.send({"message": {"message_id": 1, "date": 1, "text": text,
+                                      "entities": [{"type": "bot_command", "offset": 0, "length": len(text)}],
+                                      "chat": {"id": chat_id, "type": "private"},
+                                      "from": {"id": chat_id, "is_bot": False, "first_name": "user"}}})
+
+    def press(self, data: str, photo=False, chat_id=CHAT_ID) -> Counter:
+        message = {"message_id": FakeBotApi.message_id, "date": 1, "chat": {"id": chat_id, "type": "private"}}
+        if photo:
+            message["photo"] = [{"file_id": "photo", "file_unique_id": "photo", "width": 1, "height": 1}]
+        else:
+            message["text"] = "keyboard"
+        return self.send({"callback_query": {"id": "1", "chat_instance": "1", "data": data, "message": message,
+                                             "from": {"id": chat_id, "is_bot": False, "first_name": "user"}}})
+
+    def choose_sub_category(self, chat_id=CHAT_ID) -> str:
+        """
+        Проходит выбор категории до первого товара
+        :return: фото, отправленное с первым товаром (ссылка или file_id)
+        """
+        self.command("/category", chat_id)
+        self.press("cat 2", chat_id=chat_id)
+        self.press("option 1", chat_id=chat_id)
+        self.press("subcat 1", chat_id=chat_id)
+        return [params["photo"] for method, params in FakeBotApi.calls if method == "sendPhoto"][-1]
+
+
+
+class TestApiCallsPerFlow(FakeBotApiTestCase):
+    """
+    Сколько запросов к Bot API делает бот на каждое действие пользователя
+    """
+    def test_game_flow(self):
+        self.assertEqual({"sendMessage": 1}, self.command("/category"))
+        self.assertEqual({"editMessageText": 1, "answerCallbackQuery": 1}, self.press("cat 2"))
+        self.assertEqual({"editMessageReplyMarkup": 1, "answerCallbackQuery": 1}, self.press("option 1"))
+        self.assertEqual({"deleteMessage": 1, "sendPhoto": 1, "answerCallbackQuery": 1}, self.press("subcat 1"))
+        photo_params = FakeBotApi.calls[1][1]
+        self.assertIn("Brand (1)", photo_params["caption"])
+        self.assertIn("price 0", photo_params["reply_markup"])
+        self.assertEqual(UserStates.WAIT_PRICE_CHOICE, UserSessions.get_user(CHAT_ID).state)
+
+        self.assertEqual({"editMessageCaption": 1, "answerCallbackQuery": 1}, self.press("price 1", photo=True))
+        caption_params = FakeBotApi.calls[0][1]
+        self.assertIn("Brand \\(1\\)", caption_params["caption"])
+        self.assertEqual("MarkdownV2", caption_params["parse_mode"])
+        for data in ("no_command", "refresh", "next", "https://www.lamoda.ru/p/good0/"):
+            self.assertIn(data, caption_params["reply_markup"])
+        self.assertEqual(UserStates.IDLE, UserSessions.get_user(CHAT_ID).state)
+
+        self.assertEqual({"sendPhoto": 1, "answerCallbackQuery": 1}, self.press("next", photo=True))
+        self.assertEqual({"editMessageCaption": 1, "answerCallbackQuery": 1}, self.press("price 0", photo=True))
+        self.assertEqual({"sendMessage": 1, "answerCallbackQuery": 1}, self.press("refresh", photo=True))
+
+    def test_next_command(self):
+        self.command("/category")
+        self.press("cat 2")
+        self.press("option 1")
+        self.press("subcat 1")
+        self.assertEqual({"sendPhoto": 1}, self.command("/next"))
+
+    def test_back_to_categories(self):
+        self.command("/category")
+        self.press("cat 2")
+        self.assertEqual({"editMessageText": 1, "answerCallbackQuery": 1}, self.press("option back"))
+
+    def test_cursor_kept_when_send_fails(self):
+        FakeBotApi.throttled_photos.add("https://a.lmcdn.ru/0.jpg")
+        with self.assertRaises(apihelper.ApiTelegramException):
+            self.choose_sub_category()
+        FakeBotApi.throttled_photos.clear()
+        self.assertEqual({"sendPhoto": 1}, self.command("/next"))
+        self.assertEqual("https://a.lmcdn.ru/0.jpg", FakeBotApi.calls[0][1]["photo"])
+
+
+class TestPhotoFileIds(FakeBotApiTestCase):
+    """
+    Фото товара скачивается Telegram'ом по ссылке один раз, дальше отправляется по file_id
+    """
+    def test_file_id_reused(self):
+        self.assertEqual("https://a.lmcdn.ru/0.jpg", self.choose_sub_category(CHAT_ID))
+        self.assertEqual("file-https://a.lmcdn.ru/0.jpg", GoodImages.get_file_id(1, "https://a.lmcdn.ru/0.jpg"))
+        self.assertEqual("file-https://a.lmcdn.ru/0.jpg", self.choose_sub_category(CHAT_ID + 1))
+        self.assertEqual(1, Metrics.get("bot_photo_sends_total", source="file_id"))
+
+    def test_rejected_file_id(self):
+        GoodImages.set_file_id(1, "https://a.lmcdn.ru/0.jpg", "expired")
+        FakeBotApi.rejected_file_ids.add("expired")
+        self.assertEqual("https://a.lmcdn.ru/0.jpg", self.choose_sub_category(CHAT_ID))
+        self.assertEqual(["expired", "https://a.lmcdn.ru/0.jpg"],
+                         [params["photo"] for method, params in FakeBotApi.calls if method == "sendPhoto"])
+        self.assertEqual("file-https://a.lmcdn.ru/0.jpg", GoodImages.get_file_id(1, "https://a.lmcdn.ru/0.jpg"))
+
+    def test_throttled_file_id_kept(self):
+        GoodImages.set_file_id(1, "https://a.lmcdn.ru/0.jpg", "cached")
+        FakeBotApi.throttled_photos.add("cached")
+        self.command("/category")
+        self.press("cat 2")
+        self.press("option 1")
+        with self.assertRaises(apihelper.ApiTelegramException):
+            self.press("subcat 1")
+        self.assertEqual(["cached"], [params["photo"] for method, params in FakeBotApi.calls if method == "sendPhoto"])
+        self.assertEqual("cached", GoodImages.get_file_id(1, "https://a.lmcdn.ru/0.jpg"))
+        self.assertEqual(0, Metrics.get("bot_photo_sends_total", source="file_id"))
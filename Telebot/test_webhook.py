@@ -0,0 +1,101 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+from unittest import TestCase
+
+import telebot
+
+from scripts.metrics import Metrics
+from Telebot.bot_runtime import BotRuntime
+from Telebot.webhook import SECRET_HEADER, WebhookServer
+
+SECRET = "test_secret-123"
+
+
+def make_update(update_id: int, chat_id: int) -> dict:
+    return {"update_id": update_id, "message": {
+        "message_id": update_id, "date": 0, "text": "/start", "chat": {"id": chat_id, "type": "private"},
+        "from": {"id": chat_id, "is_bot": False, "first_name": "user"}}}
+
+
+class TestWebhook(TestCase):
+    """
+    Фейковый Telegram отправляет обновления POST запросами на запущенный WebhookServer
+    """
+    def setUp(self):
+        Metrics.reset()
+        self.handled = []
+        self.release = threading.Event()
+        self.release.set()
+        self.bot = telebot.TeleBot("123456:TEST", threaded=False)
+
+        @self.bot.message_handler(commands=["start"])
+        def start(message):
+            self.release.wait(5)
+            self.handled.append(message.message_id)
+
+        self.runtime = BotRuntime(self.bot, workers=1, queue_size=1)
+        self.server = WebhookServer(self.runtime, SECRET, host="127.0.0.1", port=0)
+        self.errors = []
+        self.thread = threading.Thread(target=self.run_runtime)
+        self.thread.start()
+        self.assertTrue(self.server.ready.wait(5))
+        self.url = f"http://127.0.0.1:{self.server.port}{self.server.path}"
+
+    def run_runtime(self):
+        try:
+            self.runtime.run(self.server.serve())
+        except Exception as error:
+            self.errors.append(error)
+
+    def tearDown(self):
+        self.release.set()
+        self.runtime.stop()
+        self.thread.join(5)
+        self.assertFalse(self.thread.is_alive())
+        self.assertEqual([], self.errors)
+
+    def post(self, body, secret=SECRET) -> int:
+        data = body if isinstance(body, bytes) else json.dumps(body).encode()
+        request = urllib.request.Request(self.url, data=data, method="POST",
+                                         headers={"Content-Type": "application/json", SECRET_HEADER: secret})
+        try:
+            with urllib.request.urlopen(request, timeout=5) as response:
+                return response.status
+        except urllib.error.HTTPError as error:
+            return error.code
+
+    def test_updates_handled(self):
+        for update_id in range(1, 4):
+            self.assertEqual(200, self.post(make_update(update_id, 5)))
+        self.runtime.stop()
+        self.thread.join(5)
+        self.assertEqual([1, 2, 3], self.handled)
+        self.assertEqual(3, Metrics.get("bot_webhook_requests_total", status=200))
+
+    def test_wrong_secret(self):
+        self.assertEqual(403, self.post(make_update(1, 5), secret="other"))
+        self.assertEqual(403, self.post(make_update(1, 5), secret=""))
+        self.assertEqual(0, Metrics.get("bot_updates_total"))
+
+    def test_bad_update(self):
+        self.assertEqual(400, self.post(b"not json"))
+        self.assertEqual(400, self.post([1, 2]))
+        self.assertEqual(400, self.post({"message": {}}))
+
+    def test_full_queue(self):
+        self.release.clear()  # обработчик занят первым обновлением
+        self.assertEqual(200, self.post(make_update(1, 5)))
+        for _ in range(50):  # ждем, пока первое обновление уйдет из очереди в обработку
+            if not self.runtime.dispatcher.queue_depth:
+                break
+            self.release.wait(0.01)
+        self.assertEqual(200, self.post(make_update(2, 5)))
+        self.assertEqual(429, self.post(make_update(3, 5)))
+        self.release.set()
+        self.runtime.stop()
+        self.thread.join(5)
+        self.assertEqual([1, 2], self.handled)
+        self.assertEqual(1, Metrics.get("bot_updates_rejected_total"))
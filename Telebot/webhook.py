@@ -0,0 +1,97 @@
+import asyncio
+import hmac
+import json
+import logging
+import threading
+
+from typing import Optional
+
+from aiohttp import web
+from telebot import types
+from config import Config
+from scripts.metrics import Metrics
+from Telebot.bot_runtime import BotRuntime
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """
+    Прием обновлений Telegram через webhook: встроенный HTTP сервер (aiohttp) в event loop BotRuntime.
+    Telegram присылает каждое обновление POST запросом на PATH с секретом в заголовке SECRET_HEADER
+    (тот же secret_token, что передан в set_webhook). Обновление передается в те же обработчики, что и при
+    polling (BotRuntime.offer), и сервер сразу отвечает 200, не дожидаясь обработки. Если очередь обработчика
+    заполнена - ответ 429 с Retry-After: Telegram повторит доставку позже (обратное давление вместо роста очереди).
+    Значения можно переопределить в Config (webhook_host, webhook_port, webhook_path).
+    Счетчик - в Metrics: bot_webhook_requests_total{status}
+    """
+    HOST = getattr(Config, "webhook_host", "0.0.0.0")
+    PORT = getattr(Config, "webhook_port", 8443)
+    PATH = getattr(Config, "webhook_path", "/telegram")
+    RETRY_AFTER = 1  # (сек) через сколько Telegram стоит повторить, если очередь заполнена
+    MAX_BODY = 1024 * 1024  # байт в одном обновлении
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, runtime: BotRuntime, secret_token: str, host: str = None, port: int = None, path: str = None):
+        """
+        :param runtime: рантайм бота, в котором запускается сервер (runtime.run(server.serve()))
+        :param secret_token: секрет, который Telegram присылает в заголовке SECRET_HEADER
+        :param host: адрес (по умолчанию HOST)
+        :param port: порт (по умолчанию PORT, 0 - любой свободный)
+        :param path: путь приема обновлений (по умолчанию PATH)
+        """
+        self.runtime = runtime
+        self.secret_token = secret_token
+        self.host = host or self.HOST
+        self.port = self.PORT if port is None else port
+        self.path = path or self.PATH
+        self.ready = threading.Event()  # сервер принимает запросы, self.port - настоящий порт
+
+    async def serve(self) -> None:
+        """
+        Принимает обновления, пока корутину не отменят (остановка BotRuntime)
+        :return: None
+        """
+        app = web.Application(client_max_size=self.MAX_BODY)
+        app.router.add_post(self.path, self._receive)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, self.host, self.port).start()
+            self.port = runner.addresses[0][1]
+            self.ready.set()
+            self.logger.info(f"Webhook is listening on {self.host}:{self.port}{self.path}")
+            await asyncio.Event().wait()
+        finally:
+            self.ready.clear()
+            await runner.cleanup()
+
+    async def _receive(self, request: web.Request) -> web.Response:
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, "").encode(), self.secret_token.encode()):
+            return self._response(403)
+        update = self._parse(await request.read())
+        if update is None:
+            return self._response(400)
+        if not self.runtime.offer(update):
+            return self._response(429, {"Retry-After": str(self.RETRY_AFTER)})
+        return self._response(200)
+
+    def _parse(self, body: bytes) -> Optional[types.Update]:
+        """
+        :param body: тело запроса
+        :return: обновление или None, если это не обновление Telegram
+        """
+        try:
+            data = json.loads(body)
+            if not isinstance(data, dict) or not isinstance(data.get("update_id"), int):
+                return None
+            return types.Update.de_json(data)
+        except (ValueError, TypeError, KeyError, AttributeError) as error:
+            self.logger.warning(f"Bad webhook update: {error!r}")
+            return None
+
+    @staticmethod
+    def _response(status: int, headers: dict = None) -> web.Response:
+        Metrics.inc("bot_webhook_requests_total", status=status)
+        return web.Response(status=status, headers=headers)
@@ -1,4 +1,14 @@
+import signal
+import sys
+
+from config import Config
+from Data_models.migrations import Migrations
 from Telebot.tb_controller import TelegramBot
 
+signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))  # выход через atexit - кэш пользователей запишется
+Migrations.migrate()
 tbot = TelegramBot()
-tbot.run()
\ No newline at end of file
+if getattr(Config, "webhook_url", ""):  # адрес, на который Telegram будет присылать обновления
+    tbot.run_webhook()
+else:
+    tbot.run()
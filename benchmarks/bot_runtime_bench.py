@@ -0,0 +1,79 @@
+"""
+Нагрузочный тест BotRuntime: много чатов, у каждого несколько обновлений подряд, обработчик блокируется
+на handler_ms (как запрос к базе или ожидание докачки товаров). Для каждого количества потоков-обработчиков -
+обновлений в секунду и p50/p99 времени от получения обновления до окончания обработки.
+1 поток - последовательная обработка, как было при polling без потоков.
+Запуск: python -m benchmarks.bot_runtime_bench [чатов] [обновлений на чат] [handler_ms]
+"""
+import asyncio
+import sys
+import time
+
+import telebot
+
+from telebot import types
+from Telebot.bot_runtime import BotRuntime
+
+WORKERS_LEVELS = (1, 4, 16, 64)
+
+
+def make_updates(chats: int, per_chat: int) -> list:
+    updates = []
+    for number in range(per_chat):
+        for chat_id in range(1, chats + 1):
+            update_id = len(updates) + 1
+            updates.append(types.Update.de_json({"update_id": update_id, "message": {
+                "message_id": update_id, "date": 0, "text": "/next", "chat": {"id": chat_id, "type": "private"},
+                "from": {"id": chat_id, "is_bot": False, "first_name": "user"}}}))
+    return updates
+
+
+def measure(workers: int, updates: list, handler_ms: float) -> dict:
+    """
+    :param workers: потоков-обработчиков (UpdateDispatcher)
+    :param updates: обновления
+    :param handler_ms: (мс) сколько блокируется обработчик
+    :return: обновлений в секунду и задержки обработки
+    """
+    bot = telebot.TeleBot("123456:BENCH", threaded=False)
+
+    @bot.message_handler(content_types=["text"])
+    def handler(message):
+        time.sleep(handler_ms / 1000)
+
+    runtime = BotRuntime(bot, workers=workers, queue_size=len(updates))
+    latencies = []
+
+    async def receiver():
+        async def timed(start, handled):
+            await handled
+            latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*[timed(time.perf_counter(), await runtime.feed(update)) for update in updates])
+        runtime.stop()
+
+    start = time.perf_counter()
+    asyncio.run(runtime.serve(receiver()))
+    total = time.perf_counter() - start
+    latencies.sort()
+    return {"workers": workers, "updates_per_s": round(len(updates) / total, 1),
+            "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+            "p99_ms": round(latencies[min(len(latencies) - 1, len(latencies) * 99 // 100)] * 1000, 1)}
+
+
+def run(chats: int, per_chat: int, handler_ms: float) -> list:
+    """
+    :param chats: количество чатов
+    :param per_chat: обновлений от каждого чата
+    :param handler_ms: (мс) время обработчика
+    :return: результаты для WORKERS_LEVELS
+    """
+    updates = make_updates(chats, per_chat)
+    return [measure(workers, updates, handler_ms) for workers in WORKERS_LEVELS]
+
+
+if __name__ == "__main__":
+    args = [float(arg) for arg in sys.argv[1:4]]
+    for line in run(int(args[0]) if args else 200, int(args[1]) if len(args) > 1 else 3,
+                    args[2] if len(args) > 2 else 20):
+        print(line)
@@ -0,0 +1,101 @@
+"""
+Бенчмарк накладных расходов на базу в одном обновлении Telegram (выбор цены + следующий товар).
+Сравнивает старую схему (sqlite3.connect на каждый запрос, журнал DELETE) с DBConnection (WAL, одно соединение на поток).
+Запуск: python -m benchmarks.db_connection_bench [количество обновлений]
+"""
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+from config import Config
+from Data_models.db_connection import DBConnection
+from Data_models.goods_db import GoodKeeper
+from Data_models.history_of_choices_db import HistoryOfChoices
+from Data_models.history_writer import HistoryWriter
+from Data_models.user_db import User
+from Data_models.user_states_db import UserStates
+from benchmarks.synthetic_db import create_synthetic_db
+
+USERS_COUNT = 500
+
+
+def simulate_update(telegram_id: int) -> None:
+    """
+    Повторяет обращения к базе, которые делают price_selected и send_next_good для одного пользователя
+    :param telegram_id: telegram ID пользователя
+    :return: None
+    """
+    user = User(telegram_id=telegram_id)
+    good = GoodKeeper.get_good_by_id(user.current_good_id)
+    HistoryOfChoices.add_user_choice(user_id=user.user_id, good_id=good.good_id, mark=1,
+                                     correct_mark=good.correct_mark_index, sub_category_id=good.sub_category_id,
+                                     option=good.option)
+    good.marks_statistic
+    user.set_state(UserStates.IDLE)
+    user.update_user_in_db()
+
+    user = User(telegram_id=telegram_id)
+    last_good_id = user.get_last_good_id_of_actual_sub_category()
+    good = GoodKeeper.get_next_good_by_sub_category_id(user.sub_category_id, last_good_id, option=user.option)
+    user.set_last_good_id_of_actual_sub_category(good.good_id)
+    user.current_good_id = good.good_id
+    user.set_subcategory(user.sub_category_id)
+    user.update_user_in_db()
+    user.update_user_in_db()
+
+
+def _legacy_connect(cls) -> sqlite3.Connection:
+    """
+    Старое поведение: новое соединение на каждый запрос
+    """
+    connection = sqlite3.connect(Config.db_pass)
+    connection.row_factory = sqlite3.Row
+    return connection
+
+
+def run(updates_count: int, legacy: bool) -> dict:
+    """
+    Прогоняет updates_count обновлений на свежей синтетической базе
+    :param updates_count: количество обновлений
+    :param legacy: True - старая схема подключений, False - DBConnection
+    :return: словарь с результатами в миллисекундах на обновление
+    """
+    rnd = random.Random(2)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_pass = os.path.join(tmp_dir, "bench.db")
+        create_synthetic_db(db_pass, users_count=USERS_COUNT)
+        old_db_pass, Config.db_pass = Config.db_pass, db_pass
+        original_connect = DBConnection.__dict__["connect"]
+        if legacy:
+            DBConnection.connect = classmethod(_legacy_connect)
+        try:
+            timings = []
+            for _ in range(updates_count):
+                telegram_id = rnd.randint(1, USERS_COUNT)
+                start = time.perf_counter()
+                simulate_update(telegram_id)
+                timings.append((time.perf_counter() - start) * 1000)
+        finally:
+            HistoryWriter.stop()  # очередь ответов пишется в эту же базу
+            DBConnection.connect = original_connect
+            DBConnection.close_all()
+            Config.db_pass = old_db_pass
+    timings.sort()
+    return {"mode": "legacy" if legacy else "pooled",
+            "updates": updates_count,
+            "mean_ms": round(statistics.fmean(timings), 3),
+            "p50_ms": round(timings[len(timings) // 2], 3),
+            "p99_ms": round(timings[int(len(timings) * 0.99) - 1], 3)}
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    before = run(count, legacy=True)
+    after = run(count, legacy=False)
+    for result in (before, after):
+        print(result)
+    print(f"speedup: {before['mean_ms'] / after['mean_ms']:.1f}x")
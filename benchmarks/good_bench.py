@@ -0,0 +1,64 @@
+"""
+Микробенчмарк объекта Good: создание товаров из строк базы, клавиатура цен и правильная оценка для каждого,
+плюс память, которую занимают созданные товары.
+Запуск: python -m benchmarks.good_bench [количество товаров]
+"""
+import random
+import sys
+import time
+import tracemalloc
+
+from Data_models.goods_db import Good
+from Telebot.tb_controller import get_keyboard_for_good_prices
+
+PRICE_VALUES = ("3000, 8000, 15000, 30000", "1000, 2500, 5000, 10000, 20000", "500, 1500, 3000")
+
+
+def make_rows(goods_count: int) -> list:
+    """
+    Строки в том виде, в каком их отдает SELECT goods.*, sub_categories.price_values AS prices_str
+    :param goods_count: количество строк
+    :return: массив словарей
+    """
+    rnd = random.Random(1)
+    return [{"good_id": i, "description": "Куртка", "brand": "Brand", "standard_price": rnd.randint(300, 40000),
+             "final_price": 0, "image_links_str": f"https://a.lmcdn.ru/{i}_1.jpg, https://a.lmcdn.ru/{i}_2.jpg",
+             "link": f"https://www.lamoda.ru/p/{i}/", "category_id": 1, "sub_category_id": i % 3, "shop_id": 1,
+             "last_update_timestamp": 1704898687, "active": 1, "option": 1, "prices_str": PRICE_VALUES[i % 3]}
+            for i in range(1, goods_count + 1)]
+
+
+def run(goods_count: int) -> dict:
+    """
+    :param goods_count: количество товаров
+    :return: словарь с результатами
+    """
+    rows = make_rows(goods_count)
+    tracemalloc.start()
+    goods = [Good(**row) for row in rows]
+    goods_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del goods
+
+    start = time.perf_counter()
+    goods = [Good(**row) for row in rows]
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for good in goods:
+        good.correct_mark_index
+    correct_mark_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for good in goods:
+        get_keyboard_for_good_prices(good)
+    keyboard_time = time.perf_counter() - start
+    return {"goods": goods_count,
+            "build_ms": round(build_time * 1000, 1),
+            "correct_mark_ms": round(correct_mark_time * 1000, 1),
+            "keyboards_ms": round(keyboard_time * 1000, 1),
+            "bytes_per_good": goods_memory // goods_count}
+
+
+if __name__ == "__main__":
+    print(run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000))
@@ -0,0 +1,70 @@
+"""
+Бенчмарк записи товаров со страниц поиска.
+Сравнивает цикл Good.insert_or_update_good (SELECT по ссылке + INSERT/UPDATE на каждый товар)
+с GoodKeeper.upsert_many (одна транзакция на страницу).
+Запуск: python -m benchmarks.goods_upsert_bench [количество страниц] [товаров на странице]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from config import Config
+from Data_models.db_connection import DBConnection
+from Data_models.goods_db import Good, GoodKeeper
+from benchmarks.synthetic_db import create_synthetic_db
+
+
+def make_page(page: int, goods_on_page: int) -> list:
+    """
+    Товары одной страницы поиска. Половина ссылок повторяет предыдущую страницу (обновление уже известных товаров)
+    :param page: номер страницы
+    :param goods_on_page: количество товаров на странице
+    :return: массив Good
+    """
+    first = page * goods_on_page // 2
+    return [Good(description="Куртка", brand="Brand", standard_price=7000, final_price=5000 + page,
+                 image_links_str="https://a.lmcdn.ru/1.jpg", link=f"https://www.lamoda.ru/p/bench{i}/",
+                 category_id=1, sub_category_id=1, shop_id=1, option=1)
+            for i in range(first, first + goods_on_page)]
+
+
+def run(pages: int, goods_on_page: int, bulk: bool) -> dict:
+    """
+    Записывает pages страниц товаров в свежую синтетическую базу
+    :param pages: количество страниц
+    :param goods_on_page: товаров на странице
+    :param bulk: True - upsert_many, False - insert_or_update_good по одному
+    :return: словарь с результатами
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_pass = os.path.join(tmp_dir, "bench.db")
+        create_synthetic_db(db_pass, goods_count=2000, history_count=0)
+        old_db_pass, Config.db_pass = Config.db_pass, db_pass
+        try:
+            page_goods = [make_page(page, goods_on_page) for page in range(pages)]
+            start = time.perf_counter()
+            for goods in page_goods:
+                if bulk:
+                    GoodKeeper.upsert_many(goods)
+                else:
+                    for good in goods:
+                        good.insert_or_update_good()
+            elapsed = time.perf_counter() - start
+        finally:
+            DBConnection.close_all()
+            Config.db_pass = old_db_pass
+    return {"mode": "upsert_many" if bulk else "insert_or_update_good",
+            "goods": pages * goods_on_page,
+            "ms_per_page": round(elapsed * 1000 / pages, 3),
+            "goods_per_sec": round(pages * goods_on_page / elapsed)}
+
+
+if __name__ == "__main__":
+    pages_count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    page_size = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+    before = run(pages_count, page_size, bulk=False)
+    after = run(pages_count, page_size, bulk=True)
+    for result in (before, after):
+        print(result)
+    print(f"speedup: {after['goods_per_sec'] / before['goods_per_sec']:.1f}x")
@@ -0,0 +1,61 @@
+"""
+Бенчмарк разбора сохраненных страниц Lamoda/fixtures: время разбора и пиковая память на страницу
+для каждого парсера (html.parser, lxml - если установлен) с деревом всей страницы и только нужных областей.
+По результатам выбираются Config.html_parser_backend и Config.html_parse_only.
+Запуск: python -m benchmarks.html_parse_bench [повторов на страницу]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+from Lamoda.Parser.html_backend import HtmlBackend
+from Lamoda.Parser.lamoda_good_page_parser import GOOD_STRAINER
+from Lamoda.Parser.lamoda_search_page_parser import CATALOG_STRAINER
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Lamoda", "fixtures")
+PAGES = (("lamoda_search_page_1.html", CATALOG_STRAINER),
+         ("lamoda_search_page_2.html", CATALOG_STRAINER),
+         ("lamoda_good_page.html", GOOD_STRAINER))
+
+
+def measure(page: bytes, strainer, backend: str, parse_only: bool, repeats: int) -> dict:
+    """
+    :param page: содержимое страницы
+    :param strainer: области страницы для parse_only
+    :param backend: имя парсера
+    :param parse_only: строить дерево только из нужных областей
+    :param repeats: сколько раз разобрать страницу
+    :return: среднее время разбора и пиковая память одного разбора
+    """
+    tracemalloc.start()
+    soup = HtmlBackend.make_soup(page, strainer, backend=backend, parse_only=parse_only)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del soup
+    start = time.perf_counter()
+    for _ in range(repeats):
+        HtmlBackend.make_soup(page, strainer, backend=backend, parse_only=parse_only)
+    return {"parse_ms": round((time.perf_counter() - start) / repeats * 1000, 2), "peak_kb": peak // 1024}
+
+
+def run(repeats: int) -> list:
+    """
+    :param repeats: повторов на страницу
+    :return: массив результатов (страница, парсер, parse_only, время, память)
+    """
+    backends = sorted({HtmlBackend.resolve(backend) for backend in HtmlBackend.PARSERS})
+    result = []
+    for name, strainer in PAGES:
+        with open(os.path.join(FIXTURES_DIR, name), "rb") as file:
+            page = file.read()
+        for backend in backends:
+            for parse_only in (False, True):
+                result.append({"page": name, "backend": backend, "parse_only": parse_only,
+                               **measure(page, strainer, backend, parse_only, repeats)})
+    return result
+
+
+if __name__ == "__main__":
+    for line in run(int(sys.argv[1]) if len(sys.argv) > 1 else 50):
+        print(line)
@@ -0,0 +1,154 @@
+"""
+Локальный HTTP сервер, который отдает записанные страницы Lamoda (Lamoda/fixtures) вместо сайта.
+Страницы поиска /catalogsearch/result/?page=N&q=... - по очереди страницы поиска из корпуса, у каждой страницы
+свои ссылки на товары; после search_pages страниц - пустая выдача. Любая страница /p/... - страница товара.
+Можно добавить задержку ответа (latency, jitter) и долю ответов 503 (error_rate).
+Запуск: python -m benchmarks.replay_server [--port 8080] [--latency 0.05] [--jitter 0.02] [--error-rate 0.1]
+"""
+import argparse
+import os
+import random
+import threading
+import time
+import zlib
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Lamoda", "fixtures")
+SEARCH_FIXTURES = ("lamoda_search_page_1.html", "lamoda_search_page_2.html")
+GOOD_FIXTURE = "lamoda_good_page.html"
+EMPTY_SEARCH_PAGE = b'<html><body><div class="grid__catalog"></div></body></html>'
+
+
+def load_corpus() -> dict:
+    """
+    Страницы корпуса
+    :return: {"search": [bytes, ...], "good": bytes}
+    """
+    search = []
+    for name in SEARCH_FIXTURES:
+        with open(os.path.join(FIXTURES_DIR, name), "rb") as file:
+            search.append(file.read())
+    with open(os.path.join(FIXTURES_DIR, GOOD_FIXTURE), "rb") as file:
+        good = file.read()
+    return {"search": search, "good": good}
+
+
+class ReplayServer:
+    """
+    Сервер корпуса в фоновом потоке. Используется как контекстный менеджер:
+    with ReplayServer(latency=0.05) as server: ... server.url ...
+    """
+    def __init__(self, port=0, latency=0.0, jitter=0.0, error_rate=0.0, search_pages=20, seed=1):
+        """
+        :param port: порт (0 - любой свободный)
+        :param latency: (сек) задержка каждого ответа
+        :param jitter: (сек) случайная добавка к задержке, от 0 до jitter
+        :param error_rate: доля ответов 503 (0..1)
+        :param search_pages: сколько страниц выдачи у каждого поиска, дальше - пустая страница
+        :param seed: зерно генератора задержек и ошибок
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.search_pages = search_pages
+        self.corpus = load_corpus()
+        self.requests_count = 0
+        self.errors_count = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    @property
+    def search_address(self) -> str:
+        """
+        Адрес поиска в формате Shop.search_address (к нему дописывается поисковый запрос)
+        """
+        return self.url + "/catalogsearch/result/?page=1&q="
+
+    def start(self) -> "ReplayServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="ReplayServer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def respond(self, path: str) -> tuple:
+        """
+        Ответ на запрос
+        :param path: путь запроса с параметрами
+        :return: (статус, тело)
+        """
+        with self._lock:
+            self.requests_count += 1
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.errors_count += 1
+        if delay:
+            time.sleep(delay)
+        if failed:
+            return 503, b"Service Unavailable"
+        url = urlsplit(path)
+        if url.path.startswith("/p/"):
+            return 200, self.corpus["good"]
+        if url.path.startswith("/catalogsearch/"):
+            query = parse_qs(url.query)
+            page = int(query.get("page", ["1"])[0])
+            if page > self.search_pages:
+                return 200, EMPTY_SEARCH_PAGE
+            body = self.corpus["search"][(page - 1) % len(self.corpus["search"])]
+            prefix = f"{zlib.crc32(query.get('q', [''])[0].encode())}-{page}-".encode()
+            return 200, body.replace(b'href="/p/', b'href="/p/' + prefix)  # у каждой страницы свои товары
+        return 404, b"Not Found"
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                status, body = server.respond(self.path)
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay server for the Lamoda page corpus")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--search-pages", type=int, default=20)
+    args = parser.parse_args()
+    with ReplayServer(args.port, args.latency, args.jitter, args.error_rate, args.search_pages) as replay:
+        print(f"Serving corpus at {replay.search_address}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
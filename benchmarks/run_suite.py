@@ -0,0 +1,266 @@
+"""
+Офлайн набор бенчмарков сбора товаров: сайт заменяет ReplayServer с корпусом Lamoda/fixtures, база - временная.
+Сценарии:
+    parse_search - разбор страниц поиска (parse_search_cards) в текущем процессе
+    parse_good - разбор страниц товара (parse_good_page) в текущем процессе
+    add_new_goods - LamodaMain.add_new_goods: загрузка окна страниц поиска, разбор в ParsePool, запись в базу
+    update_good - LamodaMain.update_good по одному товару: первый проход (страницы новые) и повторный (HttpCache)
+    update_goods - LamodaMain.update_goods пачкой
+Для каждого сценария: страниц/сек, карточек (товаров)/сек, p50/p99 задержки одного вызова. Отчет - JSON с коммитом,
+настройками и пиковой памятью процесса (и процессов ParsePool), чтобы сравнивать запуски между коммитами:
+--output сохраняет отчет в файл, --compare печатает изменение относительно сохраненного отчета.
+Запуск: python -m benchmarks.run_suite [--latency 0.02] [--error-rate 0.05] [--repeats 20] [--output report.json]
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from config import Config
+from benchmarks.replay_server import ReplayServer, load_corpus
+from Crawler.async_crawler import AsyncCrawler
+from Crawler.http_policy import HttpPolicy
+from Crawler.parse_pool import ParsePool
+from Data_models.categories_db import CategoriesPool
+from Data_models.db_connection import DBConnection
+from Data_models.goods_db import Good, GoodKeeper
+from Data_models.history_writer import HistoryWriter
+from Data_models.migrations import Migrations
+from Lamoda.lamoda_main import LamodaMain
+from Lamoda.Parser.lamoda_good_page_parser import parse_good_page
+from Lamoda.Parser.lamoda_search_page_parser import parse_search_cards
+
+SUB_CATEGORIES = ("Куртки", "Джинсы", "Кроссовки", "Рубашки", "Свитеры")
+PRICE_VALUES = "3000, 8000, 15000, 30000"
+COMPARED_KEYS = ("pages_per_s", "cards_per_s", "p50_ms", "p99_ms")
+
+
+def percentile(values: list, rank: float) -> float:
+    """
+    :param values: значения
+    :param rank: перцентиль (0..100)
+    :return: значение перцентиля (ближайший ранг)
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(rank / 100 * len(ordered)) - 1))]
+
+
+def summarize(durations: list, pages: int, cards: int, errors=0) -> dict:
+    """
+    :param durations: (сек) время каждого вызова
+    :param pages: сколько страниц обработано за все вызовы
+    :param cards: сколько карточек (товаров) получено за все вызовы
+    :param errors: сколько вызовов закончились ошибкой
+    :return: строка отчета сценария
+    """
+    total = sum(durations) or 1e-9
+    return {"calls": len(durations), "errors": errors, "pages": pages, "cards": cards,
+            "pages_per_s": round(pages / total, 1), "cards_per_s": round(cards / total, 1),
+            "p50_ms": round(percentile(durations, 50) * 1000, 2), "p99_ms": round(percentile(durations, 99) * 1000, 2)}
+
+
+def timed(function, *args):
+    """
+    :return: (результат function(*args) или объект ошибки, время вызова в секундах)
+    """
+    start = time.perf_counter()
+    try:
+        result = function(*args)
+    except Exception as error:
+        result = error
+    return result, time.perf_counter() - start
+
+
+def bench_parse_search(corpus: dict, repeats: int) -> dict:
+    durations, cards = [], 0
+    for _ in range(repeats):
+        for page in corpus["search"]:
+            result, duration = timed(parse_search_cards, page)
+            durations.append(duration)
+            cards += len(result)
+    return summarize(durations, len(durations), cards)
+
+
+def bench_parse_good(corpus: dict, repeats: int) -> dict:
+    durations = [timed(parse_good_page, corpus["good"])[1] for _ in range(repeats)]
+    return summarize(durations, len(durations), len(durations))
+
+
+def prepare_db(replay: ReplayServer) -> None:
+    """
+    Схема через Migrations, магазин с адресом поиска ReplayServer и подкатегории SUB_CATEGORIES
+    """
+    Migrations.migrate()
+    with DBConnection.connect() as connection:
+        cursor = connection.cursor()
+        cursor.execute("INSERT INTO shops (shop_id, name, search_address) VALUES (?, 'lamoda', ?)",
+                       (LamodaMain.LAMODA_SHOP_ID, replay.search_address))
+        cursor.execute("INSERT INTO categories (category_id, text_value) VALUES (2, 'Одежда')")
+        cursor.executemany("INSERT INTO options (option_id, text_value) VALUES (?,?)",
+                           [(1, "Мужские"), (2, "Женские")])
+        cursor.executemany("""INSERT INTO sub_categories (sub_category_id, text_value, main_category_id, option, price_values)
+                           VALUES (?,?,2,?,?)""",
+                           [(number, name, 1 + number % 2, PRICE_VALUES)
+                            for number, name in enumerate(SUB_CATEGORIES, start=1)])
+    CategoriesPool.get_catalog()
+
+
+def bench_add_new_goods(replay: ReplayServer, repeats: int) -> dict:
+    durations, cards, errors = [], 0, 0
+    requests_before = replay.requests_count
+    for call in range(repeats):
+        sub_category_id = 1 + call % len(SUB_CATEGORIES)
+        count_before = count_goods()
+        result, duration = timed(LamodaMain.add_new_goods, sub_category_id, 1 + sub_category_id % 2)
+        durations.append(duration)
+        errors += isinstance(result, Exception)
+        cards += count_goods() - count_before
+    return summarize(durations, replay.requests_count - requests_before, cards, errors)
+
+
+def bench_update_good(replay: ReplayServer, goods: list) -> dict:
+    durations, errors = [], 0
+    requests_before = replay.requests_count
+    for good in goods:
+        result, duration = timed(LamodaMain.update_good, good)
+        durations.append(duration)
+        errors += isinstance(result, Exception)
+    return summarize(durations, replay.requests_count - requests_before, len(goods) - errors, errors)
+
+
+def bench_update_goods(replay: ReplayServer, goods: list, batch: int) -> dict:
+    durations, cards = [], 0
+    requests_before = replay.requests_count
+    for start in range(0, len(goods), batch):
+        result, duration = timed(LamodaMain.update_goods, goods[start:start + batch])
+        durations.append(duration)
+        cards += 0 if isinstance(result, Exception) else len(result)
+    return summarize(durations, replay.requests_count - requests_before, cards)
+
+
+def make_goods(replay: ReplayServer, count: int, prefix: str) -> list:
+    """
+    Товары в базе со страницами на ReplayServer
+    """
+    goods = [Good(description=f"Товар {number}", brand="Бренд", final_price=5000, standard_price=7000,
+                  link=f"{replay.url}/p/{prefix}{number}/", category_id=2, sub_category_id=1, shop_id=1, option=1)
+             for number in range(count)]
+    return GoodKeeper.upsert_many(goods)
+
+
+def count_goods() -> int:
+    with DBConnection.connect() as connection:
+        return connection.execute("SELECT COUNT(*) FROM goods").fetchone()[0]
+
+
+def peak_rss_kb() -> dict:
+    """
+    Пиковая память (ru_maxrss, на Linux - в КБ) процесса и завершенных дочерних процессов (ParsePool)
+    """
+    return {"self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+
+def run(latency=0.0, jitter=0.0, error_rate=0.0, repeats=20, goods_count=50, batch=25, rate_per_host=0.0) -> dict:
+    """
+    Прогоняет все сценарии
+    :param latency: (сек) задержка ответа ReplayServer
+    :param jitter: (сек) случайная добавка к задержке
+    :param error_rate: доля ответов 503
+    :param repeats: повторов сценариев разбора и вызовов add_new_goods
+    :param goods_count: товаров в сценариях update_good и update_goods
+    :param batch: товаров в одном вызове update_goods
+    :param rate_per_host: ограничение HttpPolicy (запросов/сек, 0 - без ограничения)
+    :return: отчет
+    """
+    corpus = load_corpus()
+    report = {"commit": git_commit(), "timestamp": int(time.time()), "python": platform.python_version(),
+              "settings": {"latency": latency, "jitter": jitter, "error_rate": error_rate, "repeats": repeats,
+                           "goods_count": goods_count, "batch": batch, "rate_per_host": rate_per_host,
+                           "crawl_ahead_pages": LamodaMain.CRAWL_AHEAD_PAGES, "parse_pool_workers": ParsePool.WORKERS},
+              "scenarios": {}}
+    scenarios = report["scenarios"]
+    scenarios["parse_search"] = bench_parse_search(corpus, repeats)
+    scenarios["parse_good"] = bench_parse_good(corpus, repeats)
+
+    old_db_pass, old_rate = Config.db_pass, HttpPolicy.RATE_PER_HOST
+    tmp_dir = tempfile.TemporaryDirectory()
+    Config.db_pass = os.path.join(tmp_dir.name, "bench.db")
+    HttpPolicy.RATE_PER_HOST = rate_per_host
+    HttpPolicy.reset()
+    try:
+        with ReplayServer(latency=latency, jitter=jitter, error_rate=error_rate) as replay:
+            prepare_db(replay)
+            scenarios["add_new_goods"] = bench_add_new_goods(replay, repeats)
+            goods = make_goods(replay, goods_count, "single")
+            scenarios["update_good"] = bench_update_good(replay, goods)
+            scenarios["update_good_cached"] = bench_update_good(replay, goods)
+            scenarios["update_goods"] = bench_update_goods(replay, make_goods(replay, goods_count, "batch"), batch)
+            report["server"] = {"requests": replay.requests_count, "errors": replay.errors_count}
+    finally:
+        HistoryWriter.stop()
+        AsyncCrawler.close()
+        ParsePool.stop()
+        DBConnection.close_all()
+        Config.db_pass = old_db_pass
+        HttpPolicy.RATE_PER_HOST = old_rate
+        HttpPolicy.reset()
+        tmp_dir.cleanup()
+    report["peak_rss_kb"] = peak_rss_kb()
+    return report
+
+
+def compare(report: dict, base: dict) -> list:
+    """
+    :param report: новый отчет
+    :param base: отчет, с которым сравнивать
+    :return: строки "сценарий метрика: было -> стало (изменение %)"
+    """
+    lines = [f"base {base.get('commit')} -> {report.get('commit')}"]
+    for name, values in report["scenarios"].items():
+        base_values = base.get("scenarios", {}).get(name)
+        if not base_values:
+            continue
+        for key in COMPARED_KEYS:
+            old, new = base_values.get(key, 0), values.get(key, 0)
+            change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+            lines.append(f"{name} {key}: {old} -> {new} ({change})")
+    return lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline crawl/parse benchmark suite")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--goods", type=int, default=50)
+    parser.add_argument("--batch", type=int, default=25)
+    parser.add_argument("--rate-per-host", type=float, default=0.0)
+    parser.add_argument("--output", help="file to save the JSON report to")
+    parser.add_argument("--compare", help="JSON report of a previous run to compare with")
+    args = parser.parse_args()
+    result = run(args.latency, args.jitter, args.error_rate, args.repeats, args.goods, args.batch, args.rate_per_host)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text)
+    print(text)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            print("\n".join(compare(result, json.load(file))), file=sys.stderr)
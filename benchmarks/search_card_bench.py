@@ -0,0 +1,106 @@
+"""
+Бенчмарк разбора карточек страницы поиска: прежний разбор (отдельный select_one на каждое поле карточки)
+против LamodaSearchCardExtractor (один обход поддерева карточки), и время до первой карточки
+(parse_first_search_card) против разбора всей страницы (parse_search_cards). Страница собирается из карточек
+фикстур Lamoda/fixtures, повторенных нужное количество раз.
+Запуск: python -m benchmarks.search_card_bench [количество карточек]
+"""
+import os
+import re
+import sys
+import time
+
+from Lamoda.Locators.lamoda_search_good_locators import LamodaSearchGoodLocators
+from Lamoda.Parser.lamoda_search_card_extractor import LamodaSearchCardExtractor
+from Lamoda.Parser.lamoda_search_page_parser import LamodaSearchPageParser, parse_first_search_card, parse_search_cards
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Lamoda", "fixtures")
+FIXTURES = ("lamoda_search_page_1.html", "lamoda_search_page_2.html")
+
+
+def make_page(cards_count: int) -> str:
+    """
+    Страница поиска из повторенных карточек фикстур
+    :param cards_count: количество карточек
+    :return: html страницы
+    """
+    cards = []
+    for name in FIXTURES:
+        with open(os.path.join(FIXTURES_DIR, name), "rb") as file:
+            cards += [str(card) for card in LamodaSearchPageParser(file.read()).goods_soup]
+    body = "".join(cards[i % len(cards)] for i in range(cards_count))
+    return f"<html><body><div class=\"grid__catalog\">{body}</div></body></html>"
+
+
+def _legacy_price(card, locator) -> int:
+    line = card.select_one(locator)
+    if line is None or not line.contents:
+        return 0
+    value = str(line.contents[0]).replace("₽", "").replace(" ", "")
+    return int(value) if value.isdigit() else 0
+
+
+def _legacy_extract(card) -> tuple:
+    """
+    Разбор карточки так, как его делал прежний LamodaGoodsOnSearchPageParser
+    :param card: суп карточки
+    :return: значения карточки
+    """
+    link = card.select_one(LamodaSearchGoodLocators.LINK)
+    brand = card.select_one(LamodaSearchGoodLocators.BRAND)
+    description = card.select_one(LamodaSearchGoodLocators.DESCRIPTION)
+    if link is None or brand is None or description is None:
+        raise ValueError("Card is not complete")
+    image = card.select_one(LamodaSearchGoodLocators.IMAGE)
+    image_link = "https:" + re.sub(r"/img\d{3,4}x\d{3,4}/", "/product/", image.attrs["src"]) if image else ""
+    if card.select_one(LamodaSearchGoodLocators.OLD_PRICE):
+        default_price = _legacy_price(card, LamodaSearchGoodLocators.OLD_PRICE)
+    else:
+        default_price = _legacy_price(card, LamodaSearchGoodLocators.SINGLE_PRICE)
+    return (str(brand.contents[0]), str(description.contents[0]), "https://www.lamoda.ru" + link.attrs.get("href", ""),
+            image_link, default_price, _legacy_price(card, LamodaSearchGoodLocators.NEW_PRICE))
+
+
+def measure(extract, cards) -> float:
+    """
+    :param extract: функция разбора карточки
+    :param cards: супы карточек
+    :return: время разбора всех карточек (сек)
+    """
+    start = time.perf_counter()
+    for card in cards:
+        try:
+            extract(card)
+        except ValueError:
+            pass
+    return time.perf_counter() - start
+
+
+def run(cards_count: int) -> dict:
+    """
+    :param cards_count: количество карточек на странице
+    :return: словарь с результатами
+    """
+    page = make_page(cards_count)
+    start = time.perf_counter()
+    cards = LamodaSearchPageParser(page).goods_soup
+    soup_time = time.perf_counter() - start
+    legacy_time = measure(_legacy_extract, cards)
+    extractor_time = measure(LamodaSearchCardExtractor.extract, cards)
+    start = time.perf_counter()
+    parse_first_search_card(page)
+    first_card_time = time.perf_counter() - start
+    start = time.perf_counter()
+    parse_search_cards(page)
+    page_time = time.perf_counter() - start
+    return {"cards": len(cards),
+            "soup_ms": round(soup_time * 1000, 1),
+            "first_card_ms": round(first_card_time * 1000, 2),
+            "page_ms": round(page_time * 1000, 1),
+            "legacy_cards_per_s": round(len(cards) / legacy_time),
+            "extractor_cards_per_s": round(len(cards) / extractor_time),
+            "speedup": round(legacy_time / extractor_time, 2)}
+
+
+if __name__ == "__main__":
+    print(run(int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
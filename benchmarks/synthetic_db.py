@@ -0,0 +1,70 @@
+"""
+Синтетическая база для бенчмарков: те же таблицы, что и у бота, заполненные случайными данными
+"""
+import random
+import sqlite3
+import time
+
+from config import Config
+from Data_models.db_connection import DBConnection
+from Data_models.migrations import Migrations
+
+PRICE_VALUES = "3000, 8000, 15000, 30000"
+
+
+def create_synthetic_db(db_pass: str, goods_count=20000, users_count=500, history_count=50000,
+                        sub_categories_count=20, seed=1) -> None:
+    """
+    Создает схему через Migrations и заполняет ее случайными данными
+    :param db_pass: путь к файлу новой базы
+    :param goods_count: количество товаров
+    :param users_count: количество пользователей (telegram_id = 1..users_count)
+    :param history_count: количество строк истории выборов
+    :param sub_categories_count: количество подкатегорий
+    :param seed: зерно генератора, чтобы база была одинаковой между запусками
+    :return: None
+    """
+    rnd = random.Random(seed)
+    old_db_pass, Config.db_pass = Config.db_pass, db_pass
+    try:
+        Migrations.migrate()
+    finally:
+        DBConnection.close_all()
+        Config.db_pass = old_db_pass
+    now = time.time()
+    with sqlite3.connect(db_pass) as connection:
+        cursor = connection.cursor()
+        cursor.executemany("INSERT INTO categories (category_id, text_value) VALUES (?,?)",
+                           [(2, "Одежда"), (3, "Обувь"), (4, "Аксессуары")])
+        cursor.executemany("INSERT INTO options (option_id, text_value) VALUES (?,?)",
+                           [(1, "Мужские"), (2, "Женские")])
+        cursor.execute("INSERT INTO shops (shop_id, name, search_address) VALUES (1, 'lamoda', ?)",
+                       ("https://www.lamoda.ru/catalogsearch/result/?page=1&q=",))
+        cursor.executemany("""INSERT INTO sub_categories (sub_category_id, text_value, main_category_id, option, price_values)
+                           VALUES (?,?,?,?,?)""",
+                           [(i, f"Подкатегория {i}", 2 + i % 3, 1 + i % 2, PRICE_VALUES)
+                            for i in range(1, sub_categories_count + 1)])
+        goods = []
+        for good_id in range(1, goods_count + 1):
+            sub_category_id = rnd.randint(1, sub_categories_count)
+            standard_price = rnd.randint(500, 50000)
+            goods.append((good_id, f"Товар {good_id}", f"Бренд {good_id % 300}", standard_price,
+                          int(standard_price * 0.7), f"https://a.lmcdn.ru/product/{good_id}.jpg",
+                          f"https://www.lamoda.ru/p/synthetic{good_id}/", 2 + sub_category_id % 3, sub_category_id,
+                          1 + sub_category_id % 2, 1, now, 1))
+        cursor.executemany("""INSERT INTO goods (good_id, description, brand, standard_price, final_price, image_links_str,
+                           link, category_id, sub_category_id, option, shop_id, last_update_timestamp, active)
+                           VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)""", goods)
+        cursor.executemany(f"""INSERT INTO {Config.user_table_name} (user_id, telegram_id, state, category_id,
+                           sub_category_id, option, first_visit_timestamp, last_updated_timestamp, current_good_id,
+                           last_message_id_with_buttons) VALUES (?,?,?,?,?,?,?,?,?,?)""",
+                           [(user_id, user_id, 3, 2 + (1 + user_id % sub_categories_count) % 3,
+                             1 + user_id % sub_categories_count, 1 + (1 + user_id % sub_categories_count) % 2,
+                             now, now, 1, 0) for user_id in range(1, users_count + 1)])
+        history = []
+        for _ in range(history_count):
+            good = goods[rnd.randrange(goods_count)]
+            history.append((rnd.randint(1, users_count), good[0], rnd.randint(0, 4), rnd.randint(0, 4), good[8],
+                            good[9], now))
+        cursor.executemany(f"""INSERT INTO {Config.history_table_name} (user_id, good_id, mark, correct_mark,
+                           sub_category_id, option, timestamp) VALUES (?,?,?,?,?,?,?)""", history)
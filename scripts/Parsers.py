@@ -1,3 +1,4 @@
+from typing import Iterator, List
 from Data_models.goods_db import Good
 from Lamoda.lamoda_main import LamodaMain
 
@@ -14,6 +15,16 @@ class ParserController:
         if good.shop_id == 1:  #1 - ламода
             return LamodaMain.update_good(good)
 
+    @classmethod
+    def update_goods(cls, goods: List[Good]) -> List[Good]:
+        """
+        Параллельно запрашивает актуальное состояние пачки товаров
+        :param goods: массив товаров
+        :return: массив обновленных товаров
+        """
+        lamoda_goods = [good for good in goods if good.shop_id == 1]  #1 - ламода
+        return LamodaMain.update_goods(lamoda_goods) if lamoda_goods else []
+
     @classmethod
     def add_new_goods(cls, sub_category_id, option=0) -> Good:
         """
@@ -23,3 +34,14 @@ class ParserController:
         :return: обьект класса Good
         """
         return LamodaMain.add_new_goods(sub_category_id, option)
+
+    @classmethod
+    def iter_new_goods(cls, sub_category_id, option=0) -> Iterator[Good]:
+        """
+        Как add_new_goods, но отдает товары по мере записи в базу: первый - сразу, остальные - после
+        разбора всех загруженных страниц
+        :param sub_category_id: ID подкатегории
+        :param option: опциональный параметр
+        :return: генератор объектов класса Good
+        """
+        return LamodaMain.iter_new_goods(sub_category_id, option)
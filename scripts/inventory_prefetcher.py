@@ -0,0 +1,150 @@
+import atexit
+import logging
+import threading
+
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor, TimeoutError
+from typing import Dict, Optional, Tuple
+from Data_models.goods_db import Good, GoodKeeper
+from Data_models.user_cursors_db import UserCursors
+from scripts.Parsers import ParserController
+
+
+class InventoryPrefetcher:
+    """
+    Фоновая докачка товаров для подкатегорий.
+    Для каждой пары (подкатегория, option) помнит курсор самого продвинувшегося пользователя. Когда активных
+    товаров после него остается меньше HEADROOM, рабочий поток качает новые страницы поиска, пока запас
+    не восстановится (не больше MAX_PAGES_PER_ROUND страниц за раз).
+    Обработчики Telegram на сайт не ходят: notify() только ставит проверку в очередь, а если товары все же
+    закончились, wait_for_goods() ждет докачки рабочим потоком - только до первого записанного товара
+    (ParserController.iter_new_goods), остальные товары страниц рабочий поток дописывает уже без него.
+    Одну подкатегорию одновременно качает только один поток - страницы поиска (NextSearchPages) у подкатегории общие
+    """
+    HEADROOM = GoodKeeper.POINTER_BUFFER  # сколько непросмотренных товаров держать впереди самого быстрого пользователя
+    MAX_PAGES_PER_ROUND = 3  # сколько раз докачать окно страниц поиска (LamodaMain.CRAWL_AHEAD_PAGES) за одну проверку
+    WORKERS = 2  # сколько подкатегорий докачивать параллельно
+    WAIT_TIMEOUT = 30  # (сек) сколько обработчик ждет докачки, если товары закончились
+
+    logger = logging.getLogger(__name__)
+    _lock = threading.Lock()
+    _executor = None
+    _cursors: Dict[Tuple[int, int], int] = {}  # (подкатегория, option) -> максимальный курсор пользователей
+    _checks: Dict[Tuple[int, int], Future] = {}  # (подкатегория, option) -> текущая проверка/докачка
+
+    @classmethod
+    def notify(cls, sub_category_id: int, option: int, last_good_id: int) -> Future:
+        """
+        Пользователь получил товар last_good_id - проверить запас товаров подкатегории в фоне
+        :param sub_category_id: ID подкатегории
+        :param option: option параметр
+        :param last_good_id: ID выданного товара (новый курсор пользователя)
+        :return: Future проверки. Результат - первый докачанный товар или None, если докачка не понадобилась.
+        Тот же товар раньше окончания проверки - в Future check.first_good
+        """
+        key = (sub_category_id, option)
+        with cls._lock:
+            if last_good_id > cls._cursors.get(key, 0):
+                cls._cursors[key] = last_good_id
+            check = cls._checks.get(key)
+            if check is None or check.done():
+                first_good = Future()
+                check = cls._get_executor().submit(cls._check, key, first_good)
+                check.first_good = first_good  # первый товар приходит раньше, чем закончится проверка
+                cls._checks[key] = check
+            return check
+
+    @classmethod
+    def wait_for_goods(cls, sub_category_id: int, option: int, last_good_id: int) -> Good:
+        """
+        Товары после курсора пользователя закончились: ждет, пока рабочий поток докачает новые
+        :param sub_category_id: ID подкатегории
+        :param option: option параметр
+        :param last_good_id: курсор пользователя
+        :return: первый товар, добавленный докачкой, с good_id больше курсора
+        """
+        for _ in range(2):  # уже идущая проверка могла начаться до этого курсора и решить, что запаса хватает
+            check = cls.notify(sub_category_id, option, last_good_id)
+            try:
+                good = check.first_good.result(timeout=cls.WAIT_TIMEOUT)
+            except TimeoutError:
+                raise ValueError(f"Не дождались новых товаров для подкатегории: {sub_category_id}, option: {option}")
+            if good is not None and good.good_id > last_good_id:
+                return good
+        raise ValueError(f"No goods was found by category:{sub_category_id}")
+
+    @classmethod
+    def stop(cls) -> None:
+        """
+        Останавливает рабочие потоки. Уже начатая докачка страницы дорабатывает, очередь отменяется
+        :return: None
+        """
+        with cls._lock:
+            executor, cls._executor = cls._executor, None
+            checks = list(cls._checks.values())
+            cls._checks.clear()
+        for check in checks:
+            cls._publish(check.first_good, None)  # не ждать отмененную проверку
+        if executor:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    @classmethod
+    def clear(cls) -> None:
+        """
+        Останавливает потоки и забывает курсоры (например, при смене базы в тестах)
+        :return: None
+        """
+        cls.stop()
+        with cls._lock:
+            cls._cursors.clear()
+
+    @classmethod
+    def _get_executor(cls) -> ThreadPoolExecutor:
+        if cls._executor is None:
+            cls._executor = ThreadPoolExecutor(max_workers=cls.WORKERS, thread_name_prefix="InventoryPrefetcher")
+        return cls._executor
+
+    @classmethod
+    def _check(cls, key: Tuple[int, int], first_good_future: Future) -> Optional[Good]:
+        """
+        Проверка запаса товаров подкатегории и докачка (выполняется в рабочем потоке)
+        :param key: (подкатегория, option)
+        :param first_good_future: сюда отдается первый докачанный товар, как только он записан в базу
+        :return: первый докачанный товар или None
+        """
+        try:
+            return cls._prefetch(key, first_good_future)
+        finally:
+            cls._publish(first_good_future, None)  # докачка не понадобилась или не удалась
+
+    @classmethod
+    def _prefetch(cls, key: Tuple[int, int], first_good_future: Future) -> Optional[Good]:
+        sub_category_id, option = key
+        with cls._lock:
+            known_cursor = cls._cursors.get(key, 0)
+        last_good_id = max(known_cursor, UserCursors.get_max_last_good_id(sub_category_id, option))
+        with cls._lock:
+            cls._cursors[key] = max(cls._cursors.get(key, 0), last_good_id)
+        first_good = None
+        for _ in range(cls.MAX_PAGES_PER_ROUND):
+            if GoodKeeper.count_unseen_goods(sub_category_id, last_good_id, option, limit=cls.HEADROOM) >= cls.HEADROOM:
+                break
+            try:
+                for good in ParserController.iter_new_goods(sub_category_id, option):
+                    # товар со страницы поиска мог уже быть в базе - пользователю нужен товар после курсора
+                    if first_good is None and good.good_id > last_good_id:
+                        first_good = good
+                        cls._publish(first_good_future, good)  # ожидающий пользователь получает товар сразу
+            except Exception as error:  # нет новых товаров на сайте или сайт недоступен - попробуем при следующей проверке
+                cls.logger.warning(f"Prefetch failed for sub_category {sub_category_id}, option {option}: {error!r}")
+                break
+        return first_good
+
+    @staticmethod
+    def _publish(first_good_future: Future, good: Optional[Good]) -> None:
+        try:
+            first_good_future.set_result(good)
+        except InvalidStateError:  # результат уже отдан (или проверку отменил stop())
+            pass
+
+
+atexit.register(InventoryPrefetcher.stop)
@@ -0,0 +1,85 @@
+import threading
+
+from collections import defaultdict
+from typing import Dict, Tuple
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Metrics:
+    """
+    Счетчики и показатели процесса в памяти (для логов, отладки и отдачи в систему мониторинга).
+    Метрика - имя и набор меток, например Metrics.inc("crawler_retries_total", host="www.lamoda.ru").
+    render() отдает все значения в текстовом формате Prometheus
+    """
+    _lock = threading.Lock()
+    _counters: Dict[str, Dict[Labels, float]] = defaultdict(dict)
+    _gauges: Dict[str, Dict[Labels, float]] = defaultdict(dict)
+
+    @classmethod
+    def inc(cls, name: str, value: float = 1, **labels) -> None:
+        """
+        Увеличивает счетчик
+        :param name: имя метрики
+        :param value: на сколько увеличить
+        :param labels: метки
+        :return: None
+        """
+        key = cls._labels(labels)
+        with cls._lock:
+            series = cls._counters[name]
+            series[key] = series.get(key, 0) + value
+
+    @classmethod
+    def set(cls, name: str, value: float, **labels) -> None:
+        """
+        Устанавливает текущее значение показателя (например, длины очереди)
+        :param name: имя метрики
+        :param value: значение
+        :param labels: метки
+        :return: None
+        """
+        with cls._lock:
+            cls._gauges[name][cls._labels(labels)] = value
+
+    @classmethod
+    def get(cls, name: str, **labels) -> float:
+        """
+        Текущее значение метрики
+        :param name: имя метрики
+        :param labels: метки
+        :return: значение (0, если метрика еще не записывалась)
+        """
+        key = cls._labels(labels)
+        with cls._lock:
+            return cls._counters.get(name, {}).get(key, cls._gauges.get(name, {}).get(key, 0))
+
+    @classmethod
+    def render(cls) -> str:
+        """
+        Все метрики в текстовом формате Prometheus
+        :return: строка
+        """
+        lines = []
+        with cls._lock:
+            for metric_type, metrics in (("counter", cls._counters), ("gauge", cls._gauges)):
+                for name in sorted(metrics):
+                    lines.append(f"# TYPE {name} {metric_type}")
+                    for labels, value in sorted(metrics[name].items()):
+                        labels_str = ",".join(f'{key}="{label}"' for key, label in labels)
+                        lines.append(f"{name}{{{labels_str}}} {value:g}" if labels_str else f"{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    @classmethod
+    def reset(cls) -> None:
+        """
+        Обнуляет все метрики (для тестов)
+        :return: None
+        """
+        with cls._lock:
+            cls._counters.clear()
+            cls._gauges.clear()
+
+    @staticmethod
+    def _labels(labels: dict) -> Labels:
+        return tuple(sorted((key, str(value)) for key, value in labels.items()))
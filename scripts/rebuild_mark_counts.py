@@ -0,0 +1,14 @@
+"""
+Пересчет счетчиков оценок good_mark_counts по истории выборов.
+Запуск: python -m scripts.rebuild_mark_counts [good_id ...]
+Без аргументов пересчитываются все товары
+"""
+import sys
+
+from Data_models.history_of_choices_db import HistoryOfChoices
+
+
+if __name__ == "__main__":
+    good_ids = [int(x) for x in sys.argv[1:]] or None
+    HistoryOfChoices.rebuild_mark_counts(good_ids)
+    print(f"Rebuilt mark counts for {'all goods' if good_ids is None else good_ids}")
@@ -0,0 +1,17 @@
+"""
+Обновление с сайта всех товаров, у которых истек Config.timeout_for_goods (запускается по расписанию, например,
+раз в сутки из cron). Страницы запрашиваются условно (HttpCache): у не изменившихся товаров обновляется только
+last_update_timestamp.
+Запуск: python -m scripts.refresh_goods [sub_category_id [option]]
+Без аргументов обновляются товары всех подкатегорий
+"""
+import sys
+
+from Data_models.goods_db import GoodKeeper
+
+
+if __name__ == "__main__":
+    sub_category_id = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    option = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    refreshed = GoodKeeper.refresh_outdated_goods(sub_category_id, option)
+    print(f"Refreshed {refreshed} goods of {'all sub categories' if sub_category_id is None else sub_category_id}")
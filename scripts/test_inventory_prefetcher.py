@@ -0,0 +1,105 @@
+import itertools
+import threading
+
+from unittest.mock import patch
+
+from Data_models.db_connection import DBConnection
+from Data_models.db_test_case import DBTestCase
+from Data_models.goods_db import Good, GoodKeeper
+from scripts.inventory_prefetcher import InventoryPrefetcher
+from scripts.Parsers import ParserController
+
+
+class TestInventoryPrefetcher(DBTestCase):
+    def setUp(self):
+        super().setUp()
+        with DBConnection.connect() as connection:
+            connection.execute("""INSERT INTO sub_categories (sub_category_id, text_value, main_category_id, option, price_values)
+            VALUES (1, 'Куртки', 2, 1, '5000, 10000, 30000')""")
+        self.links = itertools.count(1)
+        self.crawl_threads = []
+        InventoryPrefetcher.clear()
+        self.crawl_patcher = patch.object(ParserController, "iter_new_goods", side_effect=self.fake_iter_new_goods)
+        self.crawl_mock = self.crawl_patcher.start()
+
+    def tearDown(self):
+        InventoryPrefetcher.clear()
+        self.crawl_patcher.stop()
+
+    def fake_add_new_goods(self, sub_category_id, option=0, page_size=2) -> Good:
+        self.crawl_threads.append(threading.current_thread().name)
+        goods = [Good(description="Куртка", brand="Brand", standard_price=7000, image_links_str="https://a.lmcdn.ru/1.jpg",
+                      link=f"https://www.lamoda.ru/p/{next(self.links)}/", category_id=2,
+                      sub_category_id=sub_category_id, shop_id=1, option=option) for _ in range(page_size)]
+        return GoodKeeper.upsert_many(goods)[0]
+
+    def fake_iter_new_goods(self, sub_category_id, option=0):
+        yield self.fake_add_new_goods(sub_category_id, option)
+
+    def test_empty_sub_category_filled_by_worker(self):
+        good = GoodKeeper.get_next_good_by_sub_category_id(sub_category_id=1, last_good_id=0, option=1)
+        self.assertEqual(1, good.good_id)
+        self.assertTrue(self.crawl_threads)
+        self.assertTrue(all(name.startswith("InventoryPrefetcher") for name in self.crawl_threads))
+
+    def test_crawls_ahead_when_headroom_low(self):
+        self.fake_add_new_goods(1, 1, page_size=InventoryPrefetcher.HEADROOM)
+        self.crawl_threads.clear()
+        InventoryPrefetcher.notify(1, 1, 1).result(timeout=5)
+        self.assertEqual(1, len(self.crawl_threads))
+        self.assertGreaterEqual(GoodKeeper.count_unseen_goods(1, 1, 1), InventoryPrefetcher.HEADROOM)
+
+    def test_no_crawl_with_enough_headroom(self):
+        self.fake_add_new_goods(1, 1, page_size=InventoryPrefetcher.HEADROOM + 2)
+        self.crawl_threads.clear()
+        self.assertIsNone(InventoryPrefetcher.notify(1, 1, 1).result(timeout=5))
+        self.assertEqual([], self.crawl_threads)
+
+    def test_most_advanced_cursor_used(self):
+        self.fake_add_new_goods(1, 1, page_size=InventoryPrefetcher.HEADROOM + 2)
+        InventoryPrefetcher.notify(1, 1, 1).result(timeout=5)
+        self.crawl_threads.clear()
+        InventoryPrefetcher.notify(1, 1, InventoryPrefetcher.HEADROOM + 1).result(timeout=5)
+        InventoryPrefetcher.notify(1, 1, 1).result(timeout=5)  # отставший пользователь не сбрасывает курсор
+        self.assertEqual(1, len(self.crawl_threads))
+
+    def test_nothing_on_site(self):
+        self.crawl_mock.side_effect = ValueError("No goods was found")
+        with self.assertRaises(ValueError):
+            GoodKeeper.get_next_good_by_sub_category_id(sub_category_id=1, last_good_id=0, option=1)
+
+    def test_seen_good_not_returned(self):
+        seen = self.fake_add_new_goods(1, 1, page_size=2)
+
+        def recrawl_iter_new_goods(sub_category_id, option=0):
+            yield GoodKeeper.upsert_many([Good(description="Куртка", brand="Brand", standard_price=7000, link=seen.link,
+                                               category_id=2, sub_category_id=1, shop_id=1, option=1)])[0]
+            yield self.fake_add_new_goods(sub_category_id, option, page_size=1)
+
+        self.crawl_mock.side_effect = recrawl_iter_new_goods
+        good = GoodKeeper.get_next_good_by_sub_category_id(sub_category_id=1, last_good_id=2, option=1)
+        self.assertGreater(good.good_id, 2)
+        self.assertNotEqual(seen.link, good.link)
+        self.assertEqual("https://a.lmcdn.ru/1.jpg", good.image_links_str)
+
+    def test_only_seen_goods_on_site(self):
+        seen = self.fake_add_new_goods(1, 1, page_size=1)
+        self.crawl_mock.side_effect = lambda sub_category_id, option=0: iter([seen])
+        with self.assertRaises(ValueError):
+            GoodKeeper.get_next_good_by_sub_category_id(sub_category_id=1, last_good_id=1, option=1)
+
+    def test_first_good_before_crawl_finished(self):
+        rest_allowed = threading.Event()
+
+        def slow_iter_new_goods(sub_category_id, option=0):
+            yield self.fake_add_new_goods(sub_category_id, option, page_size=1)
+            rest_allowed.wait(5)  # остальные страницы еще разбираются
+            yield self.fake_add_new_goods(sub_category_id, option, page_size=1)
+
+        self.crawl_mock.side_effect = slow_iter_new_goods
+        try:
+            good = InventoryPrefetcher.wait_for_goods(sub_category_id=1, option=1, last_good_id=0)
+            self.assertEqual(1, good.good_id)
+            self.assertFalse(rest_allowed.is_set())
+        finally:
+            rest_allowed.set()
@@ -0,0 +1,30 @@
+from unittest import TestCase
+
+from scripts.metrics import Metrics
+
+
+class TestMetrics(TestCase):
+    def setUp(self):
+        Metrics.reset()
+
+    def tearDown(self):
+        Metrics.reset()
+
+    def test_counter_by_labels(self):
+        Metrics.inc("requests_total", host="a")
+        Metrics.inc("requests_total", 2, host="a")
+        Metrics.inc("requests_total", host="b")
+        self.assertEqual(3, Metrics.get("requests_total", host="a"))
+        self.assertEqual(1, Metrics.get("requests_total", host="b"))
+        self.assertEqual(0, Metrics.get("requests_total", host="c"))
+
+    def test_gauge(self):
+        Metrics.set("queue_size", 5)
+        Metrics.set("queue_size", 2)
+        self.assertEqual(2, Metrics.get("queue_size"))
+
+    def test_render(self):
+        Metrics.inc("requests_total", host="a")
+        Metrics.set("queue_size", 2)
+        self.assertEqual('# TYPE requests_total counter\nrequests_total{host="a"} 1\n'
+                         '# TYPE queue_size gauge\nqueue_size 2\n', Metrics.render())